@@ -0,0 +1,144 @@
+# answer_cache.py - CrowdAlpha | AI Chat answers: normalised-command cache and request coalescing
+#
+# `/analyze tsla`, `/analyze  $TSLA` and `/Analyze TSLA` are one command, so
+# answers are cached by the normalised command for CHAT_ANSWER_TTL. A miss
+# starts one background "flight" that runs the LLM call and buffers its
+# output; every session asking for the same command while it is in flight
+# (including reruns of the one that started it) reads that buffer instead of
+# calling the LLM again, and sees the answer stream in as it arrives. The
+# flight runs to completion even if the session that started it goes away,
+# and a successful answer is cached when it finishes.
+
+import os
+import threading
+import time
+
+import metrics
+from cache_store import open_cache_store, TieredCache
+
+# --- Config ---
+CHAT_CACHE_FILE = os.getenv("CHAT_CACHE_PATH", "chat_cache.db")
+CHAT_ANSWER_TTL = int(os.getenv("CHAT_ANSWER_TTL", 15 * 60))   # market commentary goes stale quickly
+FLIGHT_POLL = 0.05                                              # max wait between UI updates
+
+answer_cache = TieredCache(open_cache_store(CHAT_CACHE_FILE), max_entries=1_000, ttl=CHAT_ANSWER_TTL)
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+stats = {"hits": 0, "misses": 0, "coalesced": 0}
+
+
+def normalise_command(command: str) -> str:
+    """Lower-case command word, upper-case tickers (without `$`), single spaces."""
+    words = command.split()
+    if not words:
+        return ""
+    head, args = words[0].lower(), words[1:]
+    if not head.startswith("/"):
+        return " ".join(w.lower() for w in words)
+    return " ".join([head] + [w.lstrip("$").upper() for w in args])
+
+
+class Flight:
+    """One in-flight answer. Producers append text or set a progress status; readers poll `updates`."""
+
+    def __init__(self, key):
+        self.key = key
+        self.chunks = []
+        self.status = None       # progress text shown until the first chunk (e.g. map-reduce parts)
+        self.model = None
+        self.error = None
+        self.done = False
+        self.cached = False
+        self.started = time.monotonic()
+        self.first_chunk_at = None
+        self._changed = threading.Condition()
+
+    def append(self, text, model=None):
+        with self._changed:
+            if self.first_chunk_at is None:
+                self.first_chunk_at = time.monotonic()
+            self.chunks.append(text)
+            self.model = model or self.model
+            self._changed.notify_all()
+
+    def set_status(self, text):
+        with self._changed:
+            self.status = text
+            self._changed.notify_all()
+
+    def finish(self, text=None, model=None, error=None):
+        """End the flight; `text` replaces the streamed chunks (e.g. a non-streamed answer)."""
+        with self._changed:
+            if text is not None:
+                self.chunks = [text]
+            self.model = model or self.model
+            self.error = error
+            self.done = True
+            self._changed.notify_all()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def updates(self):
+        """Yields what to display each time the flight changes, until it is done."""
+        seen = None
+        while True:
+            with self._changed:
+                if not self.done:
+                    self._changed.wait(FLIGHT_POLL)
+                done = self.done
+                current = self.text or self.status or ""
+            if current != seen:
+                seen = current
+                yield current
+            if done:
+                return
+
+
+def _run(flight, produce):
+    try:
+        produce(flight)
+    except Exception as e:
+        print(f"Chat answer for {flight.key!r} failed: {e}")
+        flight.finish(error=str(e) or type(e).__name__)
+    else:
+        if not flight.done:
+            flight.finish()
+    if flight.error is None and flight.text.strip():
+        answer_cache.put(flight.key, {"text": flight.text, "model": flight.model})
+    if flight.first_chunk_at is not None:
+        metrics.observe("chat_first_chunk_seconds", flight.first_chunk_at - flight.started)
+    with _flights_lock:
+        _flights.pop(flight.key, None)
+
+
+def get_answer(command, produce):
+    """
+    The cached answer for `command` (keyed by its normalised form) as a
+    finished Flight, or the flight computing it. `produce(flight)` runs in
+    a background thread on a miss; it streams into the flight and may call
+    `flight.finish` itself.
+    """
+    key = normalise_command(command)
+    cached = answer_cache.get(key)
+    metrics.record_cache_lookup("chat", cached is not None)
+    if cached is not None:
+        stats["hits"] += 1
+        flight = Flight(key)
+        flight.cached = True
+        flight.finish(cached["text"], cached["model"])
+        return flight
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            stats["coalesced"] += 1
+            metrics.inc("chat_coalesced_total")
+            return flight
+        flight = _flights[key] = Flight(key)
+    stats["misses"] += 1
+    threading.Thread(target=_run, args=(flight, produce), daemon=True, name=f"chat-{key[:20]}").start()
+    return flight
@@ -1,25 +1,25 @@
+import importlib
+import os
 import streamlit as st
-import terminal_tab
-import new_tab
-import streamlit_ui  # this is your Reddit tab
-import chat_tab
-import compare_tab
 st.set_page_config(page_title="CrowdAlpha Terminal", layout="wide")
 
-st.sidebar.title("📚 Navigation")
-tab = st.sidebar.radio("Choose a view:", ["Reddit Feed", "Ticker Terminal", "News Flow","AI Chat","Compare"])
-
-if tab == "Reddit Feed":
-    streamlit_ui.render_reddit_tab()
+# view -> (module, render function). Only the selected tab's module is
+# imported; Streamlit keeps it loaded for later reruns.
+TABS = {
+    "Reddit Feed": ("streamlit_ui", "render_reddit_tab"),
+    "Ticker Terminal": ("terminal_tab", "render_terminal_tab"),
+    "News Flow": ("new_tab", "render_new_tab"),
+    "AI Chat": ("chat_tab", "render_chat_tab"),
+    "Compare": ("compare_tab", "render_compare_tab"),
+    "Diagnostics": ("diagnostics_tab", "render_diagnostics_tab"),
+}
 
-elif tab == "Ticker Terminal":
-    terminal_tab.render_terminal_tab()
-
-elif tab == "News Flow":
-    new_tab.render_new_tab()
-    import chat_tab 
-elif tab == "AI Chat":
-    chat_tab.render_chat_tab()  
-elif tab == "Compare":
-    compare_tab.render_compare_tab()
+st.sidebar.title("📚 Navigation")
+views = ["Reddit Feed", "Ticker Terminal", "News Flow","AI Chat","Compare"]
+# Hidden unless asked for: ?diagnostics=1 or CROWDALPHA_DIAGNOSTICS=1
+if st.query_params.get("diagnostics") == "1" or os.getenv("CROWDALPHA_DIAGNOSTICS") == "1":
+    views.append("Diagnostics")
+tab = st.sidebar.radio("Choose a view:", views)
 
+module_name, render = TABS[tab]
+getattr(importlib.import_module(module_name), render)()
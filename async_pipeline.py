@@ -0,0 +1,220 @@
+# async_pipeline.py - CrowdAlpha | Streaming asyncio pipeline for Reddit fetch + LLM extraction
+#
+# Submissions are streamed into a bounded queue while analysis workers pull
+# from it, so LLM calls start as soon as the first posts arrive instead of
+# after the whole listing has been drained.
+
+import asyncio
+import os
+import time
+from collections import defaultdict
+
+import crowdalpha as core
+import metrics
+import prefilter
+from post_store import PostStoreBuilder
+from llm_router import router, AllProvidersFailed
+from rate_limit import PROVIDER_QUOTAS
+
+# --- Config ---
+# Per-provider concurrency is enforced by the shared rate_limit limiters
+# (GROQ_CONCURRENCY / OPENROUTER_CONCURRENCY); workers only need to cover it.
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 64))
+ANALYZE_WORKERS = int(os.getenv("PIPELINE_WORKERS", sum(q["max_concurrency"] for q in PROVIDER_QUOTAS.values())))
+BATCH_LINGER = float(os.getenv("PIPELINE_BATCH_LINGER", 0.05))  # seconds to wait for a batch to fill
+
+_DONE = object()
+
+
+async def acall_llm_with_model(prompt: str):
+    """Async counterpart of `crowdalpha.call_llm_with_model`."""
+    try:
+        with metrics.timer("call_llm"):
+            return await router.acomplete(prompt)
+    except AllProvidersFailed as e:
+        metrics.inc("llm_all_providers_failed_total")
+        print("Both LLM calls failed:", e)
+        return core.LLM_ERROR_RESULT, None
+
+
+class PipelineRun:
+    """Mutable state shared by the workers of one pipeline run."""
+
+    def __init__(self, on_result=None):
+        self.on_result = on_result
+        self.store_builder = PostStoreBuilder()
+        self.posts = 0
+        self.calls = 0
+        self.prefiltered = 0
+        self.near_duplicates = 0
+        self.sources = {}      # post hash -> Reddit id, so edits never match their own old text
+        self.started = time.perf_counter()
+        self.first_result = None
+
+    def emit(self, post, llm_result):
+        if self.first_result is None:
+            self.first_result = time.perf_counter() - self.started
+        self.posts += 1
+        if self.on_result is not None:
+            self.on_result(post, llm_result)
+        try:
+            self.store_builder.add(post, *core.analyse_post(post, llm_result))
+        except Exception as e:
+            print(f"Error processing post: {e}")
+
+
+# --- Sources ---
+async def list_source(queue, posts):
+    for post in posts:
+        await queue.put(post)
+
+
+async def reddit_source(queue, subreddit="stocks", limit=10):
+    """Stream relevant submissions into `queue`; blocks when analysis falls behind."""
+    try:
+        with metrics.timer("fetch_reddit_posts", subreddit=subreddit):
+            submissions = iter(core.get_reddit().subreddit(subreddit).hot(limit=limit))
+            while True:
+                submission = await asyncio.to_thread(next, submissions, None)
+                if submission is None:
+                    break
+                if core.is_relevant_submission(submission):
+                    await queue.put(core.submission_to_post(submission))
+    except Exception as e:
+        print(f"Error fetching Reddit posts: {e}")
+
+
+# --- Extraction ---
+# Cache and near-duplicate lookups and writes hit SQLite, so they run in a
+# worker thread rather than on the event loop.
+def _find_cached(posts):
+    """[(post, text, post hash, cached result or None, near-duplicate hash or None), ...]"""
+    found = []
+    for post in posts:
+        text = core.get_post_text(post)
+        post_id = core.get_post_hash(text)
+        found.append((post, text, post_id, *core.find_cached_thesis(post_id, text, post.get("id"))))
+    return found
+
+
+async def analyze_post(state, post_id, text):
+    raw, model = await acall_llm_with_model(core.THESIS_PROMPT.format(text=text))
+    state.calls += 1
+    result = core.parse_thesis(raw)
+    await asyncio.to_thread(core.cache_thesis, post_id, result, model, text, state.sources.get(post_id))
+    return result
+
+
+async def extract_batch(state, batch):
+    """
+    One batched completion for [(post_id, text), ...]; posts missing from
+    the answer fall back to single-post calls. Returns {post_id: result}.
+    """
+    if len(batch) == 1:
+        post_id, text = batch[0]
+        return {post_id: await analyze_post(state, post_id, text)}
+
+    prompt, local_ids = core.build_batch_prompt(batch)
+    raw, model = await acall_llm_with_model(prompt)
+    state.calls += 1
+    parsed = core.parse_batch_response(raw, local_ids) if model else {}
+
+    texts = dict(batch)
+    results = {}
+    for local_id, post_id in local_ids.items():
+        if local_id in parsed:
+            results[post_id] = parsed[local_id]
+            await asyncio.to_thread(core.cache_thesis, post_id, parsed[local_id], model, texts[post_id],
+                                    state.sources.get(post_id))
+    missing = [(post_id, text) for post_id, text in batch if post_id not in results]
+    answers = await asyncio.gather(*(analyze_post(state, post_id, text) for post_id, text in missing))
+    results.update({post_id: answer for (post_id, _), answer in zip(missing, answers)})
+    return results
+
+
+async def analyze_worker(state, queue):
+    """Collect up to one batch of posts, answer pre-filtered, cached and near-duplicate ones, batch the rest."""
+    while True:
+        post = await queue.get()
+        if post is _DONE:
+            queue.put_nowait(_DONE)
+            return
+        ready = [post]
+        deadline = time.monotonic() + BATCH_LINGER
+        while len(ready) < core.BATCH_MAX_POSTS:
+            try:
+                post = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    post = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if post is _DONE:
+                queue.put_nowait(_DONE)
+                break
+            ready.append(post)
+
+        candidates = []
+        for post in ready:
+            local = prefilter.classify_post(post)
+            if local is not None:
+                state.prefiltered += 1
+                state.emit(post, local)
+            else:
+                candidates.append(post)
+
+        misses = defaultdict(list)
+        texts = {}
+        for post, text, post_id, cached, duplicate_of in await asyncio.to_thread(_find_cached, candidates):
+            if cached is not None:
+                if duplicate_of is not None:
+                    state.near_duplicates += 1
+                state.emit(post, cached)
+            else:
+                misses[post_id].append(post)
+                texts[post_id] = text
+                state.sources.setdefault(post_id, post.get("id"))
+
+        for batch in core.pack_batches(list(texts.items())):
+            try:
+                results = await extract_batch(state, batch)
+            except Exception as e:
+                print(f"Error processing batch: {e}")
+                results = {}
+            for post_id, _ in batch:
+                for post in misses[post_id]:
+                    state.emit(post, results.get(post_id, core.parse_thesis(core.LLM_ERROR_RESULT)))
+
+
+async def run_pipeline(posts=None, subreddit="stocks", limit=10, on_result=None):
+    """
+    Analyse `posts`, or stream `limit` hot posts from `subreddit` when no
+    posts are given. `on_result(post, llm_result)` is called as each post
+    finishes. Returns (PostStore, state).
+    """
+    state = PipelineRun(on_result)
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    workers = [asyncio.create_task(analyze_worker(state, queue)) for _ in range(ANALYZE_WORKERS)]
+    try:
+        if posts is not None:
+            await list_source(queue, posts)
+        else:
+            await reddit_source(queue, subreddit, limit)
+        await queue.put(_DONE)
+        await asyncio.gather(*workers)
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await router.aclose()
+    return state.store_builder.build(), state
+
+
+def run(posts=None, subreddit="stocks", limit=10, on_result=None):
+    """Synchronous entry point used by `crowdalpha.group_posts_by_ticker`."""
+    store, state = asyncio.run(run_pipeline(posts, subreddit, limit, on_result))
+    core.record_pipeline_stats(state.posts, state.calls, time.perf_counter() - state.started, state.first_result,
+                               state.prefiltered, state.near_duplicates)
+    return store
@@ -0,0 +1,265 @@
+# backfill.py - CrowdAlpha | Sharded multi-process backfill of historical posts into the ticker index
+#
+# A backfill job first queues every relevant post of the window (from a
+# Pushshift / Arctic Shift style JSON-lines dump, or the live `new()`
+# listings) in the Reddit index database. Worker processes then each take
+# the posts whose crc32(id) % workers equals their shard and run them
+# through the async pipeline. The LLM cache and the near-duplicate index are
+# SQLite WAL files shared by all workers, and each worker gets an equal
+# share of the provider quotas.
+#
+# Every CHECKPOINT_SIZE analysed posts, a worker merges them into the ticker
+# index and marks them done in one transaction. A re-run of the same job
+# skips planning and only picks up posts that are not done yet (with any
+# worker count). Posts whose LLM call failed stay queued for the next run.
+#   python -m crowdalpha backfill --subreddits wallstreetbets --since 2024-05-01 \
+#       --until 2024-06-01 --dump RS_2024-05.jsonl.gz --workers 8
+
+import asyncio
+import concurrent.futures
+import gzip
+import itertools
+import json
+import multiprocessing
+import os
+import time
+import types
+import zlib
+from datetime import datetime, timezone
+
+import async_pipeline
+import crowdalpha as core
+import metrics
+import rate_limit
+import reddit_ingest
+from cache_store import AppendLogCacheStore
+
+# --- Config ---
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", os.cpu_count() or 4))
+CHECKPOINT_SIZE = int(os.getenv("BACKFILL_CHECKPOINT_SIZE", 200))   # posts merged per commit
+PLAN_BATCH = 500                                                     # ids per IN (...) query
+PAGE_SIZE = 500                                                      # queued posts read per query
+PROGRESS_INTERVAL = 10.0
+
+LLM_ERROR = reddit_ingest.LLM_ERROR
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backfill_jobs (
+    job TEXT PRIMARY KEY,
+    planned_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS backfill_posts (
+    job TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    shard_key INTEGER NOT NULL,
+    post TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job, post_id)
+);
+"""
+
+
+_schema_ready = set()
+
+
+def _connect(path=None):
+    """A connection to the Reddit index database, with the backfill tables created once per process."""
+    conn = reddit_ingest._connect(path)
+    path = os.path.abspath(path or reddit_ingest.INDEX_FILE)
+    if path not in _schema_ready:
+        conn.executescript(SCHEMA)
+        _schema_ready.add(path)
+    return conn
+
+
+def parse_time(text) -> float:
+    """'30d' (days ago) or an ISO date/datetime (UTC) as a unix timestamp."""
+    if text.endswith("d") and text[:-1].isdigit():
+        return time.time() - int(text[:-1]) * 24 * 3600
+    moment = datetime.fromisoformat(text)
+    return (moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def job_name(subreddits, since, until=None, dump=None) -> str:
+    """Default job name; built from the arguments as given, so re-running the same command resumes it."""
+    source = os.path.basename(dump) if dump else "listing"
+    return f"{'+'.join(sorted(s.lower() for s in subreddits))}:{since}..{until or 'now'}:{source}"
+
+
+# --- Post Sources ---
+def read_dump(path):
+    """Submission records from a JSON-lines dump (optionally gzipped)."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def record_to_submission(record):
+    """praw Submission look-alike for a dump record, so the live relevance and post rules apply."""
+    selftext = record.get("selftext") or ""
+    return types.SimpleNamespace(
+        id=record["id"],
+        subreddit=types.SimpleNamespace(display_name=record["subreddit"]),
+        created_utc=float(record["created_utc"]),
+        edited=record.get("edited") or 0,
+        title=record.get("title") or "",
+        selftext="" if selftext in ("[removed]", "[deleted]") else selftext,
+        url=record.get("url") or f"https://www.reddit.com{record.get('permalink', '')}",
+        stickied=bool(record.get("stickied")),
+    )
+
+
+def select_posts(subreddits, after=0.0, before=None, dump=None):
+    """Relevant posts of `subreddits` created in [after, before), from `dump` or the live listings."""
+    before = before or float("inf")
+    if dump:
+        wanted = {s.lower() for s in subreddits}
+        submissions = (record_to_submission(r) for r in read_dump(dump) if r.get("subreddit", "").lower() in wanted)
+    else:
+        # Reddit listings stop after ~1000 posts; longer windows need a dump
+        submissions = itertools.chain.from_iterable(
+            itertools.takewhile(lambda s: s.created_utc >= after, core.get_reddit().subreddit(name).new(limit=None))
+            for name in subreddits
+        )
+    for submission in submissions:
+        if after <= submission.created_utc < before and core.is_relevant_submission(submission):
+            yield core.submission_to_post(submission)
+
+
+# --- Planning ---
+def plan(job, posts, path=None) -> int:
+    """Queue `posts` under `job`, skipping posts already in the index. Returns posts queued."""
+    conn = _connect(path)
+    try:
+        if conn.execute("SELECT 1 FROM backfill_jobs WHERE job = ?", (job,)).fetchone():
+            return 0
+        queued = 0
+        posts = iter(posts)
+        while batch := list(itertools.islice(posts, PLAN_BATCH)):
+            indexed = {row["id"] for row in conn.execute(
+                f"SELECT id FROM posts WHERE id IN ({','.join('?' * len(batch))})", [p["id"] for p in batch])}
+            rows = [(job, p["id"], zlib.crc32(p["id"].encode()), json.dumps(p)) for p in batch
+                    if p["id"] not in indexed]
+            with conn:
+                before = conn.total_changes
+                conn.executemany("INSERT OR IGNORE INTO backfill_posts (job, post_id, shard_key, post) "
+                                 "VALUES (?, ?, ?, ?)", rows)
+                queued += conn.total_changes - before
+        # Only a fully queued job is resumed without planning again
+        with conn:
+            conn.execute("INSERT INTO backfill_jobs VALUES (?, ?)", (job, time.time()))
+        return queued
+    finally:
+        conn.close()
+
+
+def progress(job, path=None) -> dict:
+    conn = _connect(path)
+    try:
+        counts = dict(conn.execute("SELECT done, COUNT(*) FROM backfill_posts WHERE job = ? GROUP BY done", (job,)))
+    finally:
+        conn.close()
+    return {"queued": sum(counts.values()), "done": counts.get(1, 0)}
+
+
+# --- Shard Workers ---
+def _pending(conn, job, shard, shards):
+    """Not-yet-done posts of one shard, paged by post id."""
+    last = ""
+    while True:
+        rows = conn.execute(
+            "SELECT post_id, post FROM backfill_posts WHERE job = ? AND post_id > ? AND done = 0 "
+            "AND shard_key % ? = ? ORDER BY post_id LIMIT ?",
+            (job, last, shards, shard, PAGE_SIZE)
+        ).fetchall()
+        if not rows:
+            return
+        last = rows[-1]["post_id"]
+        for row in rows:
+            yield json.loads(row["post"])
+
+
+def _checkpoint(conn, job, analysed):
+    with conn:
+        conn.executemany("UPDATE backfill_posts SET done = 1, post = '' WHERE job = ? AND post_id = ?",
+                         [(job, post["id"]) for post, _ in analysed])
+        # store_posts' own `with conn` commits the UPDATE together with the index rows
+        reddit_ingest.store_posts(conn, analysed)
+
+
+def run_shard(job, shard, shards, path=None) -> dict:
+    """Analyse and merge one shard of `job` (runs in a worker process)."""
+    rate_limit.share_quotas(shards)
+    stats = {"posts": 0, "failed": 0, "llm_calls": 0, "prefiltered": 0, "near_duplicates": 0}
+    analysed = []
+    conn = _connect(path)
+
+    def on_result(post, result):
+        if result == LLM_ERROR:
+            stats["failed"] += 1
+            return
+        analysed.append((post, result))
+        if len(analysed) >= CHECKPOINT_SIZE:
+            _checkpoint(conn, job, analysed)
+            stats["posts"] += len(analysed)
+            analysed.clear()
+
+    try:
+        _, state = asyncio.run(async_pipeline.run_pipeline(posts=_pending(conn, job, shard, shards),
+                                                           on_result=on_result))
+        if analysed:
+            _checkpoint(conn, job, analysed)
+            stats["posts"] += len(analysed)
+        stats.update(llm_calls=state.calls, prefiltered=state.prefiltered, near_duplicates=state.near_duplicates)
+    finally:
+        core.llm_cache.flush()
+        conn.close()
+    return stats
+
+
+def backfill(job, subreddits, after=0.0, before=None, dump=None, workers=BACKFILL_WORKERS, path=None) -> dict:
+    """Plan `job` unless an earlier run already did, then analyse what is left across `workers` processes."""
+    if isinstance(core.llm_cache.store, AppendLogCacheStore):
+        raise ValueError("backfill needs an LLM cache that processes can share (LLM_CACHE_BACKEND=sqlite)")
+    # Create the cache and run the legacy JSON migration once, before the workers open it
+    core.llm_cache.store.open()
+
+    queued = plan(job, select_posts(subreddits, after, before, dump), path)
+    status = progress(job, path)
+    print(f"Backfill {job!r}: {queued} posts queued now, {status['done']}/{status['queued']} done before this run")
+
+    totals = {"posts": 0, "failed": 0, "llm_calls": 0, "prefiltered": 0, "near_duplicates": 0}
+    remaining = status["queued"] - status["done"]
+    if not remaining:
+        return dict(totals, job=job, seconds=0.0, **status)
+    # Shards are taken at run time, so the worker count may differ from earlier runs
+    workers = min(workers, remaining)
+    start = time.perf_counter()
+    # spawn: workers must not inherit the cache writer thread or open SQLite handles
+    with metrics.timer("backfill"), concurrent.futures.ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(run_shard, job, shard, workers, path) for shard in range(workers)]
+        pending = futures
+        while pending:
+            _, pending = concurrent.futures.wait(pending, timeout=PROGRESS_INTERVAL)
+            if pending:
+                status = progress(job, path)
+                print(f"  {status['done']}/{status['queued']} posts done "
+                      f"({time.perf_counter() - start:.0f}s, {len(pending)} of {workers} shards running)")
+        for shard, future in enumerate(futures):
+            try:
+                for key, value in future.result().items():
+                    totals[key] += value
+            except Exception as e:
+                metrics.inc("stage_errors_total", stage="backfill", error=type(e).__name__)
+                print(f"Backfill shard {shard} failed (re-run to resume it): {e}")
+
+    elapsed = time.perf_counter() - start
+    status = progress(job, path)
+    print(f"Backfill {job!r}: {totals['posts']} posts merged in {elapsed:.1f}s with {workers} workers "
+          f"({totals['posts'] / elapsed if elapsed else 0:.1f} posts/s, {totals['llm_calls']} LLM calls), "
+          f"{status['done']}/{status['queued']} done"
+          + (f", {totals['failed']} LLM failures left queued for the next run" if totals["failed"] else ""))
+    return dict(totals, job=job, seconds=elapsed, **status)
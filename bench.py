@@ -0,0 +1,1054 @@
+# bench.py - CrowdAlpha | Offline performance benchmarks
+#
+# Usage:
+#   python bench.py cache --backend sqlite --entries 1000000
+#   python bench.py ratelimit --rpm 600 --seconds 20
+#   python bench.py router --requests 40
+#   python bench.py chat --users 20
+#   python bench.py tickers --posts 100000
+#   python bench.py fetch --requests 50
+#   python bench.py news --tickers 50
+#   python bench.py compare --symbols 10,25,50,100 --years 5
+#   python bench.py neardup --posts 1000000
+#   python bench.py pipeline --sizes 10,1000,100000 --llm-latency 0.05
+#   python bench.py startup
+#   python bench.py posts --posts 100000
+#   python bench.py backfill --posts 5000 --workers 1,2,4
+
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np
+import openai
+import pandas as pd
+
+import compare_engine
+import near_dup
+import rate_limit
+import resources
+from cache_store import open_cache_store
+from fake_feed_server import FakeFeedServer
+from fake_llm_server import FakeLLMServer
+from fake_transcript_server import FakeTranscriptServer
+from llm_router import CircuitBreaker, LLMRouter, Provider
+from ticker_extract import extract_tickers, SYMBOLS
+
+
+def _fake_result(i):
+    return {"ticker": ["TSLA"], "sentiment": "bullish", "reason": [f"reason {i}"]}
+
+
+# --- LLM cache store ---
+def bench_cache(backend="sqlite", entries=1_000_000, sample=1000):
+    """
+    Fill a cache store up to `entries` and measure the cost of a cache-miss
+    write (put + commit) at each order of magnitude. The legacy column is the
+    old behaviour of re-dumping the whole JSON file on every miss.
+    """
+    checkpoints = [n for n in (1_000, 10_000, 100_000, 1_000_000, 10_000_000) if n <= entries]
+    workdir = tempfile.mkdtemp(prefix="crowdalpha-bench-")
+    store = open_cache_store(os.path.join(workdir, f"cache.{backend}"), backend=backend)
+
+    print(f"{'entries':>10} | {'per-miss write (us)':>20} | {'legacy json rewrite (ms)':>24}")
+    size = 0
+    for target in checkpoints:
+        while size < target - sample:
+            chunk = min(10_000, target - sample - size)
+            store.put_many((f"k{size + i}", _fake_result(size + i)) for i in range(chunk))
+            size += chunk
+        store.flush()
+
+        start = time.perf_counter()
+        for i in range(sample):
+            store.put(f"k{size + i}", _fake_result(size + i))
+        store.flush()
+        per_miss_us = (time.perf_counter() - start) / sample * 1e6
+        size += sample
+
+        legacy = "-"
+        if target <= 100_000:
+            data = {f"k{i}": _fake_result(i) for i in range(target)}
+            start = time.perf_counter()
+            with open(os.path.join(workdir, "legacy.json"), "w") as f:
+                json.dump(data, f, indent=2)
+            legacy = f"{(time.perf_counter() - start) * 1000:.1f}"
+
+        print(f"{target:>10} | {per_miss_us:>20.1f} | {legacy:>24}")
+
+    start = time.perf_counter()
+    for i in range(0, size, max(size // sample, 1)):
+        store.get(f"k{i}")
+    print(f"random read: {(time.perf_counter() - start) / sample * 1e6:.1f} us/get")
+    store.close()
+
+
+# --- Rate limiter against a quota-enforcing fake server ---
+def bench_ratelimit(rpm=600, seconds=20, threads=32, latency=0.1, failure_rate=0.02):
+    """
+    Hammer a fake provider that enforces `rpm` (over a 1s sliding window) and
+    injects random 429s. Prints completed requests per second, which should
+    converge near rpm / 60, and the number of calls that failed after retries.
+    Returns the counts for tests.
+    """
+    server = FakeLLMServer(rpm=rpm, window=1.0, latency=latency, failure_rate=failure_rate).start()
+    client = openai.OpenAI(api_key="fake", base_url=server.base_url, max_retries=0)
+    # The burst must fit in the server's 1s window, as 2s of quota fits in a real provider's minute
+    limiter = rate_limit.configure_limiter("bench", rpm=rpm, tpm=rpm * 1000, max_concurrency=threads,
+                                           burst_seconds=1.0)
+    messages = [{"role": "user", "content": "Analyze $TSLA"}]
+
+    completed, failed = [], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker():
+        while time.monotonic() < deadline:
+            try:
+                rate_limit.chat_completion("bench", client, "fake", messages)
+                with lock:
+                    completed.append(time.monotonic())
+            except Exception:
+                with lock:
+                    failed[0] += 1
+
+    start = time.monotonic()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    server.shutdown()
+
+    per_second = [sum(1 for ts in completed if second <= ts - start < second + 1) for second in range(seconds)]
+    print(f"quota: {rpm / 60:.1f} req/s")
+    print(f"{'second':>6} | {'completed':>9}")
+    for second, count in enumerate(per_second):
+        print(f"{second:>6} | {count:>9}")
+    print(f"total: {len(completed)} ok, {failed[0]} failed after retries, "
+          f"{len(completed) / seconds:.1f} req/s")
+    print(f"server: {server.stats}")
+    print(f"limiter: {limiter.stats}, final concurrency {limiter.concurrency:.1f}")
+    return {"completed": len(completed), "failed": failed[0], "per_second": per_second,
+            "server": dict(server.stats), "limiter": dict(limiter.stats)}
+
+
+# --- Provider router during a primary outage ---
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+def bench_router(requests=40, threads=4, timeout=2.0):
+    """
+    Latency of sequential fallback vs the router (breaker + hedging) while
+    the primary provider hangs past the client timeout.
+    """
+    configs = {
+        "sequential": dict(hedge=False, failures=10 ** 9),
+        "breaker": dict(hedge=False, failures=3),
+        "breaker+hedge": dict(hedge=True, failures=3),
+    }
+    print(f"{'mode':>14} | {'healthy p50':>11} | {'outage p50':>10} | {'outage p95':>10} | {'outage max':>10}")
+    for mode, config in configs.items():
+        primary = FakeLLMServer(rpm=60_000, latency=0.1).start()
+        secondary = FakeLLMServer(rpm=60_000, latency=0.3).start()
+        for name in ("bench-primary", "bench-secondary"):
+            rate_limit.configure_limiter(name, rpm=60_000, tpm=10 ** 9, max_concurrency=64)
+        router = LLMRouter([
+            Provider("bench-primary", "primary", "fake", primary.base_url, timeout,
+                     CircuitBreaker(config["failures"])),
+            Provider("bench-secondary", "secondary", "fake", secondary.base_url, timeout),
+        ], hedge=config["hedge"])
+
+        def timed_batch(count):
+            latencies, lock = [], threading.Lock()
+
+            def worker(n):
+                for _ in range(n):
+                    start = time.monotonic()
+                    router.complete("Analyze $TSLA")
+                    with lock:
+                        latencies.append(time.monotonic() - start)
+
+            pool = [threading.Thread(target=worker, args=(count // threads,)) for _ in range(threads)]
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            return latencies
+
+        healthy = timed_batch(requests)
+        primary.latency = timeout * 5   # primary starts hanging
+        outage = timed_batch(requests)
+        print(f"{mode:>14} | {_percentile(healthy, 0.5):>10.2f}s | {_percentile(outage, 0.5):>9.2f}s | "
+              f"{_percentile(outage, 0.95):>9.2f}s | {max(outage):>9.2f}s")
+        primary.shutdown()
+        secondary.shutdown()
+
+
+# --- AI Chat ---
+def bench_chat(users=20, latency=0.3, token_latency=0.02, words=150):
+    """
+    AI Chat answer against a fake provider: time to first visible text for
+    the blocking call vs streaming, then `users` concurrent sessions asking
+    the same command (coalesced) and a cached repeat.
+    """
+    import answer_cache
+
+    reply = " ".join(f"word{i}" for i in range(words))
+    server = FakeLLMServer(rpm=60_000, latency=latency, reply=reply, token_latency=token_latency).start()
+    rate_limit.configure_limiter("bench-chat", rpm=60_000, tpm=10 ** 9, max_concurrency=64)
+    router = LLMRouter([Provider("bench-chat", "bench", "fake", server.base_url)], hedge=False)
+
+    def produce(flight):
+        for delta, model in router.stream("/analyze TSLA"):
+            flight.append(delta, model)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        answer_cache.answer_cache = answer_cache.TieredCache(open_cache_store(os.path.join(tmp, "chat_cache.db")))
+        print(f"provider latency {latency * 1000:.0f}ms + {words} words x {token_latency * 1000:.0f}ms")
+        print(f"{'mode':>20} | {'first text':>10} | {'full answer':>11} | {'LLM calls':>9}")
+
+        def report(mode, first, full, calls):
+            print(f"{mode:>20} | {first * 1000:>8.0f}ms | {full * 1000:>9.0f}ms | {calls:>9}")
+
+        server.stats["ok"] = 0
+        start = time.perf_counter()
+        router.complete("/analyze TSLA")
+        elapsed = time.perf_counter() - start
+        report("blocking", elapsed, elapsed, server.stats["ok"])
+
+        server.stats["ok"] = 0
+        start = time.perf_counter()
+        first = None
+        for _ in router.stream("/analyze TSLA"):
+            first = first or time.perf_counter() - start
+        report("streaming", first, time.perf_counter() - start, server.stats["ok"])
+
+        server.stats["ok"] = 0
+        firsts, fulls, lock = [], [], threading.Lock()
+
+        def session(command):
+            start = time.perf_counter()
+            first = None
+            for text in answer_cache.get_answer(command, produce).updates():
+                if text and first is None:
+                    first = time.perf_counter() - start
+            with lock:
+                firsts.append(first)
+                fulls.append(time.perf_counter() - start)
+
+        # Same command, differently typed
+        commands = ["/analyze TSLA", "/analyze tsla", "/Analyze  $TSLA"]
+        pool = [threading.Thread(target=session, args=(commands[i % len(commands)],)) for i in range(users)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        report(f"{users} users coalesced", _percentile(firsts, 0.95), _percentile(fulls, 0.95), server.stats["ok"])
+
+        server.stats["ok"] = 0
+        start = time.perf_counter()
+        flight = answer_cache.get_answer("/analyze TSLA", produce)
+        list(flight.updates())
+        elapsed = time.perf_counter() - start
+        report("cached repeat", elapsed, elapsed, server.stats["ok"])
+        answer_cache.answer_cache.close()
+    server.shutdown()
+
+
+# --- Ticker extraction ---
+LEGACY_TICKER_REGEX = r"\b[A-Z]{2,5}\b|\$[A-Z]{1,5}\b"
+TICKER_LABELS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ticker_labels.jsonl")
+
+
+def legacy_extract_tickers(text):
+    tickers = re.findall(LEGACY_TICKER_REGEX, text.upper())
+    return list(set([t.replace("$", "") for t in tickers if len(t) <= 5]))
+
+
+def _synthetic_posts(count, seed=42):
+    """Reddit-like posts: mostly prose, some capitalised words, a few tickers and cashtags."""
+    rng = random.Random(seed)
+    words = ("the market is going to rip after earnings and I think this company is undervalued "
+             "my position is down but I am holding because the fundamentals look strong").split()
+    noise = ["THE", "ALL", "CEO", "EPS", "YOLO", "DD", "IMO", "NOW", "USA", "FOMC"]
+    symbols = sorted(SYMBOLS)
+    posts = []
+    for _ in range(count):
+        tokens = [rng.choice(words) for _ in range(rng.randint(30, 120))]
+        for _ in range(rng.randint(0, 3)):
+            tokens.insert(rng.randrange(len(tokens)), rng.choice(noise))
+        for _ in range(rng.randint(1, 3)):
+            symbol = rng.choice(symbols)
+            tokens.insert(rng.randrange(len(tokens)), f"${symbol}" if rng.random() < 0.3 else symbol)
+        posts.append(" ".join(tokens))
+    return posts
+
+
+def _precision_recall(extract, labelled):
+    tp = fp = fn = 0
+    for row in labelled:
+        got, expected = set(extract(row["text"])), set(row["tickers"])
+        tp += len(got & expected)
+        fp += len(got - expected)
+        fn += len(expected - got)
+    return tp / max(1, tp + fp), tp / max(1, tp + fn)
+
+
+def bench_tickers(posts=100_000):
+    """Throughput over a synthetic corpus and precision/recall on the labelled sample."""
+    corpus = _synthetic_posts(posts)
+    with open(TICKER_LABELS_FILE) as f:
+        labelled = [json.loads(line) for line in f if line.strip()]
+    print(f"{len(SYMBOLS)} symbols | corpus {posts} posts | labelled sample {len(labelled)} posts")
+    print(f"{'extractor':>10} | {'posts/s':>9} | {'tickers/post':>12} | {'precision':>9} | {'recall':>6}")
+    for name, extract in (("legacy", legacy_extract_tickers), ("allowlist", extract_tickers)):
+        start = time.perf_counter()
+        found = sum(len(extract(text)) for text in corpus)
+        elapsed = time.perf_counter() - start
+        precision, recall = _precision_recall(extract, labelled)
+        print(f"{name:>10} | {posts / elapsed:>9.0f} | {found / posts:>12.2f} | {precision:>9.2f} | {recall:>6.2f}")
+
+
+# --- Transcript fetching ---
+def bench_fetch(requests_count=50, latency=0.05):
+    """
+    Repeated transcript fetches against the local stand-in server: the old
+    uncached requests.get + html.parser path vs http_cache (fresh hits,
+    forced revalidation, and a page update).
+    """
+    import requests
+    from bs4 import BeautifulSoup
+    import http_cache
+    from chat_tab import extract_transcript
+
+    server = FakeTranscriptServer(latency=latency).start()
+    url = f"{server.base_url}/msft-earnings-call-transcript.aspx"
+
+    def legacy():
+        soup = BeautifulSoup(requests.get(url, timeout=10).text, "html.parser")
+        content_div = soup.find("div", class_="article-content")
+        return "\n".join(p.get_text() for p in content_div.find_all("p"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        http_cache.http_cache = open_cache_store(os.path.join(tmp, "http_cache.db"))
+        modes = [
+            ("legacy", lambda: legacy()),
+            ("cached", lambda: http_cache.fetch_text(url, extract_transcript, "transcript")[1]),
+            ("revalidate", lambda: http_cache.fetch_text(url, extract_transcript, "transcript", max_age=0)[1]),
+        ]
+        print(f"parser: {http_cache.HTML_PARSER} | server latency {latency * 1000:.0f}ms")
+        print(f"{'mode':>10} | {'first':>8} | {'mean':>8} | {'200s':>5} | {'304s':>5} | {'parses':>6}")
+        expected = legacy()
+        for mode, call in modes:
+            server.stats.update({"200": 0, "304": 0})
+            parsed = http_cache.stats["parsed"]
+            timings = []
+            for _ in range(requests_count):
+                start = time.perf_counter()
+                assert call() == expected
+                timings.append(time.perf_counter() - start)
+            print(f"{mode:>10} | {timings[0] * 1000:>6.1f}ms | {sum(timings) / len(timings) * 1000:>6.1f}ms | "
+                  f"{server.stats['200']:>5} | {server.stats['304']:>5} | {http_cache.stats['parsed'] - parsed:>6}")
+            if mode == "revalidate":
+                # Every call got a 304 and reused the stored body and text
+                assert server.stats == {"200": 0, "304": requests_count, "404": 0}
+                assert http_cache.stats["parsed"] == parsed
+
+        server.bump()
+        parsed = http_cache.stats["parsed"]
+        text = http_cache.fetch_text(url, extract_transcript, "transcript", max_age=0)[1]
+        print(f"after page update: new text served = {text != expected}, parses = {http_cache.stats['parsed']}")
+        assert text != expected and http_cache.stats["parsed"] == parsed + 1
+        http_cache.http_cache.close()
+    server.shutdown()
+
+
+# --- News aggregation ---
+def bench_news(tickers=50, latency=0.2, rounds=5):
+    """
+    Watchlist news against the local feed server: the old sequential
+    feedparser.parse per ticker vs news_store (cold concurrent refresh,
+    forced revalidation, new headlines, and index-only reads).
+    """
+    import feedparser
+    import http_cache
+    import news_store
+
+    server = FakeFeedServer(latency=latency).start()
+    symbols = [f"T{i:03d}" for i in range(tickers)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        http_cache.http_cache = open_cache_store(os.path.join(tmp, "http_cache.db"))
+        news_store.NEWS_FEED_URL = server.feed_url
+        index = os.path.join(tmp, "news_index.db")
+
+        def timed(call):
+            start = time.perf_counter()
+            result = call()
+            return time.perf_counter() - start, result
+
+        elapsed, feeds = timed(lambda: [feedparser.parse(news_store.feed_url(s)) for s in symbols])
+        raw = sum(len(feed.entries) for feed in feeds)
+        print(f"{tickers} tickers | feed latency {latency * 1000:.0f}ms")
+        print(f"{'mode':>22} | {'time':>9} | {'200s':>5} | {'304s':>5} | {'items':>6}")
+        print(f"{'sequential feedparser':>22} | {elapsed * 1000:>7.0f}ms | {tickers:>5} | {0:>5} | {raw:>6}")
+
+        modes = [
+            ("cold refresh", lambda: news_store.refresh(symbols, path=index)),
+            ("revalidate (304)", lambda: news_store.refresh(symbols, force=True, path=index)),
+            ("new headlines", lambda: (server.bump(), news_store.refresh(symbols, force=True, path=index))[1]),
+        ]
+        for mode, call in modes:
+            server.stats.update({"200": 0, "304": 0})
+            elapsed, added = timed(call)
+            print(f"{mode:>22} | {elapsed * 1000:>7.0f}ms | {server.stats['200']:>5} | {server.stats['304']:>5} | "
+                  f"{added:>6}")
+
+        timings = []
+        for _ in range(rounds):
+            elapsed, items = timed(lambda: (news_store.refresh(symbols, path=index),
+                                            news_store.merged_feed(symbols, limit=100, path=index))[1])
+            timings.append(elapsed)
+        print(f"{'tab rerun (index)':>22} | {_percentile(timings, 0.5) * 1000:>7.1f}ms | {0:>5} | {0:>5} | "
+              f"{len(items):>6}")
+        distinct = len(news_store.merged_feed(symbols, limit=10 ** 6, path=index))
+        print(f"feed items per version: {raw}, distinct headlines indexed after two versions: {distinct}")
+        http_cache.http_cache.close()
+    server.shutdown()
+
+
+# --- Watchlist comparison ---
+def _synthetic_history(symbols, years, seed=7):
+    """Random-walk daily bars with staggered listing dates and a few missing days."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2026-10-16", periods=years * compare_engine.TRADING_DAYS, name="Date")
+    history = {}
+    for i in range(symbols):
+        start = rng.integers(0, len(dates) // 10)
+        closes = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(dates) - start)))
+        keep = rng.random(len(closes)) > 0.01
+        history[f"S{i:03d}"] = pd.DataFrame({"Close": closes[keep]}, index=dates[start:][keep])
+    return history
+
+
+def bench_compare(sizes=(10, 25, 50, 100), years=5, repeat=5, target=0.5):
+    """Time to align and compute every comparison metric vs number of symbols."""
+    print(f"{'symbols':>7} | {'cells':>8} | {'align':>8} | {'metrics':>8} | {'total':>8} | {'per symbol':>10}")
+    total = 0.0
+    for size in sizes:
+        history = _synthetic_history(size, years)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            closes = compare_engine.align_closes(history)
+            aligned = time.perf_counter()
+            comparison = compare_engine.Comparison(closes)
+            comparison.correlation()
+            comparison.summary()
+            timings.append((aligned - start, time.perf_counter() - aligned))
+        align, metrics = min(timings, key=sum)
+        total = align + metrics
+        print(f"{size:>7} | {closes.size:>8} | {align * 1000:>6.1f}ms | {metrics * 1000:>6.1f}ms | "
+              f"{total * 1000:>6.1f}ms | {total / size * 1000:>8.2f}ms")
+    print(f"largest watchlist: {total:.3f}s ({'within' if total <= target else 'OVER'} {target}s target)")
+
+
+# --- Near-duplicate index ---
+def _light_edit(rng, text):
+    """Repost-style variants: an EDIT line, a reworded title, or a couple of changed words."""
+    kind = rng.choice(("edit", "title", "words"))
+    if kind == "edit":
+        return kind, text + " edit: thanks for the awards, still holding"
+    if kind == "title":
+        return kind, "[crosspost] " + text
+    words = text.split()
+    for _ in range(2):
+        i = rng.randrange(len(words))
+        if words[i].islower():
+            words[i] = rng.choice(("really", "honestly", "definitely"))
+    return kind, " ".join(words)
+
+
+def bench_neardup(posts=1_000_000, sample=2000, lookups=1000):
+    """
+    Dedup rate and false matches on a synthetic corpus of originals and light
+    edits, then lookup latency with `posts` signatures stored.
+    """
+    rng = random.Random(3)
+    originals = _synthetic_posts(sample, seed=11)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = near_dup.NearDupIndex(os.path.join(tmp, "near_dup.db"))
+        for i, text in enumerate(originals[:sample // 2]):
+            index.add(f"orig{i}", text)
+
+        matched, kinds = 0, {}
+        for i, text in enumerate(originals[:sample // 2]):
+            kind, variant = _light_edit(rng, text)
+            hit = index.find(variant) == f"orig{i}"
+            matched += hit
+            found, total = kinds.get(kind, (0, 0))
+            kinds[kind] = (found + hit, total + 1)
+        false_matches = sum(index.find(text) is not None for text in originals[sample // 2:])
+        print(f"light edits reused: {matched / (sample // 2):.1%} "
+              + ", ".join(f"{kind} {found / total:.0%}" for kind, (found, total) in sorted(kinds.items())))
+        print(f"unrelated posts matched: {false_matches} / {sample - sample // 2}")
+
+        # Fill up to `posts` with random signatures in bulk (computing 1M real ones only measures hashing)
+        conn = index._conn()
+        np_rng = np.random.default_rng(5)
+        start, chunk = time.perf_counter(), 50_000
+        for offset in range(0, posts - sample // 2, chunk):
+            count = min(chunk, posts - sample // 2 - offset)
+            signatures = np_rng.integers(0, 2 ** 32, (count, near_dup.PERMUTATIONS), dtype=np.uint64).astype("<u4")
+            with conn:
+                conn.executemany("INSERT INTO signatures (post_hash, minhash, tickers) VALUES (?, ?, '')",
+                                 ((f"fill{offset + j}", sig.tobytes()) for j, sig in enumerate(signatures)))
+                conn.executemany("INSERT INTO bands VALUES (?, ?)",
+                                 ((key, f"fill{offset + j}") for j, sig in enumerate(signatures)
+                                  for key in near_dup.band_keys(sig)))
+        print(f"stored {len(index)} signatures in {time.perf_counter() - start:.1f}s "
+              f"({os.path.getsize(index.path) / 2 ** 20:.0f}MB)")
+
+        queries = [_light_edit(rng, text)[1] for text in originals[:lookups]]
+        queries += originals[sample // 2:][:lookups]
+        timings, hashing = [], []
+        for text in queries:
+            start = time.perf_counter()
+            signature = near_dup.minhash(text)
+            hashed = time.perf_counter()
+            index.find_signature(signature, near_dup._ticker_key(text))
+            timings.append(time.perf_counter() - start)
+            hashing.append(hashed - start)
+        print(f"lookup at {posts} posts: p50 {_percentile(timings, 0.5) * 1000:.2f}ms | "
+              f"p95 {_percentile(timings, 0.95) * 1000:.2f}ms | signature {_percentile(hashing, 0.5) * 1000:.2f}ms")
+
+
+# --- End-to-end pipeline on recorded fixtures ---
+LLM_ANSWERS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "llm_answers.jsonl")
+
+
+def _load_answers(path=LLM_ANSWERS_FILE) -> dict:
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return {row.pop("post_hash"): row for row in rows}
+
+
+def _scaled_corpus(posts, answers, count):
+    """
+    `count` posts cycled from the fixtures. Copies get their own id and a
+    short suffix so every post is a distinct cache key; each keeps the
+    recorded answer of its source post.
+    """
+    import crowdalpha as core
+    corpus, scaled_answers = [], {}
+    for n in range(count):
+        source = posts[n % len(posts)]
+        round_ = n // len(posts)
+        post = dict(source, id=f"{source['id']}{round_}" if round_ else source["id"],
+                    selftext=source["selftext"] + (f" (#{round_})" if round_ else ""),
+                    created_utc=source["created_utc"] + round_ * 86400)
+        answer = answers.get(core.get_post_hash(core.get_post_text(source)))
+        if answer is not None:
+            scaled_answers[core.get_post_hash(core.get_post_text(post))] = answer
+        corpus.append(post)
+    return corpus, scaled_answers
+
+
+def _peak_rss() -> int:
+    """High-water mark of the process RSS in bytes (ru_maxrss is KiB on Linux)."""
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _stage_row(stage, posts, elapsed, latencies, peak_bytes, note=""):
+    print(f"{stage:>10} | {posts:>7} | {elapsed:>7.2f}s | {posts / elapsed if elapsed else 0:>8.0f} | "
+          f"{_percentile(latencies, 0.5) * 1000:>8.2f} | {_percentile(latencies, 0.95) * 1000:>8.2f} | "
+          f"{_percentile(latencies, 0.99) * 1000:>8.2f} | {peak_bytes / 2 ** 20:>7.1f} | {note}")
+
+
+def bench_pipeline(sizes=(10, 1_000, 100_000), llm_latency=0.05, llm_failure_rate=0.0,
+                   reddit_latency=0.05, reddit_failure_rate=0.0, concurrency=16, near_dup_enabled=False):
+    """
+    Ingestion, extraction and grouping over recorded Reddit posts and LLM
+    answers: no credentials or network. Latency is per listing request for
+    ingestion, per post (queued -> result) for extraction, and per post for
+    grouping; memory is the process's peak RSS after the stage.
+    """
+    import asyncio
+
+    import async_pipeline
+    import crowdalpha as core
+    import fake_reddit
+    import llm_router
+    from cache_store import TieredCache
+    from post_store import PostStoreBuilder
+
+    fixtures, answers = fake_reddit.load_posts(), _load_answers()
+    near_dup.NEAR_DUP_ENABLED = near_dup_enabled
+    print(f"fixtures: {len(fixtures)} posts, {len(answers)} answers | LLM latency {llm_latency * 1000:.0f}ms, "
+          f"failure rate {llm_failure_rate:.0%} | Reddit latency {reddit_latency * 1000:.0f}ms, "
+          f"failure rate {reddit_failure_rate:.0%} | concurrency {concurrency}")
+    print(f"{'stage':>10} | {'posts':>7} | {'time':>8} | {'posts/s':>8} | {'p50 ms':>8} | {'p95 ms':>8} | "
+          f"{'p99 ms':>8} | {'RSS MB':>7} |")
+
+    for size in sizes:
+        corpus, scaled_answers = _scaled_corpus(fixtures, answers, size)
+        with tempfile.TemporaryDirectory() as tmp:
+            # --- Ingestion: paged listing from the fake Reddit client ---
+            reddit = fake_reddit.FakeReddit(corpus, reddit_latency, reddit_failure_rate, seed=size)
+            resources.override("reddit", reddit)
+            start = time.perf_counter()
+            fetched = core.fetch_reddit_posts("all", limit=size)
+            elapsed = time.perf_counter() - start
+            _stage_row("ingestion", len(fetched), elapsed, reddit.request_latencies, _peak_rss(),
+                       f"{reddit.stats['failures']} failed requests" if reddit.stats["failures"] else "")
+
+            # --- Extraction: async pipeline against the fake LLM server, cold cache ---
+            server = FakeLLMServer(rpm=10 ** 7, latency=llm_latency, failure_rate=llm_failure_rate,
+                                   answers=scaled_answers).start()
+            providers = core.router.providers
+            core.router.providers = [
+                llm_router.Provider(name, model, "fake", server.base_url)
+                for name, model in (("groq", llm_router.GROQ_MODEL), ("openrouter", llm_router.OPENROUTER_MODEL))
+            ]
+            for name in ("groq", "openrouter"):
+                rate_limit.configure_limiter(name, rpm=10 ** 7, tpm=10 ** 10, max_concurrency=concurrency)
+            core.llm_cache = TieredCache(open_cache_store(os.path.join(tmp, "llm_cache.db")))
+            near_dup.index = near_dup.NearDupIndex(os.path.join(tmp, "near_dup.db"))
+
+            queued, latencies, analysed = {}, [], []
+
+            def source():
+                for post in fetched:
+                    queued[id(post)] = time.perf_counter()
+                    yield post
+
+            def on_result(post, result):
+                latencies.append(time.perf_counter() - queued[id(post)])
+                analysed.append((post, result))
+
+            start = time.perf_counter()
+            _, state = asyncio.run(async_pipeline.run_pipeline(source(), on_result=on_result))
+            elapsed = time.perf_counter() - start
+            _stage_row("extraction", state.posts, elapsed, latencies, _peak_rss(),
+                       f"{state.calls} LLM calls, {state.prefiltered} pre-filtered, "
+                       f"{server.stats['injected']} injected 429s")
+            core.router.providers = providers
+            core.llm_cache.store.close()
+            server.shutdown()
+
+            # --- Grouping: analysed posts -> columnar post store, as the pipeline does it ---
+            latencies, builder = [], PostStoreBuilder()
+            start = time.perf_counter()
+            for post, result in analysed:
+                began = time.perf_counter()
+                builder.add(post, *core.analyse_post(post, result))
+                latencies.append(time.perf_counter() - began)
+            began = time.perf_counter()
+            store = builder.build()
+            build_seconds = time.perf_counter() - began
+            elapsed = time.perf_counter() - start
+            _stage_row("grouping", len(analysed), elapsed, latencies, _peak_rss(),
+                       f"{len(store.tickers)} tickers, build {build_seconds * 1000:.0f}ms")
+
+
+# --- Grouped posts: per-ticker dict copies vs the columnar post store ---
+def _legacy_snapshot(analysed):
+    """The old worker snapshot: one dict copy per (ticker, post) plus per-subreddit counts."""
+    grouped, counts = {}, {}
+    for post, (tickers, summary, sentiment) in analysed:
+        for ticker in tickers:
+            grouped.setdefault(ticker, []).append({
+                "id": post["id"], "subreddit": post["subreddit"], "created_utc": post["created_utc"],
+                "title": post["title"], "selftext": post["selftext"], "url": post["url"],
+                "summary": summary, "sentiment": sentiment,
+            })
+            by_ticker = counts.setdefault(post["subreddit"], {})
+            by_ticker[ticker] = by_ticker.get(ticker, 0) + 1
+    return {"grouped": grouped, "counts": counts}
+
+
+def _legacy_views(snapshot, subreddits, ticker):
+    """What the old Reddit tab computed per snapshot: counts, top 10, the ticker's posts, the CSV."""
+    counts = {}
+    for subreddit in subreddits:
+        for name, n in snapshot["counts"].get(subreddit, {}).items():
+            counts[name] = counts.get(name, 0) + n
+    top_n = dict(sorted(((k, v) for k, v in counts.items() if k != "UNCATEGORIZED"),
+                        key=lambda x: x[1], reverse=True)[:10])
+    posts = [p for p in snapshot["grouped"].get(ticker, []) if p["subreddit"] in subreddits]
+    return top_n, posts
+
+
+def _legacy_csv(snapshot, subreddits):
+    flat_data = [{"ticker": t, "title": p["title"], "url": p["url"], "summary": p.get("summary", ""),
+                  "sentiment": p.get("sentiment", "")}
+                 for t, grouped_posts in snapshot["grouped"].items() for p in grouped_posts
+                 if p["subreddit"] in subreddits]
+    return pd.DataFrame(flat_data).to_csv(index=False)
+
+
+def _best_of(call, repeat=3):
+    """(result, best seconds of `repeat` runs), each after a full collection so GC pauses don't land in one mode."""
+    import gc
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = call()
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+
+def _store_views(store, subreddits, ticker):
+    return store.top(10, subreddits), store.posts_for(ticker, subreddits)
+
+
+def bench_posts(count=100_000):
+    """
+    Memory and time of the grouped-posts structures on `count` posts cycled
+    from the offline fixtures: building, snapshot size and load, and the
+    Reddit tab's per-snapshot work (counts, top-N, posts for a ticker, CSV).
+    """
+    import gc
+    import tracemalloc
+    import crowdalpha as core
+    import fake_reddit
+    from post_store import PostStore, PostStoreBuilder
+
+    corpus, answers = _scaled_corpus(fake_reddit.load_posts(), _load_answers(), count)
+    analysed = [(post, core.analyse_post(post, answers.get(core.get_post_hash(core.get_post_text(post)), {})))
+                for post in corpus]
+    subreddits = sorted({post["subreddit"] for post in corpus})
+    mentions = {}
+    for _, (tickers, _, _) in analysed:
+        for name in tickers:
+            mentions[name] = mentions.get(name, 0) + 1
+    ticker = max((name for name in mentions if name != "UNCATEGORIZED"), key=mentions.get)
+
+    def build_store():
+        builder = PostStoreBuilder()
+        for post, result in analysed:
+            builder.add(post, *result)
+        return builder.build()
+
+    def allocated():
+        """Python heap (tracemalloc) plus pandas' Arrow-backed string columns, if pyarrow is installed."""
+        try:
+            import pyarrow
+            arrow = pyarrow.total_allocated_bytes()
+        except ImportError:
+            arrow = 0
+        return tracemalloc.get_traced_memory()[0] + arrow
+
+    def measured(call):
+        """(result, seconds, bytes allocated and still held by the result)."""
+        gc.collect()
+        start = time.perf_counter()
+        result = call()
+        elapsed = time.perf_counter() - start
+        del result
+        gc.collect()
+        tracemalloc.start()
+        before = allocated()
+        result = call()
+        gc.collect()
+        held = allocated() - before
+        tracemalloc.stop()
+        return result, elapsed, held
+
+    rows = []
+    for mode, build, to_json, from_json, views, to_csv in (
+        ("dict per ticker", lambda: _legacy_snapshot(analysed), lambda snap: snap, lambda data: data,
+         _legacy_views, _legacy_csv),
+        ("post store", build_store, lambda store: store.to_dict(), PostStore.from_dict,
+         _store_views, lambda store, subreddits: store.to_csv(subreddits)),
+    ):
+        built, build_seconds, build_bytes = measured(build)
+        text = json.dumps(to_json(built))
+        del built
+        loaded, load_seconds, load_bytes = measured(lambda: from_json(json.loads(text)))
+        (top_n, posts), view_seconds = _best_of(lambda: views(loaded, subreddits, ticker))
+        csv, csv_seconds = _best_of(lambda: to_csv(loaded, subreddits))
+        rows.append((mode, build_seconds, build_bytes, len(text), load_seconds, load_bytes, view_seconds,
+                     len(posts), csv_seconds, len(csv)))
+        del loaded
+
+    mentions = sum(len(result[0]) for _, result in analysed)
+    print(f"{count:,} posts, {mentions:,} ticker mentions, {len(subreddits)} subreddits; "
+          f"views = mention counts + top 10 + posts for {ticker}")
+    print(f"{'structure':>16} | {'build':>7} | {'in memory':>9} | {'snapshot':>8} | {'load':>7} | "
+          f"{'loaded':>8} | {'views':>7} | {'posts':>5} | {'CSV':>7}")
+    for mode, build_s, build_b, size, load_s, load_b, view_s, posts, csv_s, csv_size in rows:
+        print(f"{mode:>16} | {build_s * 1000:>5.0f}ms | {build_b / 2 ** 20:>7.1f}MB | {size / 2 ** 20:>6.1f}MB | "
+              f"{load_s * 1000:>5.0f}ms | {load_b / 2 ** 20:>6.1f}MB | {view_s * 1000:>5.1f}ms | {posts:>5} | "
+              f"{csv_s * 1000:>5.0f}ms")
+
+
+def record_fixtures(subreddits=("stocks", "wallstreetbets", "investing"), limit=100):
+    """Record live posts and LLM answers into fixtures/ (needs real Reddit and LLM credentials)."""
+    import crowdalpha as core
+    import fake_reddit
+
+    posts = [post for subreddit in subreddits for post in core.fetch_reddit_posts(subreddit, limit)]
+    with open(fake_reddit.POSTS_FILE, "w") as f:
+        for post in posts:
+            f.write(json.dumps(post) + "\n")
+    with open(LLM_ANSWERS_FILE, "w") as f:
+        for post in posts:
+            text = core.get_post_text(post)
+            f.write(json.dumps({"post_hash": core.get_post_hash(text), **core.extract_thesis_from_post(text)}) + "\n")
+    print(f"Recorded {len(posts)} posts into {fake_reddit.POSTS_FILE} and {LLM_ANSWERS_FILE}")
+
+
+# --- Multi-process backfill ---
+def _backfill_env(tmp, server, rpm):
+    """Per-run files, fake LLM endpoints and quotas; worker processes read them at import."""
+    os.environ.update({
+        "LLM_CACHE_PATH": os.path.join(tmp, "llm_cache.db"),
+        "NEAR_DUP_PATH": os.path.join(tmp, "near_dup.db"),
+        "NEAR_DUP": "0",
+        "GROQ_BASE_URL": server.base_url,
+        "OPENROUTER_BASE_URL": server.base_url,
+        "GROQ_RPM": str(rpm),
+        "OPENROUTER_RPM": str(rpm),
+        "GROQ_TPM": str(10 ** 10),
+        "OPENROUTER_TPM": str(10 ** 10),
+    })
+
+
+def _interrupted_backfill(job, dump, index_path, workers, stop_at):
+    """Run the backfill CLI, SIGKILL its process group once `stop_at` of the queue is done. Returns posts done."""
+    import signal
+    import subprocess
+    import sys
+
+    import backfill
+    root = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "crowdalpha", "backfill", "--subreddits", "stocks,wallstreetbets,investing",
+         "--since", "1970-01-01", "--dump", dump, "--workers", str(workers), "--job", job],
+        cwd=root, env=dict(os.environ, REDDIT_INDEX_PATH=index_path, PYTHONPATH=root),
+        stdout=subprocess.DEVNULL, start_new_session=True)
+    while process.poll() is None:
+        time.sleep(0.2)
+        status = backfill.progress(job, index_path) if os.path.exists(index_path) else {"queued": 0, "done": 0}
+        if status["queued"] and status["done"] >= stop_at * status["queued"]:
+            os.killpg(process.pid, signal.SIGKILL)
+            break
+    process.wait()
+    return backfill.progress(job, index_path)["done"]
+
+
+def bench_backfill(posts=5_000, workers=(1, 2, 4), llm_latency=0.5, rpm=10 ** 6):
+    """
+    Backfill throughput vs worker processes on a dump of scaled fixture
+    posts, against the fake LLM server with cold caches for every run. Then
+    a run killed part-way and resumed, which must end with every post
+    indexed once and no more LLM calls than an uninterrupted run.
+    """
+    import sqlite3
+
+    import backfill
+    import fake_reddit
+
+    corpus, answers = _scaled_corpus(fake_reddit.load_posts(), _load_answers(), posts)
+    subreddits = sorted({post["subreddit"] for post in corpus})
+    server = FakeLLMServer(rpm=10 ** 7, latency=llm_latency, answers=answers).start()
+    print(f"{posts} posts | LLM latency {llm_latency * 1000:.0f}ms | quota {rpm} RPM per provider | "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>7} | {'time':>7} | {'posts/s':>7} | {'speed-up':>8} | {'LLM calls':>9} | {'indexed':>7}")
+
+    def indexed(index_path):
+        conn = sqlite3.connect(index_path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+        finally:
+            conn.close()
+
+    baseline = calls = None
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = os.path.join(tmp, "dump.jsonl")
+        with open(dump, "w") as f:
+            for post in corpus:
+                f.write(json.dumps(post) + "\n")
+
+        for count in workers:
+            with tempfile.TemporaryDirectory() as run_dir:
+                _backfill_env(run_dir, server, rpm)
+                index_path = os.path.join(run_dir, "reddit_index.db")
+                result = backfill.backfill("bench", subreddits, dump=dump, workers=count, path=index_path)
+                rate = result["posts"] / result["seconds"]
+                baseline = baseline or rate
+                calls = result["llm_calls"]
+                print(f"{count:>7} | {result['seconds']:>6.1f}s | {rate:>7.1f} | {rate / baseline:>7.2f}x | "
+                      f"{result['llm_calls']:>9} | {indexed(index_path):>7}")
+                again = backfill.backfill("bench", subreddits, dump=dump, workers=count, path=index_path)
+                assert again["posts"] == 0 and again["llm_calls"] == 0, "finished job did work again"
+
+        with tempfile.TemporaryDirectory() as run_dir:
+            _backfill_env(run_dir, server, rpm)
+            index_path = os.path.join(run_dir, "reddit_index.db")
+            requests_before = server.stats["ok"]
+            killed_at = _interrupted_backfill("bench", dump, index_path, workers[-1], stop_at=0.4)
+            resumed = backfill.backfill("bench", subreddits, dump=dump, workers=workers[-1], path=index_path)
+            total_calls = server.stats["ok"] - requests_before
+            print(f"killed at {killed_at}/{resumed['queued']} posts done, resumed: {resumed['done']}/{resumed['queued']} "
+                  f"done, {indexed(index_path)} posts indexed, {total_calls} LLM calls in total "
+                  f"(uninterrupted: {calls})")
+    server.shutdown()
+
+
+# --- App startup ---
+TAB_MODULES = ("streamlit_ui", "terminal_tab", "new_tab", "chat_tab", "compare_tab", "diagnostics_tab")
+# What app.py used to pay on every cold start: every tab plus the SDKs they pulled in at import
+EAGER_IMPORTS = ("matplotlib.pyplot", "openai", "praw", "yfinance") + TAB_MODULES
+
+
+def _import_seconds(modules, repeat):
+    """Best-of-`repeat` time to import `modules` in a fresh interpreter (after streamlit + pandas)."""
+    import subprocess
+    import sys
+    code = ("import time, streamlit, pandas\nstart = time.perf_counter()\n"
+            + "".join(f"import {m}\n" for m in modules) + "print(time.perf_counter() - start)")
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return min(timings)
+
+
+def bench_startup(repeat=3, reruns=10):
+    """Cold import cost per tab (eager vs lazy app) and per-rerun cost of the app script."""
+    from streamlit.testing.v1 import AppTest
+
+    eager = _import_seconds(EAGER_IMPORTS, repeat)
+    print(f"{'cold start':>24} | {'imports':>8}")
+    print(f"{'eager (all tabs + SDKs)':>24} | {eager * 1000:>6.0f}ms")
+    for module in TAB_MODULES:
+        print(f"{'lazy ' + module:>24} | {_import_seconds([module], repeat) * 1000:>6.0f}ms")
+
+    app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"), default_timeout=60)
+    start = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - start
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        timings.append(time.perf_counter() - start)
+    print(f"app.py (Reddit Feed): first run {first * 1000:.0f}ms, rerun p50 {_percentile(timings, 0.5) * 1000:.0f}ms "
+          f"| resources created: {resources.loaded() or 'none'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CrowdAlpha offline benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    cache = sub.add_parser("cache", help="LLM cache store write cost vs size")
+    cache.add_argument("--backend", default="sqlite", choices=["sqlite", "log"])
+    cache.add_argument("--entries", type=int, default=1_000_000)
+    cache.add_argument("--sample", type=int, default=1000)
+
+    ratelimit = sub.add_parser("ratelimit", help="Throughput vs quota against a fake 429-injecting server")
+    ratelimit.add_argument("--rpm", type=int, default=600)
+    ratelimit.add_argument("--seconds", type=int, default=20)
+    ratelimit.add_argument("--threads", type=int, default=32)
+    ratelimit.add_argument("--failure-rate", type=float, default=0.02)
+
+    router = sub.add_parser("router", help="Tail latency during a primary provider outage")
+    router.add_argument("--requests", type=int, default=40)
+    router.add_argument("--timeout", type=float, default=2.0)
+
+    chat = sub.add_parser("chat", help="AI Chat first-token latency, coalescing and answer cache")
+    chat.add_argument("--users", type=int, default=20)
+    chat.add_argument("--latency", type=float, default=0.3)
+
+    tickers = sub.add_parser("tickers", help="Ticker extraction throughput and precision/recall")
+    tickers.add_argument("--posts", type=int, default=100_000)
+
+    fetch = sub.add_parser("fetch", help="Transcript fetch cache vs uncached fetch+parse")
+    fetch.add_argument("--requests", type=int, default=50)
+    fetch.add_argument("--latency", type=float, default=0.05)
+
+    news = sub.add_parser("news", help="Watchlist news: sequential feedparser vs concurrent cached aggregation")
+    news.add_argument("--tickers", type=int, default=50)
+    news.add_argument("--latency", type=float, default=0.2)
+
+    compare = sub.add_parser("compare", help="Watchlist comparison compute time vs number of symbols")
+    compare.add_argument("--symbols", default="10,25,50,100", help="Comma-separated watchlist sizes")
+    compare.add_argument("--years", type=int, default=5)
+    compare.add_argument("--target", type=float, default=0.5, help="Seconds allowed for the largest watchlist")
+
+    neardup = sub.add_parser("neardup", help="Near-duplicate dedup rate and lookup cost vs stored posts")
+    neardup.add_argument("--posts", type=int, default=1_000_000)
+    neardup.add_argument("--sample", type=int, default=2000)
+
+    pipeline = sub.add_parser("pipeline", help="Ingestion/extraction/grouping on recorded fixtures (offline)")
+    pipeline.add_argument("--sizes", default="10,1000,100000", help="Comma-separated post counts")
+    pipeline.add_argument("--llm-latency", type=float, default=0.05)
+    pipeline.add_argument("--llm-failure-rate", type=float, default=0.0)
+    pipeline.add_argument("--reddit-latency", type=float, default=0.05, help="Seconds per listing request")
+    pipeline.add_argument("--reddit-failure-rate", type=float, default=0.0)
+    pipeline.add_argument("--concurrency", type=int, default=16, help="In-flight LLM requests per provider")
+    pipeline.add_argument("--near-dup", action="store_true", help="Keep near-duplicate reuse on")
+
+    record = sub.add_parser("record", help="Record live Reddit posts + LLM answers as pipeline fixtures")
+    record.add_argument("--subreddits", default="stocks,wallstreetbets,investing")
+    record.add_argument("--limit", type=int, default=100)
+
+    posts = sub.add_parser("posts", help="Grouped posts: per-ticker dict copies vs the columnar post store")
+    posts.add_argument("--posts", type=int, default=100_000)
+
+    backfill = sub.add_parser("backfill", help="Multi-process backfill throughput vs workers, kill + resume")
+    backfill.add_argument("--posts", type=int, default=5_000)
+    backfill.add_argument("--workers", default="1,2,4", help="Comma-separated worker process counts")
+    backfill.add_argument("--llm-latency", type=float, default=0.5)
+    backfill.add_argument("--rpm", type=int, default=10 ** 6, help="Quota per provider, shared by the workers")
+
+    startup = sub.add_parser("startup", help="App cold start and per-rerun import cost")
+    startup.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+    if args.bench == "cache":
+        bench_cache(args.backend, args.entries, args.sample)
+    elif args.bench == "ratelimit":
+        bench_ratelimit(args.rpm, args.seconds, args.threads, failure_rate=args.failure_rate)
+    elif args.bench == "router":
+        bench_router(args.requests, timeout=args.timeout)
+    elif args.bench == "chat":
+        bench_chat(args.users, args.latency)
+    elif args.bench == "tickers":
+        bench_tickers(args.posts)
+    elif args.bench == "fetch":
+        bench_fetch(args.requests, args.latency)
+    elif args.bench == "news":
+        bench_news(args.tickers, args.latency)
+    elif args.bench == "compare":
+        bench_compare([int(n) for n in args.symbols.split(",")], args.years, target=args.target)
+    elif args.bench == "neardup":
+        bench_neardup(args.posts, args.sample)
+    elif args.bench == "pipeline":
+        bench_pipeline([int(n) for n in args.sizes.split(",")], args.llm_latency, args.llm_failure_rate,
+                       args.reddit_latency, args.reddit_failure_rate, args.concurrency, args.near_dup)
+    elif args.bench == "record":
+        record_fixtures(args.subreddits.split(","), args.limit)
+    elif args.bench == "posts":
+        bench_posts(args.posts)
+    elif args.bench == "backfill":
+        bench_backfill(args.posts, [int(n) for n in args.workers.split(",")], args.llm_latency, args.rpm)
+    elif args.bench == "startup":
+        bench_startup(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
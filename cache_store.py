@@ -0,0 +1,491 @@
+# cache_store.py - CrowdAlpha | Persistent LLM cache backends (SQLite WAL / append-only log)
+
+import os
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# --- Defaults ---
+DEFAULT_BACKEND = "sqlite"
+BATCH_SIZE = 256          # max writes grouped into one commit
+FLUSH_INTERVAL = 0.05     # seconds the writer waits to fill a batch
+MEMORY_MAX_ENTRIES = 10_000
+MEMORY_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL = 7 * 24 * 3600
+
+_STOP = object()
+
+
+class CacheStore:
+    """
+    Key/value store for LLM results keyed by `get_post_hash` digests.
+
+    Puts go through a background writer thread that group-commits them, so a
+    cache miss costs one queue push instead of rewriting the whole cache.
+    Nothing is read from disk until the first access.
+    """
+
+    def __init__(self, path, legacy_json=None, legacy_convert=None, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.legacy_json = legacy_json
+        self.legacy_convert = legacy_convert
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._open_lock = threading.Lock()
+        self._opened = False
+        self._writer = None
+
+    # --- Lifecycle ---
+    def _ensure_open(self):
+        if self._opened:
+            return
+        with self._open_lock:
+            if self._opened:
+                return
+            self._open()
+            self._writer = threading.Thread(target=self._writer_loop, name="cache-writer", daemon=True)
+            self._writer.start()
+            # Other threads' first reads wait on the lock until the migration is done
+            if self.legacy_json:
+                _import_json(self.legacy_json, self, self.legacy_convert)
+            self._opened = True
+
+    def open(self):
+        """Open now (running any legacy migration) instead of on first access."""
+        self._ensure_open()
+
+    def flush(self):
+        """Block until every queued write has been committed."""
+        if self._opened:
+            self._queue.join()
+
+    def close(self):
+        if not self._opened:
+            return
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._close()
+        self._opened = False
+
+    # --- Public API ---
+    def get(self, key, default=None):
+        self._ensure_open()
+        with self._pending_lock:
+            if key in self._pending:
+                return self._pending[key]
+        value = self._read(key)
+        return default if value is None else value
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def put_many(self, items):
+        self._ensure_open()
+        items = [(k, v) for k, v in items]
+        with self._pending_lock:
+            for k, v in items:
+                self._pending[k] = v
+        for item in items:
+            self._queue.put(item)
+
+    def compact(self):
+        """Reclaim space left behind by overwritten entries."""
+        self._ensure_open()
+        self.flush()
+        self._compact()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __len__(self):
+        self._ensure_open()
+        self.flush()
+        return self._count()
+
+    # --- Writer thread ---
+    def _writer_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(timeout, 0)) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"Cache write failed: {e}")
+            with self._pending_lock:
+                for k, v in batch:
+                    if self._pending.get(k) is v:
+                        del self._pending[k]
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                self._queue.task_done()
+                return
+
+    # --- Backend hooks ---
+    def _open(self):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+    def _read(self, key):
+        raise NotImplementedError
+
+    def _write_batch(self, items):
+        raise NotImplementedError
+
+    def _delete(self, keys):
+        raise NotImplementedError
+
+    def _compact(self):
+        raise NotImplementedError
+
+    def _count(self):
+        raise NotImplementedError
+
+
+class SQLiteCacheStore(CacheStore):
+    """
+    SQLite store in WAL mode. Each reader thread gets its own connection, so
+    reads never wait on the writer, and several processes can share one file.
+    """
+
+    def _open(self):
+        self._local = threading.local()
+        self._readers = []     # every thread's reader connection, so close() can reach them
+        self._readers_lock = threading.Lock()
+        self._write_conn = self._connect()
+        self._write_conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._write_conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def _close(self):
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+        self._write_conn.close()
+
+    def _read(self, key):
+        row = self._reader().execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write_batch(self, items):
+        with self._write_conn:
+            self._write_conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)",
+                [(k, json.dumps(v)) for k, v in items]
+            )
+
+    def _delete(self, keys):
+        with self._write_conn:
+            self._write_conn.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in keys])
+
+    def _compact(self):
+        self._write_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._write_conn.execute("VACUUM")
+
+    def _count(self):
+        return self._reader().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class AppendLogCacheStore(CacheStore):
+    """
+    Append-only JSON-lines log with an in-memory key -> offset index.
+    Records are never rewritten in place, so readers only lock against
+    compaction swapping the file, index and read fd. Single-process only;
+    use SQLite to share across workers.
+    """
+
+    def _open(self):
+        self._index = {}
+        self._append_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        open(self.path, "ab").close()
+        self._rebuild_index()
+        self._fd = os.open(self.path, os.O_RDONLY)
+        self._file = open(self.path, "ab")
+
+    def _rebuild_index(self):
+        index = {}
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                    if "v" in record:
+                        index[record["k"]] = (offset, len(line))
+                    else:
+                        index.pop(record["k"], None)   # deletion tombstone
+                except (ValueError, KeyError):
+                    pass
+                offset += len(line)
+        # Drop a torn record left by a crash mid-append
+        if os.path.getsize(self.path) != offset:
+            os.truncate(self.path, offset)
+        self._index = index
+
+    def _close(self):
+        self._file.close()
+        os.close(self._fd)
+
+    def _read(self, key):
+        with self._swap_lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            offset, length = entry
+            line = os.pread(self._fd, length, offset)
+        return json.loads(line)["v"]
+
+    def _write_batch(self, items):
+        with self._append_lock:
+            offset = self._file.tell()
+            lines = []
+            positions = []
+            for k, v in items:
+                line = (json.dumps({"k": k, "v": v}) + "\n").encode()
+                positions.append((k, offset, len(line)))
+                lines.append(line)
+                offset += len(line)
+            self._file.write(b"".join(lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            for k, pos, length in positions:
+                self._index[k] = (pos, length)
+
+    def _delete(self, keys):
+        with self._append_lock:
+            self._file.write(b"".join((json.dumps({"k": k}) + "\n").encode() for k in keys))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            for k in keys:
+                self._index.pop(k, None)
+
+    def _compact(self):
+        with self._append_lock:
+            tmp_path = self.path + ".compact"
+            index, offset = {}, 0
+            with open(tmp_path, "wb") as out:
+                for key in list(self._index):
+                    line = (json.dumps({"k": key, "v": self._read(key)}) + "\n").encode()
+                    out.write(line)
+                    index[key] = (offset, len(line))
+                    offset += len(line)
+                out.flush()
+                os.fsync(out.fileno())
+            # Readers keep using the old fd and index until both are swapped together
+            fd = os.open(tmp_path, os.O_RDONLY)
+            os.replace(tmp_path, self.path)
+            with self._swap_lock:
+                old_fd, self._fd, self._index = self._fd, fd, index
+                os.close(old_fd)
+            self._file.close()
+            self._file = open(self.path, "ab")
+
+    def _count(self):
+        return len(self._index)
+
+
+class TieredCache:
+    """
+    Bounded in-memory LRU in front of a persistent `CacheStore`.
+
+    Entries are stored as {"value", "expires_at"} envelopes so a TTL applies
+    to both tiers. The memory tier evicts least-recently-used entries once it
+    exceeds `max_entries` or roughly `max_bytes` of serialized values.
+    """
+
+    def __init__(self, store, max_entries=MEMORY_MAX_ENTRIES, max_bytes=MEMORY_MAX_BYTES, ttl=DEFAULT_TTL):
+        self.store = store
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lru = OrderedDict()   # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def get(self, key, default=None):
+        return self.get_first([key], default)
+
+    def get_first(self, keys, default=None):
+        """Return the value of the first live key in `keys`, counting one hit or miss."""
+        for key in keys:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+        self._count("misses")
+        return default
+
+    def _lookup(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._lru.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return entry[0]
+                # The persisted copy shares this expiry, so skip the disk read
+                self._drop(key)
+                self._counters["expired"] += 1
+                return None
+
+        envelope = self.store.get(key)
+        if not isinstance(envelope, dict) or "expires_at" not in envelope:
+            return None
+        if envelope["expires_at"] <= now:
+            self._count("expired")
+            return None
+        self._remember(key, envelope["value"], envelope["expires_at"])
+        self._count("disk_hits")
+        return envelope["value"]
+
+    @staticmethod
+    def envelope(value, ttl) -> dict:
+        """The persisted form of `value`: {"value", "expires_at"}."""
+        return {"value": value, "expires_at": time.time() + ttl}
+
+    def put(self, key, value, ttl=None):
+        envelope = self.envelope(value, self.ttl if ttl is None else ttl)
+        self.store.put(key, envelope)
+        self._remember(key, value, envelope["expires_at"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._lru)
+            stats["memory_bytes"] = self._bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def flush(self):
+        self.store.flush()
+
+    def close(self):
+        self.store.close()
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _remember(self, key, value, expires_at):
+        size = len(json.dumps(value))
+        with self._lock:
+            if key in self._lru:
+                self._drop(key)
+            self._lru[key] = (value, expires_at, size)
+            self._bytes += size
+            while self._lru and (len(self._lru) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._lru)))
+                self._counters["evictions"] += 1
+
+    def _drop(self, key):
+        _, _, size = self._lru.pop(key)
+        self._bytes -= size
+
+
+BACKENDS = {
+    "sqlite": SQLiteCacheStore,
+    "log": AppendLogCacheStore,
+}
+
+
+def open_cache_store(path, backend=None, **kwargs) -> CacheStore:
+    """Create a cache store; the file is opened lazily on first access."""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown cache backend: {backend}")
+    return BACKENDS[backend](path, **kwargs)
+
+
+def migrate_json_cache(json_path, store, convert=None) -> int:
+    """
+    Import a legacy `llm_cache.json` into `store` and rename it to
+    `.imported` so the migration only runs once. `convert(key, value)` gives
+    the (key, value) to store, or None to drop the entry; existing entries
+    are never overwritten. A `.migrated` file left by the earlier raw import
+    is imported again and the raw rows it wrote are deleted. Processes
+    opening the cache at the same time may each import it (the writes are
+    identical); only one of them renames the file. Returns the number of
+    imported entries.
+    """
+    store.open()
+    return _import_json(json_path, store, convert)
+
+
+def _import_json(json_path, store, convert):
+    """`migrate_json_cache` for an open store (writes go straight to the backend, not the writer queue)."""
+    for source in (json_path, json_path + ".migrated"):
+        if os.path.exists(source):
+            break
+    else:
+        return 0
+    try:
+        with open(source) as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Could not migrate {source}: {e}")
+        return 0
+    items = [item for item in (convert(k, v) if convert else (k, v) for k, v in data.items()) if item is not None]
+    new_keys = {k for k, _ in items}
+    items = [(k, v) for k, v in items if store._read(k) is None]
+    if items:
+        store._write_batch(items)
+    if source != json_path:
+        store._delete([k for k in data if k not in new_keys])
+    try:
+        os.replace(source, json_path + ".imported")
+    except FileNotFoundError:
+        pass    # another process finished the same migration first
+    return len(items)
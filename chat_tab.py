@@ -72,98 +72,90 @@
 #             st.markdown(result)
 
 # chat_tab.py - CrowdAlpha | AI Command Chat Agent (with /earnings support)
+#
+# Answers stream in as the LLM produces them. Identical commands share one
+# cached or in-flight answer (answer_cache), so reruns and concurrent users
+# asking for `/analyze TSLA` cost one LLM call.
 
-import streamlit as st
 import os
-from dotenv import load_dotenv
-import openai
-import requests
-from bs4 import BeautifulSoup
+import streamlit as st
+from bs4 import BeautifulSoup, SoupStrainer
+from llm_router import router, AllProvidersFailed, GROQ_MODEL
+import answer_cache
+import earnings_summary
+import http_cache
 
-# Load API keys
-load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+TRANSCRIPT_BASE_URL = os.getenv("TRANSCRIPT_BASE_URL", "https://www.fool.com/earnings-call-transcripts")
 
-# Configure LLM clients
-groq_client = openai.OpenAI(api_key=GROQ_API_KEY, base_url="https://api.groq.com/openai/v1")
-openrouter_client = openai.OpenAI(api_key=OPENROUTER_API_KEY, base_url="https://openrouter.ai/api/v1")
+PROMPT = """
+        You are an AI assistant for a financial research terminal. 
+        Interpret the following command and return a concise, clear financial analysis with markdown formatting.
+        
+        Command:
+        {command}
+        """
 
 
-def call_llm(prompt: str):
-    """Try Groq first, then OpenRouter fallback."""
-    try:
-        response = groq_client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        st.warning(f"Groq failed, fallback to OpenRouter: {e}")
-        try:
-            response = openrouter_client.chat.completions.create(
-                model="meta-llama/llama-3-8b-instruct:free",
-                messages=[{"role": "user", "content": prompt}]
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            st.error(f"Both LLM calls failed: {e}")
-            return "⚠️ AI response unavailable."
+def extract_transcript(html: str) -> str:
+    """Paragraph text of a Motley Fool transcript page."""
+    # Motley Fool transcripts are inside <div class="article-content">; only that subtree is parsed
+    soup = BeautifulSoup(html, http_cache.HTML_PARSER, parse_only=SoupStrainer("div", class_="article-content"))
+    return "\n".join(p.get_text() for p in soup.find_all("p"))
 
 
-def fetch_earnings_transcript(ticker: str) -> str:
+def fetch_earnings_transcript(ticker: str):
     """
     Fetches earnings transcript from Motley Fool as fallback demo.
+    Returns (transcript, None), or (None, error message) if there is nothing to summarise.
     """
-    url = f"https://www.fool.com/earnings-call-transcripts/{ticker.lower()}-earnings-call-transcript.aspx"
+    url = f"{TRANSCRIPT_BASE_URL}/{ticker.lower()}-earnings-call-transcript.aspx"
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            # Motley Fool transcripts are inside <div class="article-content">
-            content_div = soup.find("div", class_="article-content")
-            paragraphs = content_div.find_all("p") if content_div else []
-            transcript = "\n".join(p.get_text() for p in paragraphs)
-            return transcript if transcript.strip() else "Transcript content unavailable."
-        else:
-            return "Transcript not available or ticker invalid."
+        status, transcript = http_cache.fetch_text(url, extract_transcript, "transcript")
     except Exception as e:
-        return f"Error fetching transcript: {e}"
-
-
-
-def handle_earnings_command(ticker: str) -> str:
-    transcript = fetch_earnings_transcript(ticker)
-    prompt = f"""
-    Summarize the following earnings call transcript for {ticker} in bullet points:
-    Include revenue, EPS, key themes, and sentiment (bullish/bearish/neutral).
-    
-    Transcript:
-    {transcript}
-    """
-    return call_llm(prompt)
+        return None, f"Error fetching transcript: {e}"
+    if status != 200:
+        return None, "Transcript not available or ticker invalid."
+    if not transcript.strip():
+        return None, "Transcript content unavailable."
+    return transcript, None
+
+
+def _summary_progress(summaries) -> str:
+    done = [s for s in summaries if s is not None]
+    return f"*Summarising transcript: {len(done)}/{len(summaries)} parts done...*\n\n" + "\n\n".join(done)
+
+
+def handle_earnings_command(ticker: str, flight):
+    """Map-reduce summary of the transcript; chunk summaries show as progress until the final one is in."""
+    transcript, error = fetch_earnings_transcript(ticker)
+    if error is not None:
+        # Failed fetches are reported, never summarised or cached
+        flight.finish(error=error)
+        return
+    try:
+        summary = earnings_summary.summarise_transcript(
+            ticker, transcript, lambda summaries: flight.set_status(_summary_progress(summaries)))
+    except AllProvidersFailed as e:
+        flight.finish(error=f"Both LLM calls failed: {e}")
+        return
+    flight.finish(summary)
 
 
-def generate_ai_response(command: str) -> str:
+def generate_ai_response(command: str, flight):
     """
-    Handle AI chat commands, including /earnings.
+    Handle AI chat commands, including /earnings. Runs in answer_cache's
+    background thread and streams the answer into `flight`.
     """
-    if command.startswith("/earnings"):
-        parts = command.split()
-        if len(parts) < 2:
-            return "⚠️ Please specify a ticker symbol. Example: `/earnings MSFT`"
-        ticker = parts[1].upper()
-        return handle_earnings_command(ticker)
+    words = command.split()
+    if words[0].lower() == "/earnings":
+        handle_earnings_command(words[1].lstrip("$").upper(), flight)
     else:
         # Default AI response flow
-        prompt = f"""
-        You are an AI assistant for a financial research terminal. 
-        Interpret the following command and return a concise, clear financial analysis with markdown formatting.
-        
-        Command:
-        {command}
-        """
-        return call_llm(prompt)
+        try:
+            for delta, model in router.stream(PROMPT.format(command=command)):
+                flight.append(delta, model)
+        except AllProvidersFailed as e:
+            flight.finish(error=f"Both LLM calls failed: {e}")
 
 
 def render_chat_tab():
@@ -178,7 +170,25 @@ def render_chat_tab():
 
     command = st.text_input("Enter command:", value="/earnings MSFT", key="chat_command_input")
 
-    if command:
+    if command.strip():
+        # The normalised form is only the cache key; the LLM sees what was typed
+        command = command.strip()
+        words = command.split()
+        if words[0].lower() == "/earnings" and len(words) < 2:
+            st.markdown("⚠️ Please specify a ticker symbol. Example: `/earnings MSFT`")
+            return
+
+        output = st.empty()
+        flight = answer_cache.get_answer(command, lambda flight: generate_ai_response(command, flight))
         with st.spinner("Analyzing..."):
-            result = generate_ai_response(command)
-            st.markdown(result)
+            for text in flight.updates():
+                output.markdown(text)
+
+        if flight.error is not None:
+            if not flight.text:
+                output.markdown("⚠️ AI response unavailable.")
+            st.error(flight.error)
+        elif flight.model and flight.model != GROQ_MODEL:
+            st.warning(f"Groq unavailable, answered by fallback model `{flight.model}`.")
+        if flight.cached:
+            st.caption(f"Cached answer (kept for {answer_cache.CHAT_ANSWER_TTL // 60} min).")
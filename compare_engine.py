@@ -0,0 +1,73 @@
+# compare_engine.py - CrowdAlpha | Vectorized multi-ticker comparison
+#
+# All histories are aligned into one dates x symbols matrix; every metric is
+# then a whole-matrix pandas/NumPy operation, so cost grows with the number
+# of cells rather than with per-ticker Python loops.
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+VOL_WINDOW = 21     # one trading month
+
+
+def _session_days(index):
+    """Exchange-local session dates as datetime64[D], so symbols from different timezones line up."""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.to_numpy().astype("datetime64[D]")
+
+
+def align_closes(history) -> pd.DataFrame:
+    """{symbol: OHLCV DataFrame} -> Close matrix on the union of dates (small gaps forward-filled)."""
+    days = {symbol: _session_days(frame.index) for symbol, frame in history.items()}
+    dates = np.unique(np.concatenate(list(days.values()))) if days else np.array([], dtype="datetime64[D]")
+    matrix = np.full((len(dates), len(days)), np.nan)
+    for column, (symbol, frame) in enumerate(history.items()):
+        matrix[np.searchsorted(dates, days[symbol]), column] = frame["Close"].to_numpy(dtype="f8")
+    closes = pd.DataFrame(matrix, index=pd.DatetimeIndex(dates, name="Date"), columns=list(history))
+    # Holidays differ between exchanges; ffill never fills before a listing starts
+    return closes.ffill(limit=5)
+
+
+class Comparison:
+    """Metrics for an aligned Close matrix (rows: dates, columns: symbols)."""
+
+    def __init__(self, closes, vol_window=VOL_WINDOW):
+        self.closes = closes
+        values = closes.to_numpy(dtype="f8")
+
+        first_valid = np.argmax(~np.isnan(values), axis=0)
+        base = values[first_valid, np.arange(values.shape[1])]
+        self.normalised = pd.DataFrame(values / base, index=closes.index, columns=closes.columns)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = np.log(values[1:] / values[:-1])
+        self.returns = pd.DataFrame(returns, index=closes.index[1:], columns=closes.columns)
+        self.rolling_vol = self.returns.rolling(vol_window, min_periods=vol_window).std() * np.sqrt(TRADING_DAYS)
+
+        running_max = np.fmax.accumulate(values, axis=0)
+        self.drawdowns = pd.DataFrame(values / running_max - 1.0, index=closes.index, columns=closes.columns)
+
+    def correlation(self) -> pd.DataFrame:
+        """Pairwise correlation of daily log returns."""
+        return self.returns.corr()
+
+    def summary(self) -> pd.DataFrame:
+        """One row per symbol: total/annualised return, annualised volatility, max drawdown."""
+        days = self.normalised.notna().sum().to_numpy()
+        last = self.normalised.ffill().iloc[-1].to_numpy()
+        years = np.maximum(days / TRADING_DAYS, 1 / TRADING_DAYS)
+        with np.errstate(invalid="ignore"):
+            annual_return = last ** (1.0 / years) - 1.0
+        return pd.DataFrame({
+            "Last": self.closes.ffill().iloc[-1].to_numpy(),
+            "Total Return": last - 1.0,
+            "Annual Return": annual_return,
+            "Annual Vol": self.returns.std().to_numpy() * np.sqrt(TRADING_DAYS),
+            "Max Drawdown": self.drawdowns.min().to_numpy(),
+        }, index=self.closes.columns)
+
+
+def compare(history, vol_window=VOL_WINDOW) -> Comparison:
+    return Comparison(align_closes(history), vol_window)
@@ -1,57 +1,68 @@
-# compare_tab.py - CrowdAlpha | Compare Two Stocks
+# compare_tab.py - CrowdAlpha | Compare a Watchlist of Stocks
 
 import streamlit as st
-import yfinance as yf
 import pandas as pd
+import market_data
+import compare_engine
+
+DEFAULT_WATCHLIST = "AAPL, MSFT, NVDA, AMZN, GOOGL"
+
+
+def _parse_watchlist(text):
+    return list(dict.fromkeys(s.strip().upper() for s in text.replace("\n", ",").split(",") if s.strip()))
+
 
 def render_compare_tab():
     st.header("🆚 Compare Stocks")
-    st.markdown("Enter two stock tickers to compare key metrics and performance.")
+    st.markdown("Enter a watchlist of tickers (comma-separated) to compare performance, risk and key metrics.")
 
     # --- Inputs ---
-    col_input1, col_input2 = st.columns(2)
-    with col_input1:
-        ticker1 = st.text_input("Ticker 1:", value="AAPL", key="ticker1")
-    with col_input2:
-        ticker2 = st.text_input("Ticker 2:", value="MSFT", key="ticker2")
-
-    # --- Data Loading ---
-    def get_ticker_data(symbol):
-        t = yf.Ticker(symbol)
-        info = t.info
-        hist = t.history(period="1mo")
-        return info, hist
-
-    if ticker1 and ticker2:
-        try:
-            info1, hist1 = get_ticker_data(ticker1)
-            info2, hist2 = get_ticker_data(ticker2)
-
-            st.subheader("📈 30-Day Price Comparison")
-            chart_data = pd.DataFrame({
-                ticker1.upper(): hist1['Close'],
-                ticker2.upper(): hist2['Close']
-            })
-            st.line_chart(chart_data)
-
-            st.subheader("📊 Snapshot")
-            col1, col2 = st.columns(2)
-
-            with col1:
-                st.markdown(f"### {ticker1.upper()}")
-                st.markdown(f"**Name:** {info1.get('shortName', 'N/A')}")
-                st.markdown(f"**Sector:** {info1.get('sector', 'N/A')}")
-                st.markdown(f"**Market Cap:** {info1.get('marketCap', 'N/A'):,}")
-                st.markdown(f"**P/E Ratio:** {info1.get('trailingPE', 'N/A')}")
-                st.markdown(f"**52W Range:** {info1.get('fiftyTwoWeekLow', 'N/A')} - {info1.get('fiftyTwoWeekHigh', 'N/A')}")
-
-            with col2:
-                st.markdown(f"### {ticker2.upper()}")
-                st.markdown(f"**Name:** {info2.get('shortName', 'N/A')}")
-                st.markdown(f"**Sector:** {info2.get('sector', 'N/A')}")
-                st.markdown(f"**Market Cap:** {info2.get('marketCap', 'N/A'):,}")
-                st.markdown(f"**P/E Ratio:** {info2.get('trailingPE', 'N/A')}")
-                st.markdown(f"**52W Range:** {info2.get('fiftyTwoWeekLow', 'N/A')} - {info2.get('fiftyTwoWeekHigh', 'N/A')}")
-
-        except Exception as e:
-            st.error(f"Error comparing tickers: {e}")
+    watchlist = st.text_area("Tickers:", value=DEFAULT_WATCHLIST, key="compare_watchlist")
+    col_period, col_window = st.columns(2)
+    with col_period:
+        period = st.selectbox("History:", ["1mo", "6mo", "1y", "5y"], index=2, key="compare_period")
+    with col_window:
+        vol_window = st.number_input("Volatility window (days):", min_value=5, max_value=252, value=21,
+                                     key="compare_vol_window")
+
+    symbols = _parse_watchlist(watchlist)
+    if len(symbols) < 2:
+        st.info("Enter at least two tickers.")
+        return
+
+    try:
+        # One batched history download and concurrent info lookups for all symbols
+        history, infos = market_data.get_snapshot(symbols, period=period)
+        missing = [s for s in symbols if s not in history]
+        if missing:
+            st.warning(f"No price data for: {', '.join(missing)}")
+        if len(history) < 2:
+            return
+        comparison = compare_engine.compare(history, int(vol_window))
+
+        st.subheader(f"📈 Normalised Performance ({period})")
+        st.line_chart(comparison.normalised)
+
+        st.subheader("📊 Snapshot")
+        info = pd.DataFrame.from_dict(infos, orient="index").reindex(comparison.closes.columns)
+        columns = [c for c in ("shortName", "sector", "marketCap", "trailingPE") if c in info]
+        snapshot = comparison.summary().join(info[columns].rename(columns={
+            "shortName": "Name", "sector": "Sector", "marketCap": "Market Cap", "trailingPE": "P/E"
+        }))
+        formats = {
+            "Last": "{:.2f}", "Total Return": "{:.1%}", "Annual Return": "{:.1%}", "Annual Vol": "{:.1%}",
+            "Max Drawdown": "{:.1%}", "Market Cap": "{:,.0f}", "P/E": "{:.1f}"
+        }
+        st.dataframe(snapshot.style.format({k: v for k, v in formats.items() if k in snapshot}, na_rep="N/A"))
+
+        risk_tab, drawdown_tab, corr_tab = st.tabs(["Rolling Volatility", "Drawdowns", "Correlation"])
+        with risk_tab:
+            st.line_chart(comparison.rolling_vol)
+        with drawdown_tab:
+            st.area_chart(comparison.drawdowns)
+        with corr_tab:
+            st.dataframe(comparison.correlation().style.format("{:.2f}").background_gradient(
+                cmap="RdYlGn", vmin=-1, vmax=1))
+
+    except Exception as e:
+        st.error(f"Error comparing tickers: {e}")
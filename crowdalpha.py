@@ -1,131 +1,290 @@
 # crowdalpha.py - CrowdAlpha | Parallel Reddit Sentiment with Groq + OpenRouter Fallback
 
-import praw
+import argparse
 import re
-import time
 import json
 import os
 import hashlib
-import concurrent.futures
-from collections import defaultdict
 from dotenv import load_dotenv
-import openai
+from cache_store import open_cache_store, TieredCache
+from llm_router import router, AllProvidersFailed, GROQ_MODEL, OPENROUTER_MODEL
+from ticker_extract import extract_tickers
+import metrics
+import prefilter
+import near_dup
+import resources
 
 # --- Load Environment ---
 load_dotenv()
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
 # --- Reddit Config ---
 REDDIT_CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
 REDDIT_CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
 REDDIT_USER_AGENT = os.getenv("REDDIT_USER_AGENT", "CrowdAlphaBot/0.2")
 
-reddit = praw.Reddit(
-    client_id=REDDIT_CLIENT_ID,
-    client_secret=REDDIT_CLIENT_SECRET,
-    user_agent=REDDIT_USER_AGENT
-)
 
-# --- LLM Clients ---
-groq_client = openai.OpenAI(api_key=GROQ_API_KEY, base_url="https://api.groq.com/openai/v1")
-openrouter_client = openai.OpenAI(api_key=OPENROUTER_API_KEY, base_url="https://openrouter.ai/api/v1")
 
-# --- Cache File ---
-CACHE_FILE = "llm_cache.json"
-llm_cache = json.load(open(CACHE_FILE)) if os.path.exists(CACHE_FILE) else {}
+@resources.register("reddit")
+def _reddit_client():
+    import praw
+    return praw.Reddit(
+        client_id=REDDIT_CLIENT_ID,
+        client_secret=REDDIT_CLIENT_SECRET,
+        user_agent=REDDIT_USER_AGENT
+    )
+
+
+def get_reddit():
+    """Shared praw client, created on first use."""
+    return resources.get("reddit")
+
+# --- LLM ---
+# Clients, provider health and fallback live in llm_router (shared with chat_tab).
+LLM_ERROR_RESULT = '{"ticker": [], "sentiment": "neutral", "reason": ["LLM error"]}'
 
-# --- Regex for Tickers ---
-TICKER_REGEX = r"\b[A-Z]{2,5}\b|\$[A-Z]{1,5}\b"
+# --- Prompt Template ---
+THESIS_PROMPT = """
+    You are a financial analyst AI. Read the Reddit post below and extract JSON:
+    {{
+      "ticker": ["TICKER1","TICKER2"],
+      "sentiment": "bullish/bearish/neutral",
+      "reason": ["reason1","reason2"]
+    }}
+    Post:
+    \"\"\"{text}\"\"\"
+    """
+
+BATCH_PROMPT = """
+    You are a financial analyst AI. Read each Reddit post below and return ONLY a JSON
+    array with exactly one object per post, using the post id given in its header:
+    [
+      {{"id": "p0", "ticker": ["TICKER1","TICKER2"], "sentiment": "bullish/bearish/neutral", "reason": ["reason1","reason2"]}}
+    ]
+    Posts:
+    {posts}
+    """
 
+# --- Batching ---
+# Several posts are packed into one completion up to a rough token budget
+# (llama3-70b-8192 has an 8k context; leave room for the JSON answer).
+BATCH_MAX_POSTS = int(os.getenv("LLM_BATCH_MAX_POSTS", 8))
+BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", 5000))
+
+# --- Cache Store ---
+# Opened lazily on first lookup; the old llm_cache.json is imported into it once.
+# Entries are keyed by post hash + prompt template + model, so editing the
+# prompt or switching models never serves stale answers.
+CACHE_FILE = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+LEGACY_CACHE_FILE = "llm_cache.json"
+CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+FALLBACK_CACHE_TTL = int(os.getenv("LLM_CACHE_FALLBACK_TTL", 24 * 3600))
+
+
+def _legacy_entry(post_hash, result):
+    """llm_cache.json held bare {post hash: result} Groq answers; import them as Groq entries for CACHE_TTL."""
+    if not isinstance(result, dict) or "sentiment" not in result or result.get("reason") == ["LLM error"]:
+        return None
+    return get_cache_key(post_hash, GROQ_MODEL), TieredCache.envelope(result, CACHE_TTL)
+
+
+llm_cache = TieredCache(
+    open_cache_store(
+        CACHE_FILE,
+        backend=os.getenv("LLM_CACHE_BACKEND"),
+        legacy_json=LEGACY_CACHE_FILE,
+        legacy_convert=_legacy_entry
+    ),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10_000)),
+    ttl=CACHE_TTL
+)
 
 def get_post_hash(text: str) -> str:
     return hashlib.sha256(text.encode()).hexdigest()
 
 
-def extract_tickers(text):
-    tickers = re.findall(TICKER_REGEX, text.upper())
-    return list(set([t.replace("$", "") for t in tickers if len(t) <= 5]))
+PROMPT_VERSION = get_post_hash(THESIS_PROMPT)[:12]
 
+# --- Last group_posts_by_ticker run (posts/s, LLM calls/post, calls avoided) ---
+pipeline_stats = {}
 
-def call_llm(prompt: str):
-    """Try Groq first, then fallback to OpenRouter."""
+
+def get_cache_key(post_id: str, model: str) -> str:
+    return f"{post_id}:{PROMPT_VERSION}:{model}"
+
+
+def get_cached_thesis(post_id: str):
+    """Look up a cached result, preferring answers from the primary model."""
+    cached = llm_cache.get_first([get_cache_key(post_id, model) for model in (GROQ_MODEL, OPENROUTER_MODEL)])
+    metrics.record_cache_lookup("llm", cached is not None)
+    return cached
+
+
+def find_cached_thesis(post_id: str, text: str, source_id=None):
+    """
+    Exact cache hit, else the cached result of an analysed near-duplicate
+    (repost, crosspost, lightly edited copy). `source_id` is the Reddit post
+    id: earlier versions of an edited post are not duplicates of it.
+    Returns (result or None, post_id of the near-duplicate or None).
+    """
+    cached = get_cached_thesis(post_id)
+    if cached is not None or not near_dup.NEAR_DUP_ENABLED:
+        return cached, None
+    duplicate_of = near_dup.index.find(text, exclude=post_id, source_id=source_id)
+    if duplicate_of is None:
+        return None, None
+    cached = get_cached_thesis(duplicate_of)
+    if cached is None:
+        return None, None
+    metrics.inc("near_duplicates_total")
+    return cached, duplicate_of
+
+
+def cache_thesis(post_id: str, result, model, text=None, source_id=None):
+    """Cache a result under the model that produced it. LLM errors are not cached."""
+    if model is None:
+        return
+    ttl = CACHE_TTL if model == GROQ_MODEL else FALLBACK_CACHE_TTL
+    llm_cache.put(get_cache_key(post_id, model), result, ttl=ttl)
+    if text is not None and near_dup.NEAR_DUP_ENABLED:
+        near_dup.index.add(post_id, text, source_id)
+
+
+def call_llm_with_model(prompt: str):
+    """Route to the healthiest provider (Groq preferred). Returns (text, model used or None)."""
     try:
-        response = groq_client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        print("Groq failed, fallback to OpenRouter:", e)
-        try:
-            response = openrouter_client.chat.completions.create(
-                model="meta-llama/llama-3-8b-instruct:free",
-                messages=[{"role": "user", "content": prompt}]
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print("Both LLM calls failed:", e)
-            return '{"ticker": [], "sentiment": "neutral", "reason": ["LLM error"]}'
+        with metrics.timer("call_llm"):
+            return router.complete(prompt)
+    except AllProvidersFailed as e:
+        metrics.inc("llm_all_providers_failed_total")
+        print("Both LLM calls failed:", e)
+        return LLM_ERROR_RESULT, None
+
+
+def call_llm(prompt: str):
+    """Route to the healthiest provider (Groq preferred)."""
+    return call_llm_with_model(prompt)[0]
 
 
+@metrics.timer("extract_thesis_from_post")
 def extract_thesis_from_post(text):
     """
     Analyze Reddit post to extract ticker, sentiment, and reasons.
     Uses cache to avoid repeated calls.
     """
     post_id = get_post_hash(text)
-    if post_id in llm_cache:
-        return llm_cache[post_id]
+    cached, _ = find_cached_thesis(post_id, text)
+    if cached is not None:
+        return cached
+    return analyze_post(post_id, text)
 
-    prompt = f"""
-    You are a financial analyst AI. Read the Reddit post below and extract JSON:
-    {{
-      "ticker": ["TICKER1","TICKER2"],
-      "sentiment": "bullish/bearish/neutral",
-      "reason": ["reason1","reason2"]
-    }}
-    Post:
-    \"\"\"{text}\"\"\"
-    """
 
-    raw = call_llm(prompt)
+def analyze_post(post_id: str, text: str):
+    """Single-post LLM extraction, skipping the cache lookup."""
+    raw, model = call_llm_with_model(THESIS_PROMPT.format(text=text))
+    result = parse_thesis(raw)
 
-    # Extract JSON safely
+    # Cache result
+    cache_thesis(post_id, result, model, text)
+    return result
+
+
+def parse_thesis(raw: str):
+    """Extract the JSON result from a single-post answer safely."""
     match = re.search(r"\{.*\}", raw, re.DOTALL)
     if match:
         try:
-            result = json.loads(match.group(0))
+            return json.loads(match.group(0))
         except json.JSONDecodeError:
-            result = {"ticker": [], "sentiment": "neutral", "reason": ["JSON parse error"]}
-    else:
-        result = {"ticker": [], "sentiment": "neutral", "reason": ["Invalid LLM output"]}
-
-    # Cache result
-    llm_cache[post_id] = result
-    json.dump(llm_cache, open(CACHE_FILE, "w"), indent=2)
-    return result
+            return {"ticker": [], "sentiment": "neutral", "reason": ["JSON parse error"]}
+    return {"ticker": [], "sentiment": "neutral", "reason": ["Invalid LLM output"]}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for batch packing."""
+    return len(text) // 4 + 1
+
+
+def pack_batches(items, max_posts=BATCH_MAX_POSTS, token_budget=BATCH_TOKEN_BUDGET):
+    """Group (post_id, text) pairs into batches that fit the token budget."""
+    batches, current, used = [], [], 0
+    for post_id, text in items:
+        cost = estimate_tokens(text)
+        if current and (len(current) >= max_posts or used + cost > token_budget):
+            batches.append(current)
+            current, used = [], 0
+        current.append((post_id, text))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_batch_response(raw: str, ids):
+    """Map post ids to results from a batch answer; missing or malformed ids are left out."""
+    match = re.search(r"\[.*\]", raw, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    results = {}
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict) and item.get("id") in ids and "sentiment" in item:
+            results[item["id"]] = {
+                "ticker": item.get("ticker") or [],
+                "sentiment": item["sentiment"],
+                "reason": item.get("reason") or []
+            }
+    return results
+
+
+def build_batch_prompt(batch):
+    """Build the multi-post prompt for [(post_id, text), ...]. Returns (prompt, {local id: post_id})."""
+    local_ids = {f"p{i}": post_id for i, (post_id, _) in enumerate(batch)}
+    posts_block = "\n".join(
+        f'--- id: p{i} ---\n\"\"\"{text}\"\"\"' for i, (_, text) in enumerate(batch)
+    )
+    return BATCH_PROMPT.format(posts=posts_block), local_ids
+
+
+def is_relevant_submission(submission) -> bool:
+    return not submission.stickied and len(submission.title) > 15
+
+
+def submission_to_post(submission):
+    return {
+        "id": submission.id,
+        "subreddit": submission.subreddit.display_name,
+        "created_utc": submission.created_utc,
+        "edited": submission.edited or 0,
+        "title": submission.title,
+        "selftext": submission.selftext or "",
+        "url": submission.url
+    }
 
 
 def fetch_reddit_posts(subreddit="stocks", limit=10):
     posts = []
     try:
-        for submission in reddit.subreddit(subreddit).hot(limit=limit):
-            if not submission.stickied and len(submission.title) > 15:
-                posts.append({
-                    "title": submission.title,
-                    "selftext": submission.selftext or "",
-                    "url": submission.url
-                })
+        with metrics.timer("fetch_reddit_posts", subreddit=subreddit):
+            for submission in get_reddit().subreddit(subreddit).hot(limit=limit):
+                if is_relevant_submission(submission):
+                    posts.append(submission_to_post(submission))
     except Exception as e:
         print(f"Error fetching Reddit posts: {e}")
     return posts
 
 
-def process_post(post):
-    """Process one Reddit post (parallel safe)."""
-    full_text = post['title'] + "\n" + post['selftext']
-    llm_result = extract_thesis_from_post(full_text)
+def get_post_text(post) -> str:
+    return post['title'] + "\n" + post['selftext']
+
+
+def analyse_post(post, llm_result=None):
+    """(tickers, summary, sentiment) of one post (parallel safe). Pass `llm_result` if already extracted."""
+    full_text = get_post_text(post)
+    if llm_result is None:
+        llm_result = prefilter.classify_post(post) or extract_thesis_from_post(full_text)
     tickers = llm_result.get("ticker") or extract_tickers(full_text)
     if not tickers:
         tickers = ["UNCATEGORIZED"]
@@ -136,28 +295,53 @@ def process_post(post):
         if r and r.lower() not in ["unknown", "n/a", "none"]
     ]
     summary = "; ".join(reasons) if reasons else "No clear reason provided by AI."
+    return tickers, summary, llm_result.get("sentiment", "neutral")
 
+
+def process_post(post, llm_result=None):
+    """Per-ticker dict copies of one post, for callers that want the grouped dict shape."""
+    tickers, summary, sentiment = analyse_post(post, llm_result)
     for ticker in tickers:
         yield ticker, {
             "title": post['title'],
             "selftext": post['selftext'],
             "url": post['url'],
             "summary": summary,
-            "sentiment": llm_result.get("sentiment", "neutral")
+            "sentiment": sentiment
         }
 
 
+def record_pipeline_stats(posts, calls, elapsed, first_result=None, prefiltered=0, near_duplicates=0):
+    metrics.inc("posts_analyzed_total", posts)
+    metrics.inc("llm_calls_avoided_total", prefiltered)
+    pipeline_stats.update({
+        "posts": posts,
+        "llm_calls": calls,
+        "llm_calls_avoided": prefiltered,
+        "near_duplicates": near_duplicates,
+        "dedup_rate": near_duplicates / posts if posts else 0.0,
+        "seconds": elapsed,
+        "time_to_first_result": first_result,
+        "posts_per_second": posts / elapsed if elapsed else 0.0,
+        "calls_per_post": calls / posts if posts else 0.0
+    })
+    print(f"Analyzed {posts} posts in {elapsed:.2f}s "
+          f"({pipeline_stats['posts_per_second']:.1f} posts/s, {pipeline_stats['calls_per_post']:.2f} LLM calls/post, "
+          f"{prefiltered} posts answered by the pre-filter, {near_duplicates} near-duplicates reused)")
+
+
 def group_posts_by_ticker(posts):
-    grouped = defaultdict(list)
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = [executor.submit(process_post, post) for post in posts]
-        for future in concurrent.futures.as_completed(futures):
-            try:
-                for ticker, processed_post in future.result():
-                    grouped[ticker].append(processed_post)
-            except Exception as e:
-                print(f"Error processing post: {e}")
-    return grouped
+    """Group already-fetched posts by ticker (thin wrapper over the async pipeline)."""
+    # Imported here because async_pipeline builds on this module
+    import async_pipeline
+    with metrics.timer("group_posts_by_ticker"):
+        return async_pipeline.run(posts=posts).grouped()
+
+
+def fetch_and_group_posts(subreddit="stocks", limit=10):
+    """Fetch and analyse posts concurrently: analysis starts as soon as the first posts arrive."""
+    import async_pipeline
+    return async_pipeline.run(subreddit=subreddit, limit=limit).grouped()
 
 
 def display_grouped_posts(grouped):
@@ -169,10 +353,54 @@ def display_grouped_posts(grouped):
 
 
 def run():
-    posts = fetch_reddit_posts()
-    grouped = group_posts_by_ticker(posts)
+    grouped = fetch_and_group_posts()
     display_grouped_posts(grouped)
 
 
+def main():
+    parser = argparse.ArgumentParser(description="CrowdAlpha - Reddit-powered stock insights")
+    sub = parser.add_subparsers(dest="command")
+    worker_parser = sub.add_parser("worker", help="Continuously ingest posts and publish snapshots for the UI")
+    worker_parser.add_argument("--interval", type=int, default=60, help="Seconds between ingestion cycles")
+    worker_parser.add_argument("--subreddits", help="Comma-separated list (default: REDDIT_SUBREDDITS)")
+    worker_parser.add_argument("--once", action="store_true", help="Run a single cycle and exit")
+    backfill_parser = sub.add_parser("backfill", help="Analyse historical posts into the ticker index with several "
+                                                      "processes; re-run the same command to resume")
+    backfill_parser.add_argument("--subreddits", help="Comma-separated list (default: REDDIT_SUBREDDITS)")
+    backfill_parser.add_argument("--since", default="30d", help="Start of the window: '30d' or a date (UTC)")
+    backfill_parser.add_argument("--until", help="End of the window as a date (UTC; default: now)")
+    backfill_parser.add_argument("--dump", help="JSON-lines submissions dump (.jsonl or .jsonl.gz); without it "
+                                                "posts come from the Reddit listings, which stop at ~1000 posts")
+    backfill_parser.add_argument("--workers", type=int, help="Worker processes (default: BACKFILL_WORKERS)")
+    backfill_parser.add_argument("--job", help="Job name (default: derived from the arguments)")
+    sub.add_parser("update-symbols", help="Download the NASDAQ/NYSE symbol directory used for ticker extraction")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        import worker
+        subreddits = args.subreddits.split(",") if args.subreddits else None
+        if args.once:
+            worker.run_once(subreddits)
+        else:
+            worker.run_forever(args.interval, subreddits)
+    elif args.command == "backfill":
+        import backfill
+        import reddit_ingest
+        subreddits = args.subreddits.split(",") if args.subreddits else reddit_ingest.SUBREDDITS
+        backfill.backfill(
+            args.job or backfill.job_name(subreddits, args.since, args.until, args.dump),
+            subreddits,
+            after=backfill.parse_time(args.since),
+            before=backfill.parse_time(args.until) if args.until else None,
+            dump=args.dump,
+            workers=args.workers or backfill.BACKFILL_WORKERS,
+        )
+    elif args.command == "update-symbols":
+        import ticker_extract
+        print(f"Loaded {ticker_extract.update_symbols()} symbols into {ticker_extract.FULL_SYMBOLS_FILE}")
+    else:
+        run()
+
+
 if __name__ == "__main__":
-    run()
+    main()
@@ -0,0 +1,91 @@
+# diagnostics_tab.py - CrowdAlpha | Pipeline Diagnostics (hidden tab)
+#
+# Stage timings, LLM latency/tokens/retries/errors and cache hit ratios from
+# the metrics registry. Open it with `?diagnostics=1` in the app URL or
+# CROWDALPHA_DIAGNOSTICS=1.
+import streamlit as st
+import pandas as pd
+import metrics
+import resources
+from llm_router import router
+
+CACHES = ("llm", "chat", "http", "market_history", "market_info")
+
+
+def _render_registry(registry):
+    providers = sorted({dict(labels).get("provider") for name, labels in registry.counters
+                        if name.startswith("llm_") and dict(labels).get("provider")})
+
+    # --- Headline numbers ---
+    columns = st.columns(4)
+    columns[0].metric("Posts analysed", f"{registry.counter('posts_analyzed_total'):.0f}")
+    hits = registry.counter("cache_lookups_total", cache="llm", result="hit")
+    lookups = registry.counter("cache_lookups_total", cache="llm")
+    columns[1].metric("LLM cache hit ratio", f"{hits / lookups:.0%}" if lookups else "-")
+    columns[2].metric("LLM tokens", f"{registry.counter('llm_tokens_total'):,.0f}")
+    columns[3].metric("LLM errors", f"{registry.counter('llm_errors_total'):.0f}",
+                      delta=f"{registry.counter('llm_retries_total'):.0f} retries", delta_color="off")
+
+    # --- Stage timings ---
+    stages = [row for row in registry.histogram_rows() if row["metric"] == "stage_seconds"]
+    if stages:
+        st.markdown("**Stage timings (seconds)**")
+        st.dataframe(pd.DataFrame(stages).drop(columns="metric").set_index("stage")
+                     .style.format(precision=3, na_rep="-"))
+
+    # --- LLM providers ---
+    if providers:
+        st.markdown("**LLM providers**")
+        latency = {row["provider"]: row for row in registry.histogram_rows() if row["metric"] == "llm_request_seconds"}
+        st.dataframe(pd.DataFrame([{
+            "provider": provider,
+            "requests": registry.counter("llm_requests_total", provider=provider),
+            "errors": registry.counter("llm_errors_total", provider=provider),
+            "retries": registry.counter("llm_retries_total", provider=provider),
+            "rate limited": registry.counter("llm_rate_limited_total", provider=provider),
+            "prompt tokens": registry.counter("llm_tokens_total", provider=provider, kind="prompt"),
+            "completion tokens": registry.counter("llm_tokens_total", provider=provider, kind="completion"),
+            "p50 (s)": latency.get(provider, {}).get("p50"),
+            "p95 (s)": latency.get(provider, {}).get("p95"),
+        } for provider in providers]).set_index("provider").style.format(precision=2, na_rep="-"))
+
+    # --- Caches ---
+    cache_rows = []
+    for cache in CACHES:
+        total = registry.counter("cache_lookups_total", cache=cache)
+        if total:
+            hits = registry.counter("cache_lookups_total", cache=cache, result="hit")
+            cache_rows.append({"cache": cache, "lookups": total, "hit ratio": hits / total})
+    if cache_rows:
+        st.markdown("**Caches**")
+        st.dataframe(pd.DataFrame(cache_rows).set_index("cache").style.format({"hit ratio": "{:.0%}", "lookups": "{:.0f}"}))
+
+    with st.expander("All counters"):
+        st.dataframe(pd.DataFrame(registry.counter_rows()))
+
+
+def render_diagnostics_tab():
+    st.header("🩺 Diagnostics")
+
+    source = st.radio("Metrics from:", ["This app", "Background worker"], horizontal=True, key="diagnostics_source")
+    if source == "This app":
+        registry = metrics.registry
+        st.caption(f"Collected since {pd.Timestamp(registry.started, unit='s'):%Y-%m-%d %H:%M:%S} UTC.")
+    else:
+        registry = metrics.load()
+        if registry is None:
+            st.info(f"No worker metrics yet. The worker writes them to `{metrics.METRICS_FILE}` after every cycle.")
+            return
+
+    if not registry.counters and not registry.histograms:
+        st.info("Nothing recorded yet.")
+    else:
+        _render_registry(registry)
+        st.download_button("📄 Prometheus text", registry.render(), "crowdalpha_metrics.prom")
+
+    st.markdown("**Provider health**")
+    st.dataframe(pd.DataFrame(router.health()).T)
+
+    if resources.stats:
+        st.markdown("**Shared clients** (created on first use)")
+        st.dataframe(pd.DataFrame({"created in (s)": resources.stats}).style.format(precision=3))
@@ -0,0 +1,184 @@
+# earnings_summary.py - CrowdAlpha | Chunked map-reduce summaries of earnings call transcripts
+#
+# A full call does not fit the 8k context of llama3-70b-8192. The transcript
+# is split on speaker/section boundaries into chunks that fit a token budget,
+# the chunks are summarised in parallel (map) and the chunk summaries are
+# merged into the final bullet points (reduce). Summaries are cached by a hash
+# of the whole prompt (template, ticker, part and text), so asking for the
+# same transcript again skips the map step.
+
+import concurrent.futures
+import hashlib
+import os
+import re
+
+from cache_store import open_cache_store, TieredCache
+from llm_router import router, AllProvidersFailed
+
+# --- Config ---
+SUMMARY_CACHE_FILE = os.getenv("SUMMARY_CACHE_PATH", "summary_cache.db")
+SUMMARY_CACHE_TTL = 30 * 24 * 3600      # transcripts don't change
+CHUNK_TOKEN_BUDGET = int(os.getenv("EARNINGS_CHUNK_TOKENS", 2500))
+MAP_WORKERS = int(os.getenv("EARNINGS_MAP_WORKERS", 4))
+
+MAP_PROMPT = """
+You are reading part {part} of {parts} of the {ticker} earnings call transcript.
+Summarize this part in at most 6 short bullet points. Keep every figure that is
+mentioned (revenue, EPS, margins, guidance, growth rates) and who said it.
+
+Transcript part:
+{text}
+"""
+
+REDUCE_PROMPT = """
+Below are summaries of consecutive parts of the {ticker} earnings call transcript.
+Combine them into one summary in bullet points.
+Include revenue, EPS, key themes, and sentiment (bullish/bearish/neutral).
+
+Part summaries:
+{text}
+"""
+
+FULL_PROMPT = """
+Summarize the following earnings call transcript for {ticker} in bullet points:
+Include revenue, EPS, key themes, and sentiment (bullish/bearish/neutral).
+
+Transcript:
+{text}
+"""
+
+# "Satya Nadella -- Chairman and Chief Executive Officer", "Operator", "Questions & Answers:"
+SPEAKER_REGEX = re.compile(
+    r"^(?:[A-Z][\w.'\-]*(?: [A-Z][\w.'\-]*){0,4} -- .{2,80}|Operator|Prepared Remarks:?|Questions (?:and|&) Answers:?)$"
+)
+
+MAP_FAILED = "(summary unavailable for this part)"
+
+summary_cache = TieredCache(open_cache_store(SUMMARY_CACHE_FILE), max_entries=2_000, ttl=SUMMARY_CACHE_TTL)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def _content_key(prompt_template, text, **fields) -> str:
+    """Hash of everything that goes into the prompt: template, text and the format fields (ticker, part...)."""
+    field_text = "\0".join(f"{name}={fields[name]}" for name in sorted(fields))
+    return hashlib.sha256(f"{prompt_template}\0{field_text}\0{text}".encode()).hexdigest()
+
+
+# --- Chunking ---
+def split_sections(transcript):
+    """Split on speaker/section headings; each section keeps its heading."""
+    sections, current = [], []
+    for line in transcript.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if SPEAKER_REGEX.match(line) and current:
+            sections.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("\n".join(current))
+    return sections
+
+
+def _split_oversized(section, budget):
+    """Fall back to sentence boundaries for a single section larger than the budget."""
+    pieces, current = [], ""
+    for sentence in re.split(r"(?<=[.!?])\s+", section):
+        while estimate_tokens(sentence) > budget:
+            # One enormous "sentence": hard cut on characters
+            head, sentence = sentence[:budget * 4], sentence[budget * 4:]
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(head)
+        if current and estimate_tokens(current + " " + sentence) > budget:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_transcript(transcript, budget=CHUNK_TOKEN_BUDGET):
+    """Pack whole sections into chunks of at most `budget` tokens."""
+    chunks, current, used = [], [], 0
+    for section in split_sections(transcript):
+        for piece in _split_oversized(section, budget) if estimate_tokens(section) > budget else [section]:
+            cost = estimate_tokens(piece)
+            if current and used + cost > budget:
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += cost
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+# --- Map / Reduce ---
+def _summarise(prompt_template, text, **fields):
+    """One cached completion. Returns the summary, or None if every provider failed."""
+    key = _content_key(prompt_template, text, **fields)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        summary, _ = router.complete(prompt_template.format(text=text, **fields))
+    except AllProvidersFailed as e:
+        print(f"Chunk summary failed: {e}")
+        return None
+    summary_cache.put(key, summary)
+    return summary
+
+
+def map_chunks(ticker, chunks, on_partial=None):
+    """
+    Summarise chunks in parallel. `on_partial(summaries)` is called from the
+    calling thread each time a chunk finishes, with None for pending chunks.
+    """
+    summaries = [None] * len(chunks)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAP_WORKERS) as executor:
+        futures = {
+            executor.submit(_summarise, MAP_PROMPT, chunk, ticker=ticker, part=i + 1, parts=len(chunks)): i
+            for i, chunk in enumerate(chunks)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            summaries[futures[future]] = future.result() or MAP_FAILED
+            if on_partial is not None:
+                on_partial(summaries)
+    return summaries
+
+
+def reduce_summaries(ticker, summaries, budget=CHUNK_TOKEN_BUDGET):
+    """Merge chunk summaries, first collapsing them in groups if they don't fit one prompt."""
+    while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > budget:
+        groups = chunk_transcript("\n\n".join(summaries), budget)
+        if len(groups) >= len(summaries):
+            break   # summaries are individually too large to merge further
+        summaries = [_summarise(REDUCE_PROMPT, group, ticker=ticker) or group for group in groups]
+    final = _summarise(REDUCE_PROMPT, "\n\n".join(summaries), ticker=ticker)
+    if final is None:
+        raise AllProvidersFailed("reduce step failed")
+    return final
+
+
+def summarise_transcript(ticker, transcript, on_partial=None) -> str:
+    """Bullet-point summary of a full transcript (map-reduce over chunks)."""
+    chunks = chunk_transcript(transcript)
+    if not chunks:
+        return "Transcript content unavailable."
+    if len(chunks) == 1:
+        summary = _summarise(FULL_PROMPT, chunks[0], ticker=ticker)
+        if summary is None:
+            raise AllProvidersFailed("summary failed")
+        return summary
+    summaries = map_chunks(ticker, chunks, on_partial)
+    if all(s == MAP_FAILED for s in summaries):
+        raise AllProvidersFailed("every chunk summary failed")
+    return reduce_summaries(ticker, [s for s in summaries if s != MAP_FAILED])
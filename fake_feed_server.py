@@ -0,0 +1,122 @@
+# fake_feed_server.py - CrowdAlpha | Local stand-in for the Yahoo Finance headline RSS feeds
+#
+# Serves one RSS feed per ticker with ETag and Last-Modified headers and
+# answers conditional requests with 304. A share of the headlines is
+# syndicated across tickers (same story, per-ticker tracking parameters on
+# the link) so cross-ticker dedup has something to do.
+# Usage:
+#   python fake_feed_server.py --port 8003
+#   NEWS_FEED_URL='http://127.0.0.1:8003/rss/2.0/headline?s={ticker}' streamlit run app.py
+
+import argparse
+import hashlib
+import threading
+import time
+import urllib.parse
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+
+def render_feed(ticker, version=1, items=20, shared_every=4, now=None):
+    """RSS for `ticker`; every `shared_every`-th item is a story all tickers carry."""
+    now = now or time.time()
+    entries = []
+    for i in range(items):
+        if i % shared_every == 0:
+            slug, title = f"market-wrap-{version}-{i}", f"Stocks move as traders weigh rates outlook (part {version}.{i})"
+        else:
+            slug, title = f"{ticker.lower()}-{version}-{i}", f"{ticker} shares update {version}.{i}: analysts revise targets"
+        published = formatdate(now - 600 * (i + 1) - 60 * version, usegmt=True)
+        entries.append(
+            f"<item><title>{escape(title)}</title>"
+            f"<link>https://finance.example.com/news/{slug}.html?.tsrc=rss&amp;s={ticker}</link>"
+            f"<description>{escape(title)}. More detail on {ticker} follows.</description>"
+            f"<pubDate>{published}</pubDate><guid>{slug}</guid></item>"
+        )
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>Headlines for {ticker}</title>{''.join(entries)}</channel></rss>")
+
+
+class FakeFeedServer(ThreadingHTTPServer):
+    """Bump `version` to simulate new headlines on every feed."""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, items=20):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.items = items
+        self.version = 1
+        self.modified = time.time()
+        self.stats = {"200": 0, "304": 0, "404": 0}
+        self.lock = threading.Lock()
+
+    @property
+    def feed_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/rss/2.0/headline?s={{ticker}}"
+
+    def bump(self):
+        with self.lock:
+            self.version += 1
+            self.modified = time.time()
+
+    def count(self, status):
+        with self.lock:
+            self.stats[str(status)] += 1
+
+    def handle_error(self, request, client_address):
+        pass
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        ticker = urllib.parse.parse_qs(url.query).get("s", [""])[0].upper()
+        if url.path != "/rss/2.0/headline" or not ticker:
+            self.server.count(404)
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        time.sleep(self.server.latency)
+        feed = render_feed(ticker, self.server.version, self.server.items, now=self.server.modified).encode()
+        etag = f'"{hashlib.sha1(feed).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.server.count(304)
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.server.count(200)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/rss+xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(feed)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(self.server.modified, usegmt=True))
+        self.end_headers()
+        self.wfile.write(feed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for per-ticker headline RSS feeds")
+    parser.add_argument("--port", type=int, default=8003)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = FakeFeedServer(args.port, latency=args.latency)
+    print(f"Fake feed server: NEWS_FEED_URL='{server.feed_url}'")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
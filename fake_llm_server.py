@@ -0,0 +1,187 @@
+# fake_llm_server.py - CrowdAlpha | Local OpenAI-compatible server for load and failure testing
+#
+# Usage:
+#   python fake_llm_server.py --port 8001 --rpm 60 --failure-rate 0.05
+#   GROQ_BASE_URL=http://127.0.0.1:8001/v1 streamlit run app.py
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = '{"ticker": ["TSLA"], "sentiment": "bullish", "reason": ["Simulated answer"]}'
+BATCH_POST_REGEX = re.compile(r'--- id: (p\d+) ---\n"""(.*?)"""', re.DOTALL)
+POST_REGEX = re.compile(r'"""(.*?)"""', re.DOTALL)
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """
+    Answers POST .../chat/completions with a canned reply after `latency`
+    seconds. Requests beyond `rpm` (enforced over a sliding `window`) get a 429
+    with Retry-After, and `failure_rate` of the rest get a random 429 too.
+
+    With `answers` ({sha256 of post text: result dict}, e.g. recorded
+    fixtures) thesis prompts are answered per post and batch prompts with one
+    array item per post id; unknown posts get the default reply.
+
+    `stream: true` requests get the reply as server-sent events, one chunk
+    per word, `token_latency` seconds apart; other requests wait out the same
+    generation time before answering.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, rpm=60, window=60.0, latency=0.0, failure_rate=0.0, reply=DEFAULT_REPLY,
+                 answers=None, token_latency=0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.quota = max(1, round(rpm * window / 60.0))
+        self.window = window
+        self.latency = latency
+        self.token_latency = token_latency
+        self.failure_rate = failure_rate
+        self.reply = reply
+        self.answers = answers
+        self.accepted = deque()
+        self.stats = {"ok": 0, "rate_limited": 0, "injected": 0}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def admit(self):
+        """Returns None if the request is within quota, else the Retry-After seconds."""
+        with self.lock:
+            now = time.monotonic()
+            while self.accepted and now - self.accepted[0] >= self.window:
+                self.accepted.popleft()
+            if len(self.accepted) >= self.quota:
+                self.stats["rate_limited"] += 1
+                return self.window - (now - self.accepted[0])
+            if random.random() < self.failure_rate:
+                self.stats["injected"] += 1
+                return 1.0
+            self.accepted.append(now)
+            self.stats["ok"] += 1
+            return None
+
+    def _answer(self, text):
+        answer = self.answers.get(hashlib.sha256(text.encode()).hexdigest())
+        return answer if answer is not None else json.loads(self.reply)
+
+    def respond(self, prompt) -> str:
+        """Reply content for `prompt`."""
+        if self.answers is None:
+            return self.reply
+        batch = BATCH_POST_REGEX.findall(prompt)
+        if batch:
+            return json.dumps([dict(self._answer(text), id=local_id) for local_id, text in batch])
+        match = POST_REGEX.search(prompt)
+        return json.dumps(self._answer(match.group(1))) if match else self.reply
+
+    def handle_error(self, request, client_address):
+        pass  # clients that time out or lose a hedged race drop the connection
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def _words(reply):
+    return re.findall(r"\s*\S+", reply) or [reply]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, model, reply):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i, word in enumerate(_words(reply)):
+            if i:
+                time.sleep(self.server.token_latency)
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, {"error": {"message": "not found"}})
+            return
+
+        retry_after = self.server.admit()
+        if retry_after is not None:
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                       {"Retry-After": f"{retry_after:.3f}"})
+            return
+
+        time.sleep(self.server.latency)
+        messages = request.get("messages", [])
+        reply = self.server.respond(messages[-1].get("content", "") if messages else "")
+        if request.get("stream"):
+            self._stream(request.get("model", "fake"), reply)
+            return
+        time.sleep(self.server.token_latency * (len(_words(reply)) - 1))
+        prompt_tokens = sum(len(m.get("content", "")) // 4 + 1 for m in messages)
+        completion_tokens = len(reply) // 4 + 1
+        self._send(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--rpm", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.02, help="Seconds between streamed words")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.port, rpm=args.rpm, latency=args.latency, failure_rate=args.failure_rate,
+                           token_latency=args.token_latency)
+    print(f"Fake LLM server on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# fake_reddit.py - CrowdAlpha | Offline stand-in for the praw.Reddit client
+#
+# Replays recorded posts (fixtures/reddit_posts.jsonl) through the subset of
+# the praw API the pipeline uses: subreddit(name).hot()/new() listings and
+# info(fullnames). Listings are paged like Reddit's (100 per request), with
+# simulated per-request latency and failures.
+#   resources.override("reddit", FakeReddit(load_posts(), latency=0.3))
+
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+POSTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "reddit_posts.jsonl")
+PAGE_SIZE = 100
+
+
+class FakeRedditError(Exception):
+    pass
+
+
+def load_posts(path=POSTS_FILE) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def to_submission(post):
+    """praw.models.Submission look-alike for a `crowdalpha.submission_to_post` dict."""
+    return SimpleNamespace(
+        id=post["id"],
+        subreddit=SimpleNamespace(display_name=post["subreddit"]),
+        created_utc=post["created_utc"],
+        edited=post.get("edited") or False,
+        title=post["title"],
+        selftext=post["selftext"],
+        url=post["url"],
+        stickied=post.get("stickied", False),
+    )
+
+
+class FakeReddit:
+    def __init__(self, posts, latency=0.0, failure_rate=0.0, seed=None):
+        self.posts = posts
+        self._by_id = {p["id"]: p for p in posts}
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.stats = {"requests": 0, "failures": 0}
+        self.request_latencies = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _request(self):
+        """One simulated API round trip."""
+        start = time.perf_counter()
+        time.sleep(self.latency)
+        with self._lock:
+            self.stats["requests"] += 1
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.stats["failures"] += 1
+        self.request_latencies.append(time.perf_counter() - start)
+        if failed:
+            raise FakeRedditError("simulated Reddit API failure")
+
+    def _listing(self, posts, limit):
+        posts = posts[:limit] if limit is not None else posts
+        for offset in range(0, len(posts), PAGE_SIZE):
+            self._request()
+            for post in posts[offset:offset + PAGE_SIZE]:
+                yield to_submission(post)
+
+    def subreddit(self, name):
+        posts = [p for p in self.posts if name in ("all", p["subreddit"])]
+        newest = sorted(posts, key=lambda p: p["created_utc"], reverse=True)
+        return SimpleNamespace(
+            hot=lambda limit=100: self._listing(posts, limit),
+            new=lambda limit=100: self._listing(newest, limit),
+        )
+
+    def info(self, fullnames):
+        self._request()
+        ids = (name.split("_", 1)[-1] for name in fullnames)
+        return iter([to_submission(self._by_id[i]) for i in ids if i in self._by_id])
@@ -0,0 +1,116 @@
+# fake_transcript_server.py - CrowdAlpha | Local stand-in for the transcript site
+#
+# Serves generated Motley Fool-style transcript pages with ETag and
+# Last-Modified headers and answers conditional requests with 304.
+# Usage:
+#   python fake_transcript_server.py --port 8002
+#   TRANSCRIPT_BASE_URL=http://127.0.0.1:8002/earnings-call-transcripts streamlit run app.py
+
+import argparse
+import hashlib
+import re
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE_REGEX = re.compile(r"/earnings-call-transcripts/([a-z.]+)-earnings-call-transcript\.aspx$")
+
+
+def render_page(ticker, version=1, paragraphs=400):
+    """A transcript page padded with the navigation/ads markup real pages carry."""
+    filler = "".join(f'<li><a href="/quote/{i}">Related {i}</a></li>' for i in range(300))
+    body = "".join(
+        f"<p>{ticker.upper()} speaker {i % 7} (v{version}): revenue grew {i % 40}% and margins expanded "
+        f"while guidance for the next quarter was raised.</p>"
+        for i in range(paragraphs)
+    )
+    return (f"<html><head><title>{ticker.upper()} earnings call</title></head><body>"
+            f"<nav><ul>{filler}</ul></nav><div class=\"article-content\">{body}</div>"
+            f"<footer><ul>{filler}</ul></footer></body></html>")
+
+
+class FakeTranscriptServer(ThreadingHTTPServer):
+    """Bump `version` to simulate a page being updated. `etags=False` serves pages without an ETag."""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, paragraphs=400, etags=True):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.paragraphs = paragraphs
+        self.etags = etags
+        self.version = 1
+        self.modified = time.time()
+        self.stats = {"200": 0, "304": 0, "404": 0}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/earnings-call-transcripts"
+
+    def bump(self):
+        with self.lock:
+            self.version += 1
+            self.modified = time.time()
+
+    def count(self, status):
+        with self.lock:
+            self.stats[str(status)] += 1
+
+    def handle_error(self, request, client_address):
+        pass
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        match = PAGE_REGEX.search(self.path)
+        if not match:
+            self.server.count(404)
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        time.sleep(self.server.latency)
+        page = render_page(match.group(1), self.server.version, self.server.paragraphs).encode()
+        etag = f'"{hashlib.sha1(page).hexdigest()}"'
+        last_modified = formatdate(self.server.modified, usegmt=True)
+        if self.server.etags and self.headers.get("If-None-Match") == etag:
+            self.server.count(304)
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.server.count(200)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        if self.server.etags:
+            self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        self.wfile.write(page)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the earnings transcript site")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = FakeTranscriptServer(args.port, latency=args.latency)
+    print(f"Fake transcript server on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
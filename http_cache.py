@@ -0,0 +1,112 @@
+# http_cache.py - CrowdAlpha | Pooled HTTP fetches with an on-disk cache and conditional revalidation
+#
+# Responses are stored by URL with their ETag / Last-Modified. Within
+# HTTP_CACHE_MAX_AGE they are served from disk; after that the request is
+# revalidated with If-None-Match / If-Modified-Since and a 304 reuses the
+# stored body. Extracted text is cached per document version (body hash), so
+# HTML is parsed once per version rather than on every call.
+
+import hashlib
+import importlib.util
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from cache_store import open_cache_store
+
+# --- Config ---
+HTTP_CACHE_FILE = os.getenv("HTTP_CACHE_PATH", "http_cache.db")
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", 3600))   # seconds before revalidating
+HTTP_TIMEOUT = 10
+USER_AGENT = os.getenv("HTTP_USER_AGENT", "CrowdAlphaBot/0.2")
+
+# lxml is several times faster than the pure-Python parser when it's installed
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+session = requests.Session()
+session.headers["User-Agent"] = USER_AGENT
+_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
+
+http_cache = open_cache_store(HTTP_CACHE_FILE)
+
+stats = {"fresh": 0, "revalidated": 0, "fetched": 0, "stale": 0, "parsed": 0, "text_hits": 0}
+
+
+def _response_key(url) -> str:
+    return f"response:{url}"
+
+
+def _text_key(name, body) -> str:
+    return f"text:{name}:{hashlib.sha256(body.encode()).hexdigest()}"
+
+
+def fetch(url, max_age=HTTP_CACHE_MAX_AGE) -> dict:
+    """
+    GET `url` through the cache. Returns {"status", "body", "etag",
+    "last_modified", "fetched_at"}. On a network error a previously cached
+    response is returned (stale) if there is one; otherwise the error is raised.
+    """
+    key = _response_key(url)
+    cached = http_cache.get(key)
+    now = time.time()
+    fresh = cached is not None and now - cached["fetched_at"] < max_age
+    metrics.record_cache_lookup("http", fresh)
+    if fresh:
+        stats["fresh"] += 1
+        return cached
+
+    headers = {}
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        with metrics.timer("http_fetch"):
+            response = session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+    except requests.RequestException:
+        if cached is None:
+            raise
+        stats["stale"] += 1
+        return cached
+
+    if response.status_code == 304 and cached is not None:
+        stats["revalidated"] += 1
+        entry = dict(cached, fetched_at=now)
+    else:
+        stats["fetched"] += 1
+        entry = {
+            "status": response.status_code,
+            "body": response.text,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": now
+        }
+    # Error pages are returned but not kept
+    if entry["status"] == 200:
+        http_cache.put(key, entry)
+    return entry
+
+
+def fetch_text(url, extract, name, max_age=HTTP_CACHE_MAX_AGE):
+    """
+    Fetch `url` and return (status, extract(body)). The extracted text is
+    cached under `name` and the body hash, so `extract` runs once per version.
+    """
+    response = fetch(url, max_age)
+    if response["status"] != 200:
+        return response["status"], None
+    key = _text_key(name, response["body"])
+    text = http_cache.get(key)
+    if text is not None:
+        stats["text_hits"] += 1
+        return 200, text
+    stats["parsed"] += 1
+    text = extract(response["body"])
+    http_cache.put(key, text)
+    return 200, text
@@ -0,0 +1,341 @@
+# llm_router.py - CrowdAlpha | Health-aware LLM provider router (Groq -> OpenRouter)
+#
+# Shared by crowdalpha.call_llm, the AI Chat tab and the async pipeline.
+# Each provider has a circuit breaker and latency tracking. Providers whose
+# breaker is open are skipped, and with hedging on the next provider is
+# fired once the current one runs past its p95 latency; the first answer wins.
+# A request that loses the race only counts against its breaker once it has
+# been outstanding past the client timeout; batch-sized prompts are never hedged.
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+
+import metrics
+from rate_limit import chat_completion, chat_completion_stream, achat_completion, estimate_request_tokens
+
+# --- Provider Config ---
+load_dotenv()
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+GROQ_MODEL = "llama3-70b-8192"
+OPENROUTER_MODEL = "meta-llama/llama-3-8b-instruct:free"
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+ROUTER_MAX_RETRIES = 2        # per provider; the router moves on to the next one after that
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "1") == "1"
+HEDGE_DEFAULT_DELAY = 2.0     # before any latency has been observed
+HEDGE_MIN_DELAY = 0.25
+# Batch prompts are paid for twice when hedged and run long by design
+HEDGE_MAX_PROMPT_TOKENS = int(os.getenv("LLM_HEDGE_MAX_PROMPT_TOKENS", 1000))
+BREAKER_FAILURES = 3          # consecutive failures that open the breaker
+BREAKER_COOLDOWN = 30.0       # seconds before a half-open probe
+EWMA_ALPHA = 0.2
+LATENCY_WINDOW = 100
+
+
+class AllProvidersFailed(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open after a cooldown, where one failure re-opens it."""
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.max_failures:
+                self.opened_at = time.monotonic()
+
+
+class Provider:
+    def __init__(self, name, model, api_key, base_url, timeout=LLM_TIMEOUT, breaker=None):
+        self.name = name
+        self.model = model
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self._client = None
+        self.breaker = breaker or CircuitBreaker()
+        self.latency_ewma = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._async_clients = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """OpenAI client, built on first use (importing the SDK alone takes most of a second)."""
+        if self._client is None:
+            import openai
+            with self._lock:
+                if self._client is None:
+                    self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                                                 timeout=self.timeout)
+        return self._client
+
+    def async_client(self):
+        """AsyncOpenAI client bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            import openai
+            self._async_clients[loop] = openai.AsyncOpenAI(
+                api_key=self.api_key, base_url=self.base_url, max_retries=0, timeout=self.timeout
+            )
+        return self._async_clients[loop]
+
+    async def aclose(self):
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.latency_ewma = seconds if self.latency_ewma is None else (
+                EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.latency_ewma
+            )
+
+    def p95(self):
+        with self._lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def hedge_delay(self) -> float:
+        p95 = self.p95()
+        return HEDGE_DEFAULT_DELAY if p95 is None else max(HEDGE_MIN_DELAY, p95)
+
+    def health(self) -> dict:
+        return {
+            "model": self.model,
+            "breaker": self.breaker.state,
+            "latency_ewma": self.latency_ewma,
+            "latency_p95": self.p95()
+        }
+
+
+class _Attempt:
+    """One provider request within a (possibly hedged) completion."""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.started = time.monotonic()
+        self.lost = threading.Event()
+        self._penalized = False
+        self._lock = threading.Lock()
+
+    def penalize_if_hanging(self):
+        """Count a lost request as a breaker failure once it has run past the client timeout."""
+        with self._lock:
+            if self._penalized or time.monotonic() - self.started < self.provider.timeout:
+                return
+            self._penalized = True
+        self.provider.breaker.record_failure()
+
+
+class LLMRouter:
+    def __init__(self, providers, hedge=HEDGE_ENABLED):
+        self.providers = providers
+        self.hedge = hedge
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-router")
+
+    def _candidates(self):
+        """Providers whose breaker lets a request through, in priority order."""
+        allowed = [p for p in self.providers if p.breaker.allow()]
+        # Every breaker open: try them all anyway rather than fail without a request
+        return allowed or list(self.providers)
+
+    def _hedges(self, messages) -> bool:
+        return self.hedge and estimate_request_tokens(messages) <= HEDGE_MAX_PROMPT_TOKENS
+
+    def _call(self, attempt, messages):
+        provider = attempt.provider
+        start = time.monotonic()
+        try:
+            response = chat_completion(provider.name, provider.client, provider.model, messages, ROUTER_MAX_RETRIES,
+                                       cancelled=attempt.lost)
+        except Exception as e:
+            # A loser's own outcome says nothing beyond whether it hung
+            if attempt.lost.is_set():
+                attempt.penalize_if_hanging()
+                raise
+            provider.breaker.record_failure()
+            metrics.inc("llm_errors_total", provider=provider.name, error=type(e).__name__)
+            print(f"{provider.name} failed: {e}")
+            raise
+        provider.record_latency(time.monotonic() - start)
+        metrics.record_llm_call(provider.name, time.monotonic() - start, response)
+        if attempt.lost.is_set():
+            attempt.penalize_if_hanging()
+        else:
+            provider.breaker.record_success()
+        return response.choices[0].message.content.strip(), provider.model
+
+    async def _acall(self, attempt, messages):
+        provider = attempt.provider
+        start = time.monotonic()
+        try:
+            response = await achat_completion(provider.name, provider.async_client(), provider.model, messages, ROUTER_MAX_RETRIES)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if attempt.lost.is_set():
+                raise
+            provider.breaker.record_failure()
+            metrics.inc("llm_errors_total", provider=provider.name, error=type(e).__name__)
+            print(f"{provider.name} failed: {e}")
+            raise
+        provider.record_latency(time.monotonic() - start)
+        metrics.record_llm_call(provider.name, time.monotonic() - start, response)
+        if not attempt.lost.is_set():
+            provider.breaker.record_success()
+        return response.choices[0].message.content.strip(), provider.model
+
+    def complete(self, prompt: str):
+        """
+        Returns (text, model). Raises AllProvidersFailed. Losing hedged
+        requests are cancelled if they haven't started, and otherwise stop
+        at their next limiter wait or retry; one that then hits the client
+        timeout still counts against its breaker.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        hedge = self._hedges(messages)
+        queue = self._candidates()
+        current = _Attempt(queue.pop(0))
+        pending = {self._executor.submit(self._call, current, messages): current}
+        last_error = None
+        while pending:
+            timeout = current.provider.hedge_delay() if hedge and queue else None
+            done, _ = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                self._penalize_losers(pending.values())
+                for loser in pending:
+                    loser.cancel()
+                return result
+            # Hedge timer fired, or everything in flight failed: start the next provider
+            if queue and (not done or not pending):
+                current = _Attempt(queue.pop(0))
+                pending[self._executor.submit(self._call, current, messages)] = current
+        raise AllProvidersFailed(last_error)
+
+    async def acomplete(self, prompt: str):
+        """Async counterpart of `complete`; losing hedged requests are cancelled."""
+        messages = [{"role": "user", "content": prompt}]
+        hedge = self._hedges(messages)
+        queue = self._candidates()
+        current = _Attempt(queue.pop(0))
+        pending = {asyncio.ensure_future(self._acall(current, messages)): current}
+        last_error = None
+        try:
+            while pending:
+                timeout = current.provider.hedge_delay() if hedge and queue else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    self._penalize_losers(pending.values())
+                    return result
+                if queue and (not done or not pending):
+                    current = _Attempt(queue.pop(0))
+                    pending[asyncio.ensure_future(self._acall(current, messages))] = current
+            raise AllProvidersFailed(last_error)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stream(self, prompt: str):
+        """
+        Yields (delta, model) as the answer arrives. Falls over to the next
+        provider only before the first token, and never hedges (a hedged
+        stream would be paid for twice). Raises AllProvidersFailed.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        last_error = None
+        for provider in self._candidates():
+            start = time.monotonic()
+            started = False
+            try:
+                for delta in chat_completion_stream(provider.name, provider.client, provider.model, messages,
+                                                    ROUTER_MAX_RETRIES):
+                    if not started:
+                        started = True
+                        metrics.observe("llm_first_token_seconds", time.monotonic() - start, provider=provider.name)
+                    yield delta, provider.model
+            except Exception as e:
+                provider.breaker.record_failure()
+                metrics.inc("llm_errors_total", provider=provider.name, error=type(e).__name__)
+                print(f"{provider.name} failed: {e}")
+                if started:
+                    raise   # part of the answer is already out
+                last_error = e
+                continue
+            # Whole-stream time isn't comparable with `complete` latency, so it stays out of the hedge p95
+            metrics.record_llm_call(provider.name, time.monotonic() - start)
+            provider.breaker.record_success()
+            return
+        raise AllProvidersFailed(last_error)
+
+    def _penalize_losers(self, attempts):
+        """
+        Mark requests overtaken by a hedge as lost, so their own success or
+        failure is ignored. Being slower than p95 is not a failure; only a
+        loser outstanding past the client timeout counts against its breaker,
+        so an outage that shows up as hanging requests still opens it.
+        """
+        for attempt in attempts:
+            attempt.lost.set()
+            metrics.inc("llm_hedge_losses_total", provider=attempt.provider.name)
+            attempt.penalize_if_hanging()
+
+    async def aclose(self):
+        """Close the async clients created for the running event loop."""
+        for provider in self.providers:
+            await provider.aclose()
+
+    def health(self) -> dict:
+        return {p.name: p.health() for p in self.providers}
+
+
+router = LLMRouter([
+    Provider("groq", GROQ_MODEL, GROQ_API_KEY, GROQ_BASE_URL),
+    Provider("openrouter", OPENROUTER_MODEL, OPENROUTER_API_KEY, OPENROUTER_BASE_URL),
+])
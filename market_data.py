@@ -0,0 +1,147 @@
+# market_data.py - CrowdAlpha | Shared, cached market data for the terminal and compare tabs
+#
+# Price history for all requested symbols comes from one batched
+# `yf.download` (daily bars via the incremental `price_store`); `.info`
+# lookups run concurrently. Results are cached in
+# memory and on disk with TTLs per field group: prices go stale in minutes,
+# company profiles in days. A rerun with unchanged inputs makes no requests.
+
+import concurrent.futures
+import os
+
+import pandas as pd
+
+import metrics
+import price_store
+from cache_store import open_cache_store, TieredCache
+
+# --- Config ---
+MARKET_CACHE_FILE = os.getenv("MARKET_CACHE_PATH", "market_data.db")
+HISTORY_TTL = int(os.getenv("MARKET_HISTORY_TTL", 5 * 60))
+QUOTE_TTL = int(os.getenv("MARKET_QUOTE_TTL", 15 * 60))
+PROFILE_TTL = int(os.getenv("MARKET_PROFILE_TTL", 3 * 24 * 3600))
+INFO_WORKERS = 8
+
+# .info fields grouped by how quickly they change
+FIELD_GROUPS = {
+    "quote": ("marketCap", "trailingPE", "fiftyTwoWeekLow", "fiftyTwoWeekHigh", "dividendYield",
+              "currentPrice", "previousClose"),
+    "profile": ("shortName", "longName", "sector", "industry", "country", "website", "longBusinessSummary"),
+}
+GROUP_TTLS = {"quote": QUOTE_TTL, "profile": PROFILE_TTL}
+HISTORY_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+
+market_cache = TieredCache(open_cache_store(MARKET_CACHE_FILE), max_entries=5_000, ttl=PROFILE_TTL)
+
+stats = {"history_hits": 0, "history_downloads": 0, "info_hits": 0, "info_fetches": 0}
+
+
+def _symbols(symbols):
+    """Upper-cased, de-duplicated, order preserved."""
+    return list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+
+
+# --- Price History ---
+def _history_key(symbol, period, interval) -> str:
+    return f"history:{symbol}:{period}:{interval}"
+
+
+def _frame_to_json(frame) -> dict:
+    return {
+        "index": [ts.isoformat() for ts in frame.index],
+        "tz": str(frame.index.tz) if frame.index.tz else None,
+        "columns": {col: frame[col].tolist() for col in HISTORY_COLUMNS if col in frame}
+    }
+
+
+def _frame_from_json(data):
+    if data["tz"]:
+        index = pd.to_datetime(data["index"], utc=True).tz_convert(data["tz"])
+    else:
+        index = pd.to_datetime(data["index"])
+    return pd.DataFrame(data["columns"], index=pd.DatetimeIndex(index, name="Date"))
+
+
+def get_history(symbols, period="1mo", interval="1d") -> dict:
+    """
+    {symbol: OHLCV DataFrame}. Symbols without data are left out. Daily bars
+    come from the local price store; intraday intervals are cached here.
+    """
+    symbols = _symbols(symbols)
+    if interval == "1d" and period in price_store.SUPPORTED_PERIODS:
+        return price_store.load(symbols, period)
+    result, missing = {}, []
+    for symbol in symbols:
+        cached = market_cache.get(_history_key(symbol, period, interval))
+        metrics.record_cache_lookup("market_history", cached is not None)
+        if cached is not None:
+            stats["history_hits"] += 1
+            result[symbol] = _frame_from_json(cached)
+        else:
+            missing.append(symbol)
+    if missing:
+        stats["history_downloads"] += 1
+        for symbol, frame in price_store.download(missing, period=period, interval=interval).items():
+            market_cache.put(_history_key(symbol, period, interval), _frame_to_json(frame), ttl=HISTORY_TTL)
+            result[symbol] = frame
+    return {symbol: result[symbol] for symbol in symbols if symbol in result}
+
+
+def get_closes(symbols, period="1mo", interval="1d"):
+    """Close prices as one DataFrame with a column per symbol."""
+    history = get_history(symbols, period, interval)
+    return pd.DataFrame({symbol: frame["Close"] for symbol, frame in history.items()})
+
+
+# --- Company Info ---
+def _info_key(symbol, group) -> str:
+    return f"info:{group}:{symbol}"
+
+
+def _fetch_info(symbol) -> dict:
+    import yfinance as yf
+    stats["info_fetches"] += 1
+    try:
+        with metrics.timer("yfinance_info"):
+            return yf.Ticker(symbol).info or {}
+    except Exception as e:
+        print(f"Error fetching info for {symbol}: {e}")
+        return {}
+
+
+def get_info(symbols, groups=tuple(FIELD_GROUPS)) -> dict:
+    """
+    {symbol: {field: value}} for the fields in `groups`. A symbol is only
+    looked up again once one of the requested groups has expired.
+    """
+    symbols = _symbols(symbols)
+    result, stale = {}, []
+    for symbol in symbols:
+        parts = [market_cache.get(_info_key(symbol, group)) for group in groups]
+        metrics.record_cache_lookup("market_info", all(part is not None for part in parts))
+        if all(part is not None for part in parts):
+            stats["info_hits"] += 1
+            result[symbol] = {k: v for part in parts for k, v in part.items()}
+        else:
+            stale.append(symbol)
+
+    if stale:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(INFO_WORKERS, len(stale))) as executor:
+            for symbol, info in zip(stale, executor.map(_fetch_info, stale)):
+                if not info:
+                    result[symbol] = {}
+                    continue
+                # Refresh every group while we have the full payload
+                for group, fields in FIELD_GROUPS.items():
+                    market_cache.put(_info_key(symbol, group), {f: info[f] for f in fields if info.get(f) is not None},
+                                     ttl=GROUP_TTLS[group])
+                result[symbol] = {f: info[f] for group in groups for f in FIELD_GROUPS[group] if info.get(f) is not None}
+    return {symbol: result[symbol] for symbol in symbols}
+
+
+def get_snapshot(symbols, period="1mo"):
+    """History and info for several symbols, fetched concurrently. Returns (history, info)."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        history = executor.submit(get_history, symbols, period)
+        info = executor.submit(get_info, symbols)
+        return history.result(), info.result()
@@ -0,0 +1,284 @@
+# metrics.py - CrowdAlpha | In-process metrics registry (stage timings, LLM usage, cache hits)
+#
+# Counters and latency histograms keyed by name + labels, cheap enough to
+# record on every call. The registry is rendered in the Prometheus text
+# format: the worker dumps it to METRICS_FILE after every cycle (and serves
+# it on METRICS_PORT if set). The Diagnostics tab shows the Streamlit
+# process's own registry next to the worker's last dump.
+#
+#   with metrics.timer("fetch_reddit_posts", subreddit="stocks"):
+#       ...
+#   metrics.inc("llm_tokens_total", 812, provider="groq", kind="prompt")
+
+import functools
+import http.server
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# --- Config ---
+METRICS_PREFIX = "crowdalpha_"
+METRICS_FILE = os.getenv("METRICS_FILE", "metrics.prom")   # "" disables the dump
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECENT_SAMPLES = 500    # kept per histogram for p50/p95 in the Diagnostics tab
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last slot: +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantile(self, q):
+        if self.recent:
+            ordered = sorted(self.recent)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+        # Loaded from a dump: upper bound of the bucket holding the quantile
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            cumulative += count
+            if self.count and cumulative >= q * self.count:
+                return bound
+        return None
+
+
+class Registry:
+    def __init__(self):
+        self.counters = {}      # (name, labels) -> float
+        self.histograms = {}    # (name, labels) -> Histogram
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    # --- Reads ---
+    def counter(self, name, **labels) -> float:
+        """Sum of a counter over every label set matching `labels`."""
+        with self._lock:
+            return sum(value for (n, key), value in self.counters.items()
+                       if n == name and labels.items() <= dict(key).items())
+
+    def counter_rows(self) -> list:
+        with self._lock:
+            return [{"metric": name, **dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())]
+
+    def histogram_rows(self) -> list:
+        """One row per histogram: count, mean, p50, p95, max of the recent samples."""
+        with self._lock:
+            rows = []
+            for (name, labels), hist in sorted(self.histograms.items()):
+                rows.append({
+                    "metric": name, **dict(labels), "count": hist.count,
+                    "mean": hist.sum / hist.count if hist.count else None,
+                    "p50": hist.quantile(0.5), "p95": hist.quantile(0.95),
+                    "max": max(hist.recent) if hist.recent else None,
+                })
+            return rows
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        lines, typed = [], set()
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                full = METRICS_PREFIX + name
+                if full not in typed:
+                    lines.append(f"# TYPE {full} counter")
+                    typed.add(full)
+                lines.append(f"{full}{_labels(labels)} {value:g}")
+            for (name, labels), hist in sorted(self.histograms.items()):
+                full = METRICS_PREFIX + name
+                if full not in typed:
+                    lines.append(f"# TYPE {full} histogram")
+                    typed.add(full)
+                cumulative = 0
+                for bound, count in zip(list(hist.buckets) + ["+Inf"], hist.counts):
+                    cumulative += count
+                    lines.append(f"{full}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{full}_sum{_labels(labels)} {hist.sum:g}")
+                lines.append(f"{full}_count{_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+registry = Registry()
+
+
+# --- Recording helpers ---
+def inc(name, value=1, **labels):
+    registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+class timer:
+    """Records wall time into `stage_seconds{stage=...}`; exceptions also count into `stage_errors_total`."""
+
+    def __init__(self, stage, **labels):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe("stage_seconds", time.perf_counter() - self.start, stage=self.stage, **self.labels)
+        if exc_type is not None:
+            inc("stage_errors_total", stage=self.stage, error=exc_type.__name__)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(self.stage, **self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def record_llm_call(provider, seconds, response=None):
+    """Latency and token usage of one successful completion."""
+    observe("llm_request_seconds", seconds, provider=provider)
+    inc("llm_requests_total", provider=provider, outcome="ok")
+    usage = getattr(response, "usage", None)
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            inc("llm_tokens_total", tokens, provider=provider, kind=kind)
+
+
+def record_cache_lookup(cache, hit):
+    inc("cache_lookups_total", cache=cache, result="hit" if hit else "miss")
+
+
+def cache_hit_ratio(cache):
+    hits = registry.counter("cache_lookups_total", cache=cache, result="hit")
+    total = registry.counter("cache_lookups_total", cache=cache)
+    return hits / total if total else None
+
+
+# --- Export ---
+SAMPLE_REGEX = re.compile(r"^(\w+?)(?:_(bucket|sum|count))?(?:\{(.*)\})? (\S+)$")
+LABEL_REGEX = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _unescape(value) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), value)
+
+
+def parse(text) -> Registry:
+    """Rebuild a Registry from `render()` output (histograms keep their buckets, not raw samples)."""
+    loaded, histograms = Registry(), set()
+    for line in text.splitlines():
+        if line.startswith("# TYPE ") and line.endswith(" histogram"):
+            histograms.add(line.split()[2])
+            continue
+        match = SAMPLE_REGEX.match(line)
+        if line.startswith("#") or not match:
+            continue
+        full, suffix, raw_labels, value = match.groups()
+        if suffix and full not in histograms:
+            full, suffix = f"{full}_{suffix}", None
+        name = full[len(METRICS_PREFIX):] if full.startswith(METRICS_PREFIX) else full
+        labels = {k: _unescape(v) for k, v in LABEL_REGEX.findall(raw_labels or "")}
+        if not suffix:
+            loaded.counters[(name, tuple(sorted(labels.items())))] = float(value)
+            continue
+        le = labels.pop("le", None)
+        hist = loaded.histograms.setdefault((name, tuple(sorted(labels.items()))), Histogram())
+        if suffix == "sum":
+            hist.sum = float(value)
+        elif suffix == "count":
+            hist.count = int(value)
+        else:
+            # Cumulative in the text format, per bucket in Histogram
+            i = len(hist.buckets) if le == "+Inf" else hist.buckets.index(float(le))
+            hist.counts[i] = int(value) - sum(hist.counts[:i])
+    return loaded
+
+
+def load(path=None):
+    """Registry from the last `dump()`, or None if there is none."""
+    path = path or METRICS_FILE
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return parse(f.read())
+
+
+def dump(path=None):
+    """Write the Prometheus text to `path` (default METRICS_FILE) atomically."""
+    path = path or METRICS_FILE
+    if not path:
+        return
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port=None):
+    """Serve /metrics from a daemon thread. Returns the server, or None if no port is configured."""
+    port = METRICS_PORT if port is None else port
+    if not port:
+        return None
+    server = http.server.ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Serving metrics on http://localhost:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,163 @@
+# near_dup.py - CrowdAlpha | Near-duplicate post detection (MinHash + LSH bands)
+#
+# Reposts, crossposts and lightly edited copies hash differently with
+# `get_post_hash`, so they would each cost an LLM call. Every analysed post
+# gets a 32-value MinHash signature over word 3-shingles, split into 8 LSH
+# bands of 4 values. A lookup only compares against posts that share a whole
+# band (likely for Jaccard >= ~0.7, rare below ~0.4), then checks the
+# estimated similarity. Matches must also mention the same tickers, so short
+# "TSLA to the moon" / "NVDA to the moon" posts never share a thesis.
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+
+from ticker_extract import extract_tickers
+
+# --- Config ---
+NEAR_DUP_FILE = os.getenv("NEAR_DUP_PATH", "near_dup.db")
+NEAR_DUP_ENABLED = os.getenv("NEAR_DUP", "1") == "1"
+SIMILARITY_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", 0.7))   # estimated Jaccard of shingles
+PERMUTATIONS = 32
+BANDS = 8
+ROWS = PERMUTATIONS // BANDS
+MIN_TOKENS = 8          # shorter posts carry too little text to call them duplicates
+SHINGLE_SIZE = 3
+
+TOKEN_REGEX = re.compile(r"[a-z0-9$']+")
+
+_rng = np.random.default_rng(20240601)     # fixed: signatures must be comparable across runs
+_A = _rng.integers(1, 2 ** 63, PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, PERMUTATIONS, dtype=np.uint64)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    post_hash TEXT PRIMARY KEY,
+    minhash BLOB NOT NULL,
+    tickers TEXT NOT NULL,
+    source_id TEXT
+);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    post_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bands_band ON bands (band);
+CREATE INDEX IF NOT EXISTS bands_post ON bands (post_hash);
+"""
+
+stats = {"lookups": 0, "matches": 0, "added": 0}
+
+
+# --- Signatures ---
+def _shingle_hashes(text):
+    tokens = TOKEN_REGEX.findall(text.lower())
+    if len(tokens) < MIN_TOKENS:
+        return None
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    digests = b"".join(hashlib.blake2b(s.encode(), digest_size=8).digest() for s in shingles)
+    return np.frombuffer(digests, dtype="<u8")
+
+
+def minhash(text):
+    """MinHash signature (PERMUTATIONS x uint32) of the text's word 3-shingles, or None for very short texts."""
+    hashes = _shingle_hashes(text)
+    if hashes is None:
+        return None
+    # a*h + b mod 2^64 (uint64 wraps), keeping the high 32 bits of the minimum
+    permuted = hashes[None, :] * _A[:, None] + _B[:, None]
+    return (permuted.min(axis=1) >> np.uint64(32)).astype("<u4")
+
+
+def band_keys(signature):
+    """One signed 64-bit key per band (SQLite integers are signed)."""
+    rows = signature.reshape(BANDS, ROWS)
+    return [int.from_bytes(hashlib.blake2b(row.tobytes() + bytes([i]), digest_size=8).digest(), "little", signed=True)
+            for i, row in enumerate(rows)]
+
+
+def similarity(a, b) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(a == b))
+
+
+def _ticker_key(text) -> str:
+    return ",".join(sorted(extract_tickers(text)))
+
+
+# --- Index ---
+class NearDupIndex:
+    def __init__(self, path=NEAR_DUP_FILE):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            # Indexes created before signatures recorded their Reddit post id
+            if "source_id" not in {row[1] for row in conn.execute("PRAGMA table_info(signatures)")}:
+                conn.execute("ALTER TABLE signatures ADD COLUMN source_id TEXT")
+            self._local.conn = conn
+        return conn
+
+    def add_signature(self, post_hash, signature, tickers="", source_id=None):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM bands WHERE post_hash = ?", (post_hash,))
+            conn.execute("INSERT OR REPLACE INTO signatures (post_hash, minhash, tickers, source_id) VALUES (?, ?, ?, ?)",
+                         (post_hash, signature.tobytes(), tickers, source_id))
+            conn.executemany("INSERT INTO bands VALUES (?, ?)", [(key, post_hash) for key in band_keys(signature)])
+        stats["added"] += 1
+
+    def add(self, post_hash, text, source_id=None):
+        """Index an analysed post (`source_id`: its Reddit id, if known). Very short posts are skipped."""
+        signature = minhash(text)
+        if signature is not None:
+            self.add_signature(post_hash, signature, _ticker_key(text), source_id)
+
+    def find_signature(self, signature, tickers="", exclude=None, source_id=None):
+        """
+        Most similar indexed post above SIMILARITY_THRESHOLD with the same
+        tickers, as (post_hash, similarity). Earlier versions of the same
+        Reddit post (`source_id`) never match: an edit must be re-analysed.
+        """
+        stats["lookups"] += 1
+        keys = band_keys(signature)
+        rows = self._conn().execute(
+            f"SELECT s.post_hash, s.minhash, s.tickers, s.source_id FROM signatures s WHERE s.post_hash IN "
+            f"(SELECT post_hash FROM bands WHERE band IN ({','.join('?' * len(keys))}))",
+            keys
+        )
+        best = None
+        for post_hash, blob, candidate_tickers, candidate_source in rows:
+            if post_hash == exclude or candidate_tickers != tickers:
+                continue
+            if source_id is not None and candidate_source == source_id:
+                continue
+            score = similarity(signature, np.frombuffer(blob, dtype="<u4"))
+            if score >= SIMILARITY_THRESHOLD and (best is None or score > best[1]):
+                best = (post_hash, score)
+        if best is not None:
+            stats["matches"] += 1
+        return best
+
+    def find(self, text, exclude=None, source_id=None):
+        """post_hash of an analysed near-duplicate of `text` (not another version of `source_id`), or None."""
+        signature = minhash(text)
+        if signature is None:
+            return None
+        match = self.find_signature(signature, _ticker_key(text), exclude, source_id)
+        return match[0] if match else None
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+
+index = NearDupIndex()
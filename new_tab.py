@@ -1,28 +1,57 @@
-# news_tab.py - CrowdAlpha | Headline News per Ticker
+# news_tab.py - CrowdAlpha | Merged Headline News for a Watchlist
+#
+# Headlines come from the local news index (news_store). Feeds are only
+# re-fetched, concurrently and conditionally, once they are older than
+# NEWS_REFRESH_INTERVAL, so most reruns are a single SQLite read.
+
+import time
 
 import streamlit as st
-import feedparser
-import urllib.parse
+import pandas as pd
+
+import news_store
+
+DEFAULT_WATCHLIST = "AAPL, MSFT, NVDA, TSLA"
+
+
+def _parse_watchlist(text):
+    return list(dict.fromkeys(s.strip().upper() for s in text.replace("\n", ",").split(",") if s.strip()))
+
+
 def render_new_tab():
     st.header("📰 Ticker News Flow")
-    st.markdown("Type a stock ticker to view recent financial news from Yahoo Finance.")
+    st.markdown("Enter a watchlist of tickers (comma-separated) to view their merged financial news from Yahoo Finance.")
+
+    # --- Input Watchlist ---
+    watchlist = st.text_input("Tickers (e.g., TSLA, AAPL, NVDA):", value=DEFAULT_WATCHLIST, key="news_ticker_input")
+    tickers = _parse_watchlist(watchlist)
+    if not tickers:
+        return
 
-    # --- Input Ticker ---
-    ticker = st.text_input("Enter a stock ticker (e.g., TSLA, AAPL, NVDA):", value="AAPL", key="news_ticker_input")
+    col_limit, col_refresh = st.columns([3, 1])
+    with col_limit:
+        limit = st.slider("Headlines:", min_value=10, max_value=200, value=50, step=10, key="news_limit")
+    with col_refresh:
+        force = st.button("🔄 Refresh now", key="news_refresh")
 
+    with st.spinner("Checking feeds..."):
+        news_store.refresh(tickers, force=force)
+    items = news_store.merged_feed(tickers, limit=limit)
 
-    if ticker:
-        query = urllib.parse.quote(ticker.upper())
-        rss_url = f"https://feeds.finance.yahoo.com/rss/2.0/headline?s={query}&region=US&lang=en-US"
-        feed = feedparser.parse(rss_url)
+    refreshed_at = news_store.last_refreshed(tickers)
+    if refreshed_at:
+        st.caption(f"Feeds checked {int(time.time() - refreshed_at)}s ago "
+                   f"(every {news_store.NEWS_REFRESH_INTERVAL}s; headlines shared by several tickers are shown once).")
 
-        st.subheader(f"🗞️ News for {ticker.upper()}")
+    st.subheader(f"🗞️ News for {', '.join(tickers)}")
 
-        if not feed.entries:
-            st.warning("No news found or feed unavailable.")
-        else:
-            for entry in feed.entries:
-                st.markdown(f"### [{entry.title}]({entry.link})")
-                if hasattr(entry, 'summary'):
-                    st.markdown(f"> {entry.summary[:300]}...")
-                st.markdown("---")
+    if not items:
+        st.warning("No news found or feed unavailable.")
+    else:
+        for item in items:
+            published = pd.Timestamp(item["published"], unit="s")
+            st.markdown(f"### [{item['title']}]({item['link']})")
+            st.caption(f"{' · '.join(item['tickers'])} — {published:%Y-%m-%d %H:%M} UTC")
+            if item["summary"]:
+                st.markdown(f"> {item['summary'][:300]}...")
+            st.markdown("---")
@@ -0,0 +1,223 @@
+# news_store.py - CrowdAlpha | Watchlist news aggregation into a local time-ordered index
+#
+# A refresh fetches the RSS feed of every stale ticker concurrently through
+# http_cache's pooled session. ETag / Last-Modified revalidation makes an
+# unchanged feed a 304 with no body, and a feed is only parsed when its body
+# changed since the last refresh. Items are deduplicated across tickers by
+# link and by normalised title (the same Reuters story shows up under AAPL,
+# MSFT and NVDA), so each headline is stored once with every ticker it was
+# seen under. The News Flow tab reads the merged feed from SQLite only.
+
+import calendar
+import concurrent.futures
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import urllib.parse
+
+import http_cache
+import metrics
+
+# --- Config ---
+NEWS_INDEX_FILE = os.getenv("NEWS_INDEX_PATH", "news_index.db")
+NEWS_FEED_URL = os.getenv("NEWS_FEED_URL", "https://feeds.finance.yahoo.com/rss/2.0/headline?s={ticker}&region=US&lang=en-US")
+NEWS_REFRESH_INTERVAL = int(os.getenv("NEWS_REFRESH_INTERVAL", 300))   # seconds before a feed is re-checked
+NEWS_WORKERS = 16                                                        # matches http_cache's connection pool
+NEWS_INDEX_WINDOW = int(os.getenv("NEWS_INDEX_WINDOW_DAYS", 7)) * 24 * 3600
+NEWS_WATCHLIST = [s.strip().upper() for s in os.getenv("NEWS_WATCHLIST", "").split(",") if s.strip()]
+
+stats = {"fetched": 0, "unchanged": 0, "parsed": 0, "items_added": 0, "duplicates": 0, "errors": 0}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeds (
+    ticker TEXT PRIMARY KEY,
+    refreshed_at REAL NOT NULL DEFAULT 0,
+    body_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    title_hash TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    link TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    published REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_published ON items (published);
+CREATE TABLE IF NOT EXISTS item_tickers (
+    ticker TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    published REAL NOT NULL,
+    PRIMARY KEY (ticker, item_id)
+);
+CREATE INDEX IF NOT EXISTS item_tickers_published ON item_tickers (ticker, published);
+"""
+
+
+def _connect(path=None):
+    conn = sqlite3.connect(path or NEWS_INDEX_FILE, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _hash(text) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def link_key(link) -> str:
+    """Links minus query string and fragment (feeds append per-ticker tracking parameters)."""
+    parts = urllib.parse.urlsplit(link.strip())
+    return _hash(f"{parts.netloc.lower()}{parts.path.rstrip('/')}")
+
+
+def title_key(title) -> str:
+    return _hash(" ".join(re.findall(r"\w+", title.lower())))
+
+
+def feed_url(ticker) -> str:
+    return NEWS_FEED_URL.format(ticker=urllib.parse.quote(ticker.upper()))
+
+
+# --- Fetching ---
+def _parse(body) -> list:
+    import feedparser   # only needed when a feed actually changed
+    with metrics.timer("feedparser"):
+        feed = feedparser.parse(body)
+    if feed.get("bozo") and not feed.entries:
+        metrics.inc("stage_errors_total", stage="feedparser", error=type(feed.get("bozo_exception")).__name__)
+    items = []
+    for entry in feed.entries:
+        title, link = entry.get("title", "").strip(), entry.get("link", "").strip()
+        if not title or not link:
+            continue
+        published = entry.get("published_parsed") or entry.get("updated_parsed")
+        items.append({
+            "title": title,
+            "link": link,
+            "summary": entry.get("summary", ""),
+            "published": calendar.timegm(published) if published else time.time(),
+        })
+    return items
+
+
+def fetch_feed(ticker, body_hash=None, max_age=NEWS_REFRESH_INTERVAL):
+    """
+    (body hash, items) for one ticker's feed; items is None when the body
+    is the one already indexed (fresh cache hit or a 304).
+    """
+    response = http_cache.fetch(feed_url(ticker), max_age=max_age)
+    if response["status"] != 200:
+        raise RuntimeError(f"HTTP {response['status']}")
+    new_hash = _hash(response["body"])
+    if new_hash == body_hash:
+        return new_hash, None
+    return new_hash, _parse(response["body"])
+
+
+# --- Index Updates ---
+def _store(conn, ticker, items) -> int:
+    """Insert new items and link every item to `ticker`. Returns items added."""
+    added = 0
+    for item in items:
+        item_id, item_title = link_key(item["link"]), title_key(item["title"])
+        row = conn.execute("SELECT id, published FROM items WHERE id = ? OR title_hash = ?",
+                           (item_id, item_title)).fetchone()
+        if row is None:
+            conn.execute("INSERT INTO items VALUES (?, ?, ?, ?, ?, ?)",
+                         (item_id, item_title, item["title"], item["link"], item["summary"], item["published"]))
+            added += 1
+        else:
+            item_id, item["published"] = row["id"], row["published"]
+            stats["duplicates"] += 1
+        conn.execute("INSERT OR IGNORE INTO item_tickers VALUES (?, ?, ?)", (ticker, item_id, item["published"]))
+    return added
+
+
+def _prune(conn):
+    since = time.time() - NEWS_INDEX_WINDOW
+    conn.execute("DELETE FROM item_tickers WHERE published < ?", (since,))
+    conn.execute("DELETE FROM items WHERE published < ?", (since,))
+
+
+def refresh(tickers, force=False, path=None) -> int:
+    """
+    Re-check the feeds of `tickers` not refreshed within NEWS_REFRESH_INTERVAL
+    (all of them with `force`), concurrently. Returns the number of new items.
+    """
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+    if not tickers:
+        return 0
+    conn = _connect(path)
+    try:
+        feeds = {row["ticker"]: dict(row) for row in conn.execute(
+            f"SELECT * FROM feeds WHERE ticker IN ({','.join('?' * len(tickers))})", tickers)}
+        now = time.time()
+        stale = [t for t in tickers if force or now - feeds.get(t, {}).get("refreshed_at", 0) >= NEWS_REFRESH_INTERVAL]
+        if not stale:
+            return 0
+
+        max_age = 0 if force else NEWS_REFRESH_INTERVAL
+        added = 0
+        with metrics.timer("news_refresh"), \
+                concurrent.futures.ThreadPoolExecutor(max_workers=min(NEWS_WORKERS, len(stale))) as executor:
+            futures = {executor.submit(fetch_feed, t, feeds.get(t, {}).get("body_hash"), max_age): t
+                       for t in stale}
+            # SQLite writes stay on this thread
+            for future in concurrent.futures.as_completed(futures):
+                ticker = futures[future]
+                try:
+                    body_hash, items = future.result()
+                except Exception as e:
+                    stats["errors"] += 1
+                    metrics.inc("stage_errors_total", stage="news_refresh", error=type(e).__name__)
+                    print(f"Error fetching news for {ticker}: {e}")
+                    continue
+                with conn:
+                    if items is None:
+                        stats["unchanged"] += 1
+                    else:
+                        stats["parsed"] += 1
+                        added += _store(conn, ticker, items)
+                    conn.execute("INSERT OR REPLACE INTO feeds VALUES (?, ?, ?)", (ticker, now, body_hash))
+        with conn:
+            _prune(conn)
+        stats["fetched"] += len(stale)
+        stats["items_added"] += added
+        return added
+    finally:
+        conn.close()
+
+
+# --- Index Reads ---
+def merged_feed(tickers, limit=100, path=None) -> list:
+    """Newest items across `tickers`, each once, with the watchlist tickers it was seen under."""
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+    if not tickers:
+        return []
+    conn = _connect(path)
+    try:
+        rows = conn.execute(
+            f"SELECT i.title, i.link, i.summary, i.published, group_concat(t.ticker) AS tickers "
+            f"FROM item_tickers t JOIN items i ON i.id = t.item_id "
+            f"WHERE t.ticker IN ({','.join('?' * len(tickers))}) "
+            f"GROUP BY i.id ORDER BY i.published DESC LIMIT ?",
+            tickers + [limit]
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(row, tickers=sorted(row["tickers"].split(","))) for row in rows]
+
+
+def last_refreshed(tickers, path=None):
+    """Oldest refresh time among `tickers` (None if any has never been fetched)."""
+    tickers = [t.upper() for t in tickers]
+    conn = _connect(path)
+    try:
+        times = [row[0] for row in conn.execute(
+            f"SELECT refreshed_at FROM feeds WHERE ticker IN ({','.join('?' * len(tickers))})", tickers)]
+    finally:
+        conn.close()
+    return min(times) if len(times) == len(tickers) and times else None
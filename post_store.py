@@ -0,0 +1,212 @@
+# post_store.py - CrowdAlpha | Compact columnar store of analysed posts with a ticker inverted index
+#
+# Every post is one row of a column table (subreddit and sentiment as
+# categoricals) however many tickers it names, instead of one dict copy per
+# ticker. A postings table of (ticker code, post row) pairs, sorted by
+# ticker and then newest first, is the ticker -> posts inverted index.
+# Grouping, mention counts, top-N and CSV/Parquet export are numpy/pandas
+# operations on those two tables. Snapshots serialise the columns as-is.
+# Per-(ticker, subreddit) mention counts are built once per store, so the
+# feed's reruns only sum a small matrix and slice one ticker's postings.
+
+import importlib.util
+import io
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+UNCATEGORIZED = "UNCATEGORIZED"
+COLUMNS = ("id", "subreddit", "created_utc", "title", "selftext", "url", "summary", "sentiment")
+EXPORT_COLUMNS = ["ticker", "title", "url", "summary", "sentiment"]
+PAGE_SIZE = 100     # posts per page of a ticker's feed
+
+# Parquet export needs pyarrow, which is optional
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+
+class PostStore:
+    def __init__(self, columns, tickers, codes, rows):
+        """
+        `columns`: name -> one value per post for every name in COLUMNS.
+        `tickers`: ticker names; `codes`/`rows`: parallel postings arrays of
+        ticker code (index into `tickers`) and post row.
+        """
+        # Text columns use pandas' string dtype (Arrow-backed when pyarrow is installed)
+        self.posts = pd.DataFrame({name: columns[name] for name in COLUMNS})
+        self.posts["created_utc"] = self.posts["created_utc"].astype("float64")
+        for name in ("subreddit", "sentiment"):
+            self.posts[name] = self.posts[name].astype("category")
+        self.tickers = pd.Index(tickers, dtype=object)
+
+        codes = np.asarray(codes, dtype=np.int32)
+        rows = np.asarray(rows, dtype=np.int32)
+        order = np.lexsort((-self.posts["created_utc"].to_numpy()[rows], codes))
+        self._codes = codes[order]
+        self._rows = rows[order]
+        self._offsets = np.searchsorted(self._codes, np.arange(len(self.tickers) + 1))
+
+    @classmethod
+    def from_posts(cls, columns, post_tickers):
+        """Build from post columns and each post's ticker list (same order as the rows)."""
+        mentions = np.array([ticker for tickers in post_tickers for ticker in tickers], dtype=object)
+        codes, tickers = pd.factorize(mentions)
+        rows = np.repeat(np.arange(len(post_tickers), dtype=np.int32), [len(tickers) for tickers in post_tickers])
+        return cls(columns, tickers, codes, rows)
+
+    @classmethod
+    def from_grouped(cls, grouped):
+        """Convert the {ticker: [post dicts]} shape (old snapshots, `process_post` output)."""
+        builder = PostStoreBuilder()
+        for ticker, posts in grouped.items():
+            for post in posts:
+                builder.add_mention(post, ticker)
+        return builder.build()
+
+    def __len__(self):
+        return len(self.posts)
+
+    @property
+    def mentions(self) -> int:
+        return len(self._rows)
+
+    # --- Per-subreddit index (built on first query; stores are read-only) ---
+    @cached_property
+    def _posting_subreddits(self) -> np.ndarray:
+        """Subreddit category code of each posting."""
+        return self.posts["subreddit"].cat.codes.to_numpy()[self._rows]
+
+    @cached_property
+    def _subreddit_counts(self) -> np.ndarray:
+        """Mentions per (ticker code, subreddit code)."""
+        shape = (len(self.tickers), len(self.posts["subreddit"].cat.categories))
+        cells = self._codes.astype(np.int64) * shape[1] + self._posting_subreddits
+        return np.bincount(cells, minlength=shape[0] * shape[1]).reshape(shape)
+
+    @cached_property
+    def _subreddit_code_of(self) -> dict:
+        return {name: code for code, name in enumerate(self.posts["subreddit"].cat.categories)}
+
+    def _subreddit_codes(self, subreddits):
+        """Category codes of `subreddits`, or None when that is every subreddit in the store."""
+        if subreddits is None:
+            return None
+        codes = sorted({self._subreddit_code_of[name] for name in subreddits if name in self._subreddit_code_of})
+        return None if len(codes) == len(self._subreddit_code_of) else np.array(codes, dtype=np.int64)
+
+    # --- Queries ---
+    def _subreddit_mask(self, subreddits):
+        """Postings mask for posts in `subreddits` (None: everything)."""
+        codes = self._subreddit_codes(subreddits)
+        return None if codes is None else np.isin(self._posting_subreddits, codes)
+
+    def counts(self, subreddits=None) -> pd.Series:
+        """Mentions per ticker, most mentioned first; tickers with none are left out."""
+        codes = self._subreddit_codes(subreddits)
+        per_subreddit = self._subreddit_counts if codes is None else self._subreddit_counts[:, codes]
+        counts = pd.Series(per_subreddit.sum(axis=1), index=self.tickers)
+        return counts[counts > 0].sort_values(ascending=False, kind="stable")
+
+    def top(self, n=10, subreddits=None) -> pd.Series:
+        return self.counts(subreddits).drop(UNCATEGORIZED, errors="ignore").head(n)
+
+    def rows_for(self, ticker, subreddits=None) -> np.ndarray:
+        """Post rows mentioning `ticker`, newest first."""
+        code = self.tickers.get_indexer([ticker])[0]
+        if code < 0:
+            return np.empty(0, dtype=np.int32)
+        start, end = self._offsets[code], self._offsets[code + 1]
+        rows = self._rows[start:end]
+        codes = self._subreddit_codes(subreddits)
+        if codes is not None:
+            rows = rows[np.isin(self._posting_subreddits[start:end], codes)]
+        return rows
+
+    def records(self, rows) -> list:
+        """Post dicts for `rows`."""
+        # Column-wise tolist() avoids pandas' per-cell boxing in to_dict("records")
+        page = self.posts.take(rows)
+        return [dict(zip(COLUMNS, values)) for values in zip(*(page[name].tolist() for name in COLUMNS))]
+
+    def posts_for(self, ticker, subreddits=None, page=0, page_size=PAGE_SIZE) -> list:
+        """Post dicts for one page (0-based) of `ticker`'s posts, newest first."""
+        start = page * page_size
+        return self.records(self.rows_for(ticker, subreddits)[start:start + page_size])
+
+    def grouped(self) -> dict:
+        """{ticker: [post dicts]}; posts naming several tickers are the same dict in each list."""
+        records = self.records(np.arange(len(self.posts)))
+        return {ticker: [records[row] for row in self._rows[self._offsets[code]:self._offsets[code + 1]]]
+                for code, ticker in enumerate(self.tickers)}
+
+    # --- Export ---
+    def export_frame(self, subreddits=None) -> pd.DataFrame:
+        """One (ticker, title, url, summary, sentiment) row per mention."""
+        mask = self._subreddit_mask(subreddits)
+        codes, rows = (self._codes, self._rows) if mask is None else (self._codes[mask], self._rows[mask])
+        frame = self.posts[EXPORT_COLUMNS[1:]].take(rows).reset_index(drop=True)
+        frame.insert(0, "ticker", pd.Categorical.from_codes(codes, categories=self.tickers))
+        return frame
+
+    def to_csv(self, subreddits=None) -> str:
+        return self.export_frame(subreddits).to_csv(index=False)
+
+    def to_parquet(self, subreddits=None) -> bytes:
+        buffer = io.BytesIO()
+        self.export_frame(subreddits).to_parquet(buffer, index=False)
+        return buffer.getvalue()
+
+    # --- Snapshots ---
+    def to_dict(self) -> dict:
+        return {
+            "posts": {name: self.posts[name].tolist() for name in COLUMNS},
+            "tickers": self.tickers.tolist(),
+            "postings": {"ticker": self._codes.tolist(), "post": self._rows.tolist()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["posts"], data["tickers"], data["postings"]["ticker"], data["postings"]["post"])
+
+
+class PostStoreBuilder:
+    """Appends analysed posts straight into column lists; adding a post id again replaces its row (edits)."""
+
+    def __init__(self):
+        self._columns = {name: [] for name in COLUMNS}
+        self._column_lists = list(self._columns.values())
+        self._tickers = []    # ticker list per row
+        self._row_of = {}     # post id -> row
+
+    def __len__(self):
+        return len(self._tickers)
+
+    def _put(self, key, values, tickers):
+        row = self._row_of.get(key)
+        if row is None:
+            self._row_of[key] = len(self._tickers)
+            for column, value in zip(self._column_lists, values):
+                column.append(value)
+            self._tickers.append(tickers)
+        else:
+            for column, value in zip(self._column_lists, values):
+                column[row] = value
+            self._tickers[row] = tickers
+
+    def add(self, post, tickers, summary, sentiment):
+        self._put(post["id"], (post["id"], post["subreddit"], post["created_utc"], post["title"], post["selftext"],
+                               post["url"], summary, str(sentiment)), tuple(dict.fromkeys(tickers)))
+
+    def add_mention(self, post, ticker):
+        """Add one (ticker, post dict) pair; posts without an id are matched by url."""
+        key = post.get("id") or post["url"]
+        row = self._row_of.get(key)
+        if row is None:
+            self._put(key, (key, post.get("subreddit", ""), post.get("created_utc", 0.0), post["title"],
+                            post["selftext"], post["url"], post.get("summary", ""),
+                            str(post.get("sentiment", "neutral"))), (ticker,))
+        elif ticker not in self._tickers[row]:
+            self._tickers[row] += (ticker,)
+
+    def build(self) -> PostStore:
+        return PostStore.from_posts(self._columns, self._tickers)
@@ -0,0 +1,106 @@
+# prefilter.py - CrowdAlpha | Cheap local pre-classification before the LLM
+#
+# Most Reddit posts are memes, meta threads or chatter that names no security.
+# `classify` looks at ticker-table hits, thesis/meta keywords and (optionally)
+# a small sentiment lexicon, and only routes posts that look like they carry
+# an investment thesis to the LLM. Everything else gets a local result. Posts
+# with no listed ticker still go to the LLM when they contain a ticker-like
+# word or a thesis (beyond buy/sell/hold talk), since the symbol table may
+# lack the listing.
+
+import os
+import re
+
+from ticker_extract import candidate_symbols, extract_tickers
+
+# --- Config ---
+PREFILTER_ENABLED = os.getenv("LLM_PREFILTER", "1") == "1"
+LEXICON_SENTIMENT = os.getenv("PREFILTER_LEXICON", "1") == "1"
+MIN_THESIS_SCORE = int(os.getenv("PREFILTER_MIN_SCORE", 2))
+LONG_POST_CHARS = 400   # long self-posts with a ticker count as one thesis hit
+
+WORD_REGEX = re.compile(r"[a-z][a-z'/-]+|[\U0001F300-\U0001FAFF]")
+
+THESIS_KEYWORDS = frozenset("""
+earnings revenue guidance margin margins eps valuation undervalued overvalued dcf multiple
+p/e fcf cash-flow dividend dividends buyback buybacks debt balance sheet growth outlook
+forecast target catalyst thesis dd fundamentals moat competition market-share contract
+contracts acquisition merger acquire fda approval trial lawsuit downgrade upgrade analyst
+analysts calls puts options leaps strike expiry shares position bought sold buy sell long
+short hold holding short-squeeze squeeze float insider report quarter quarterly beat miss
+missed raised cut cuts split spinoff ipo
+""".split())
+# Trading verbs say nothing about which security is meant, so they don't
+# count towards sending a ticker-less post to the LLM
+ACTION_KEYWORDS = frozenset("""
+buy sell hold holding bought sold long short shares position calls puts options
+""".split())
+_TICKERLESS_KEYWORDS = THESIS_KEYWORDS - ACTION_KEYWORDS
+
+META_REGEX = re.compile(
+    r"daily discussion|weekend discussion|weekly (thread|discussion)|what are your moves|"
+    r"rate my portfolio|loss porn|gain porn|\bmeme\b|shitpost|\bmods?\b|ban bet|subreddit|"
+    r"\bama\b|megathread",
+    re.IGNORECASE
+)
+
+BULLISH_WORDS = frozenset("""
+bull bullish buy buying bought long calls moon mooning rip ripping squeeze undervalued beat
+beats upgrade upgraded growth strong breakout rally rallying soar soaring surge surging
+printing tendies green up higher record profitable cheap accumulate 🚀 📈 💎 🐂
+""".split())
+
+BEARISH_WORDS = frozenset("""
+bear bearish sell selling sold short shorting puts crash crashing dump dumping overvalued
+miss missed downgrade downgraded weak bagholding bagholder drop dropping plunge tank tanking
+red down lower bankrupt bankruptcy dilution fraud lawsuit expensive bubble 📉 🌈 🐻
+""".split())
+
+
+# --- Scoring ---
+def lexicon_sentiment(text) -> str:
+    """Bullish/bearish/neutral from word counts against a tiny finance lexicon."""
+    words = WORD_REGEX.findall(text.lower())
+    score = sum(w in BULLISH_WORDS for w in words) - sum(w in BEARISH_WORDS for w in words)
+    if score > 0:
+        return "bullish"
+    if score < 0:
+        return "bearish"
+    return "neutral"
+
+
+def thesis_score(title, selftext, keywords=THESIS_KEYWORDS) -> int:
+    """Distinct thesis keywords in the post, plus one for a long self-post."""
+    words = set(WORD_REGEX.findall(f"{title}\n{selftext}".lower()))
+    return len(words & keywords) + (len(selftext) >= LONG_POST_CHARS)
+
+
+def _local_result(tickers, text, reason):
+    sentiment = lexicon_sentiment(text) if LEXICON_SENTIMENT else "neutral"
+    return {"ticker": tickers, "sentiment": sentiment, "reason": [reason]}
+
+
+def classify(title, selftext=""):
+    """
+    Returns None if the post should go to the LLM, otherwise a locally
+    computed result in the same shape as `crowdalpha.parse_thesis` output.
+    """
+    if not PREFILTER_ENABLED:
+        return None
+    text = f"{title}\n{selftext}"
+    tickers = extract_tickers(text)
+    if META_REGEX.search(title):
+        return _local_result(tickers, text, "Discussion/meta thread")
+    if not tickers:
+        # The symbol table can miss listings (the seed list only has the most
+        # discussed ones), so anything ticker-like or thesis-like goes to the LLM
+        if candidate_symbols(text) or thesis_score(title, selftext, _TICKERLESS_KEYWORDS) >= MIN_THESIS_SCORE:
+            return None
+        return _local_result([], text, "No tradable securities mentioned")
+    if thesis_score(title, selftext) < MIN_THESIS_SCORE:
+        return _local_result(tickers, text, "Mentioned without an investment thesis")
+    return None
+
+
+def classify_post(post):
+    return classify(post["title"], post.get("selftext", ""))
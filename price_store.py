@@ -0,0 +1,245 @@
+# price_store.py - CrowdAlpha | Columnar on-disk daily price history
+#
+# One append-only file of fixed-width records per symbol, read through
+# np.memmap, plus a small JSON sidecar (timezone, last refresh). A refresh
+# downloads only the bars after the last stored one, for every stale symbol
+# in one batched request, and any window (1mo, 1y, 5y...) is then served by
+# slicing the local file.
+#
+# Prices are split/dividend adjusted, so an adjustment changes old bars too:
+# the last finalised bar is re-downloaded with every refresh and a mismatch
+# triggers a full re-download of that symbol. Asking for a longer window
+# than a symbol was backfilled with (10y, max) re-downloads it at that
+# depth once. Downloads run outside the lock; it only guards file writes
+# and reads.
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+# --- Config ---
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR", "price_store")
+BACKFILL_PERIOD = os.getenv("PRICE_BACKFILL_PERIOD", "5y")
+REFRESH_TTL = int(os.getenv("MARKET_HISTORY_TTL", 5 * 60))   # seconds between incremental refreshes
+ADJUSTMENT_TOLERANCE = 1e-4
+
+BAR_DTYPE = np.dtype([("ts", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+                      ("close", "<f8"), ("volume", "<f8")])
+COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+PERIOD_OFFSETS = {
+    "5d": pd.DateOffset(days=5), "1mo": pd.DateOffset(months=1), "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6), "1y": pd.DateOffset(years=1), "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5), "10y": pd.DateOffset(years=10),
+}
+SUPPORTED_PERIODS = set(PERIOD_OFFSETS) | {"ytd", "max"}
+DEPTHS = list(PERIOD_OFFSETS) + ["max"]     # backfill periods, shallowest first
+
+_lock = threading.Lock()
+
+stats = {"downloads": 0, "bars_appended": 0, "rebuilds": 0}
+
+
+def _data_path(symbol) -> str:
+    return os.path.join(PRICE_STORE_DIR, f"{symbol}.bars")
+
+
+def _meta_path(symbol) -> str:
+    return os.path.join(PRICE_STORE_DIR, f"{symbol}.json")
+
+
+def _read_meta(symbol) -> dict:
+    try:
+        with open(_meta_path(symbol)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_meta(symbol, meta):
+    tmp_path = _meta_path(symbol) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, _meta_path(symbol))
+
+
+def _depth(period) -> int:
+    return DEPTHS.index("1y" if period == "ytd" else period)
+
+
+def _deeper(*periods) -> str:
+    return max(periods, key=_depth)
+
+
+def _bars(symbol):
+    """Memory-mapped records for `symbol` (empty array if nothing is stored)."""
+    path = _data_path(symbol)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    count = size // BAR_DTYPE.itemsize
+    if count == 0:
+        return np.empty(0, dtype=BAR_DTYPE)
+    return np.memmap(path, dtype=BAR_DTYPE, mode="r", shape=(count,))
+
+
+# --- Downloads ---
+def download(symbols, **kwargs) -> dict:
+    """One batched yf.download. Returns {symbol: OHLCV DataFrame} for symbols with data."""
+    import yfinance as yf   # slow import; cached windows never need it
+    stats["downloads"] += 1
+    with metrics.timer("yfinance_download"):
+        data = yf.download(symbols, group_by="ticker", auto_adjust=True, threads=True, progress=False, **kwargs)
+    metrics.inc("yfinance_symbols_requested_total", len(symbols))
+    frames = {}
+    if data is None or data.empty:
+        return frames
+    for symbol in symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                continue
+            frame = data[symbol]
+        else:
+            frame = data
+        frame = frame.dropna(subset=["Close"])
+        if not frame.empty:
+            frames[symbol] = frame
+    return frames
+
+
+def _to_records(frame):
+    index = frame.index
+    utc = index.tz_convert("UTC") if index.tz is not None else index
+    records = np.empty(len(frame), dtype=BAR_DTYPE)
+    records["ts"] = utc.tz_localize(None).values.astype("datetime64[s]").astype("<i8")
+    for field, column in COLUMNS.items():
+        records[field] = frame[column].to_numpy(dtype="f8") if column in frame else np.nan
+    return records
+
+
+def _write_bars(symbol, frame, replace=False, depth=None):
+    """Append the bars in `frame`, overwriting stored bars at or after its first timestamp."""
+    records = _to_records(frame)
+    path = _data_path(symbol)
+    if not replace and len(records):
+        existing = _bars(symbol)
+        keep = int(np.searchsorted(existing["ts"], records["ts"][0], side="left"))
+        del existing
+        with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+            f.truncate(keep * BAR_DTYPE.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(records.tobytes())
+    else:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(records.tobytes())
+        os.replace(tmp_path, path)
+    stats["bars_appended"] += len(records)
+    meta = _read_meta(symbol)
+    meta["tz"] = str(frame.index.tz) if frame.index.tz is not None else meta.get("tz")
+    meta["refreshed_at"] = time.time()
+    if depth is not None:
+        meta["depth"] = depth
+    _write_meta(symbol, meta)
+
+
+def _adjusted_since_stored(symbol, frame) -> bool:
+    """True if the overlapping finalised bar no longer matches what is stored (split/dividend)."""
+    bars = _bars(symbol)
+    if len(bars) < 2 or frame.empty:
+        return False
+    check_ts, stored_close = int(bars["ts"][-2]), float(bars["close"][-2])
+    fresh = _to_records(frame)
+    match = np.nonzero(fresh["ts"] == check_ts)[0]
+    if not len(match):
+        return False
+    fresh_close = float(fresh["close"][match[0]])
+    return abs(fresh_close - stored_close) > ADJUSTMENT_TOLERANCE * max(abs(stored_close), 1.0)
+
+
+def update(symbols, force=False, period=BACKFILL_PERIOD) -> int:
+    """
+    Bring stored history up to date, covering at least `period`. New
+    symbols, and symbols stored with less history than that, are backfilled
+    with one request per depth. The rest get only their missing bars in
+    another request. Returns the number of symbols refreshed.
+    """
+    os.makedirs(PRICE_STORE_DIR, exist_ok=True)
+    now = time.time()
+    wanted = _deeper(BACKFILL_PERIOD, period)
+    backfill, incremental, since = {}, [], None     # backfill: symbol -> period to download
+    with _lock:
+        for symbol in symbols:
+            meta = _read_meta(symbol)
+            stored = len(_bars(symbol))
+            if stored >= 2 and _depth(meta.get("depth", BACKFILL_PERIOD)) < _depth(wanted):
+                backfill[symbol] = wanted
+            elif not force and now - meta.get("refreshed_at", 0) < REFRESH_TTL:
+                continue
+            elif stored < 2:
+                backfill[symbol] = wanted
+            else:
+                incremental.append(symbol)
+                # Re-download from the second-to-last bar: it is finalised, so it detects adjustments
+                start = pd.Timestamp(int(_bars(symbol)["ts"][-2]), unit="s").normalize()
+                since = start if since is None else min(since, start)
+
+    if incremental:
+        frames = download(incremental, start=since.strftime("%Y-%m-%d"), interval="1d")
+        with _lock:
+            for symbol, frame in frames.items():
+                if _adjusted_since_stored(symbol, frame):
+                    stats["rebuilds"] += 1
+                    backfill[symbol] = _deeper(wanted, _read_meta(symbol).get("depth", BACKFILL_PERIOD))
+                else:
+                    _write_bars(symbol, frame)
+    for depth in set(backfill.values()):
+        group = [symbol for symbol, symbol_depth in backfill.items() if symbol_depth == depth]
+        found = download(group, period=depth, interval="1d")
+        with _lock:
+            for symbol, frame in found.items():
+                _write_bars(symbol, frame, replace=True, depth=depth)
+            # Unknown/delisted symbols: don't ask again on every rerun
+            for symbol in set(group) - set(found):
+                _write_meta(symbol, dict(_read_meta(symbol), refreshed_at=now, depth=depth))
+    return len(set(backfill) | set(incremental))
+
+
+# --- Reads ---
+def window_start(period, now=None):
+    """Start of a yfinance-style period ("1mo", "1y", "ytd", "max") as a UTC timestamp, or None for max."""
+    now = pd.Timestamp.now(tz="UTC") if now is None else now
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=now.year, month=1, day=1, tz="UTC")
+    if period not in PERIOD_OFFSETS:
+        raise ValueError(f"Unsupported period: {period}")
+    return now - PERIOD_OFFSETS[period]
+
+
+def read(symbol, period="1mo"):
+    """Stored daily bars for the window as an OHLCV DataFrame (None if nothing is stored)."""
+    start = window_start(period)
+    with _lock:     # update() may truncate the file under the map
+        bars = _bars(symbol)
+        if not len(bars):
+            return None
+        first = 0 if start is None else int(np.searchsorted(bars["ts"], int(start.timestamp()), side="left"))
+        window = np.array(bars[first:])     # copy out of the memmap
+        del bars
+    index = pd.to_datetime(window["ts"], unit="s", utc=True)
+    tz = _read_meta(symbol).get("tz")
+    index = index.tz_convert(tz) if tz else index.tz_localize(None)
+    return pd.DataFrame({column: window[field] for field, column in COLUMNS.items()},
+                        index=pd.DatetimeIndex(index, name="Date"))
+
+
+def load(symbols, period="1mo") -> dict:
+    """Refresh stale symbols, then read the window for each. Symbols without data are left out."""
+    update(symbols, period=period)
+    frames = {symbol: read(symbol, period) for symbol in symbols}
+    return {symbol: frame for symbol, frame in frames.items() if frame is not None and not frame.empty}
@@ -0,0 +1,323 @@
+# rate_limit.py - CrowdAlpha | Shared per-provider rate limiting for LLM calls
+#
+# Each provider gets a limiter with two token buckets (requests/min and
+# tokens/min) and an AIMD in-flight limit: it grows by ~1 per round of
+# successful calls and halves on every 429. Retry-After is honoured by
+# pausing the whole provider, not just the caller that got the 429, and the
+# request bucket restarts empty after the pause instead of bursting.
+
+import asyncio
+import concurrent.futures
+import os
+import random
+import threading
+import time
+
+import metrics
+
+# --- Defaults (Groq / OpenRouter free tiers) ---
+PROVIDER_QUOTAS = {
+    "groq": {
+        "rpm": int(os.getenv("GROQ_RPM", 30)),
+        "tpm": int(os.getenv("GROQ_TPM", 6000)),
+        "max_concurrency": int(os.getenv("GROQ_CONCURRENCY", 8)),
+    },
+    "openrouter": {
+        "rpm": int(os.getenv("OPENROUTER_RPM", 20)),
+        "tpm": int(os.getenv("OPENROUTER_TPM", 100_000)),
+        "max_concurrency": int(os.getenv("OPENROUTER_CONCURRENCY", 4)),
+    },
+}
+BURST_SECONDS = 2.0          # bucket capacity, in seconds of quota
+# Largest single request (the model's context window). The token bucket holds
+# at least this much, capped at a minute's quota, so a big batch prompt goes
+# through on a full bucket instead of waiting for a minute of refill
+MAX_REQUEST_TOKENS = int(os.getenv("LLM_MAX_REQUEST_TOKENS", 8192))
+MAX_RETRIES = 4
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+POLL_INTERVAL = 0.05
+COMPLETION_TOKENS_ESTIMATE = 256
+
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS, largest=1):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds, min(largest, per_minute))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def wait_time(self, amount, now) -> float:
+        """Seconds until `amount` can be taken. Oversized requests wait for a full bucket."""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= amount
+
+    def drain(self, until):
+        """Empty the bucket and start refilling at `until` (after a provider-wide pause)."""
+        self.tokens = min(self.tokens, 0.0)
+        self.updated = max(self.updated, until)
+
+
+class ProviderLimiter:
+    def __init__(self, name, rpm, tpm, max_concurrency, min_concurrency=1, burst_seconds=BURST_SECONDS):
+        self.name = name
+        self.requests = TokenBucket(rpm, burst_seconds)
+        self.token_budget = TokenBucket(tpm, burst_seconds, largest=MAX_REQUEST_TOKENS)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = float(max(min_concurrency, max_concurrency // 2))
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0, "retries": 0}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens) -> float:
+        """Reserve a slot and return 0, or return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.cooldown_until:
+                return self.cooldown_until - now
+            if self.in_flight >= int(self.concurrency):
+                return POLL_INTERVAL
+            wait = max(self.requests.wait_time(1, now), self.token_budget.wait_time(tokens, now))
+            if wait > 0:
+                return wait
+            self.requests.take(1)
+            self.token_budget.take(tokens)
+            self.in_flight += 1
+            self.stats["requests"] += 1
+            return 0.0
+
+    def acquire(self, tokens, cancelled=None):
+        while True:
+            _check_cancelled(cancelled)
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            _sleep(wait + random.uniform(0, POLL_INTERVAL), cancelled)
+
+    async def aacquire(self, tokens):
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait + random.uniform(0, POLL_INTERVAL))
+
+    def record_retry(self):
+        with self._lock:
+            self.stats["retries"] += 1
+        metrics.inc("llm_retries_total", provider=self.name)
+
+    def release(self, ok=True, rate_limited=False, retry_after=None, estimated=0, used=None):
+        with self._lock:
+            self.in_flight -= 1
+            if rate_limited:
+                self.stats["rate_limited"] += 1
+                metrics.inc("llm_rate_limited_total", provider=self.name)
+                now = time.monotonic()
+                # A burst of 429s from the same overload only halves the limit once
+                if now >= self.cooldown_until:
+                    self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                pause = retry_after if retry_after is not None else BASE_BACKOFF
+                self.cooldown_until = max(self.cooldown_until, now + pause)
+                # No burst when the pause ends: the provider's window is still nearly full
+                self.requests.drain(self.cooldown_until)
+            elif ok:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            elif ok is False:
+                self.stats["errors"] += 1
+            if used is not None:
+                # Charge the real token usage instead of the estimate
+                self.token_budget.take(used - estimated)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name) -> ProviderLimiter:
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = ProviderLimiter(name, **PROVIDER_QUOTAS.get(name, PROVIDER_QUOTAS["openrouter"]))
+        return _limiters[name]
+
+
+def configure_limiter(name, rpm, tpm, max_concurrency, burst_seconds=BURST_SECONDS) -> ProviderLimiter:
+    with _limiters_lock:
+        _limiters[name] = ProviderLimiter(name, rpm, tpm, max_concurrency, burst_seconds=burst_seconds)
+        return _limiters[name]
+
+
+def share_quotas(processes):
+    """
+    Give this process 1/`processes` of every provider's RPM and TPM, for
+    worker processes sharing one API key. In-flight limits stay per process
+    (AIMD still backs off on 429s).
+    """
+    for name, quota in PROVIDER_QUOTAS.items():
+        configure_limiter(name, quota["rpm"] / processes, quota["tpm"] / processes, quota["max_concurrency"])
+
+
+def estimate_request_tokens(messages) -> int:
+    return sum(len(m["content"]) // 4 + 1 for m in messages) + COMPLETION_TOKENS_ESTIMATE
+
+
+def get_retry_after(error):
+    """Seconds from a 429's Retry-After (or retry-after-ms) header, if present."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def backoff_delay(attempt) -> float:
+    return min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def _used_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+def _openai_errors():
+    """(rate limit error, retryable errors). The SDK is imported lazily; the client already loaded it."""
+    import openai
+    return openai.RateLimitError, (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+
+def _check_cancelled(cancelled):
+    if cancelled is not None and cancelled.is_set():
+        raise concurrent.futures.CancelledError()
+
+
+def _sleep(seconds, cancelled=None):
+    """time.sleep that a set `cancelled` event cuts short."""
+    if cancelled is None:
+        time.sleep(seconds)
+    else:
+        cancelled.wait(seconds)
+
+
+def chat_completion(provider, client, model, messages, max_retries=MAX_RETRIES, cancelled=None):
+    """
+    `client.chat.completions.create` behind the provider's limiter, retrying
+    429s and transient errors. Once the `cancelled` event is set (a hedged
+    request that lost) it stops waiting for a slot and stops retrying; an
+    attempt already on the wire still runs to the client timeout.
+    """
+    rate_limit_error, retryable_errors = _openai_errors()
+    limiter = get_limiter(provider)
+    estimated = estimate_request_tokens(messages)
+    for attempt in range(max_retries + 1):
+        limiter.acquire(estimated, cancelled)
+        try:
+            response = client.chat.completions.create(model=model, messages=messages)
+        except rate_limit_error as e:
+            limiter.release(rate_limited=True, retry_after=get_retry_after(e) or backoff_delay(attempt))
+            if attempt == max_retries:
+                raise
+        except retryable_errors:
+            limiter.release(ok=False)
+            if attempt == max_retries:
+                raise
+            _sleep(backoff_delay(attempt), cancelled)
+        except Exception:
+            limiter.release(ok=False)
+            raise
+        else:
+            limiter.release(estimated=estimated, used=_used_tokens(response))
+            return response
+        limiter.record_retry()
+
+
+def chat_completion_stream(provider, client, model, messages, max_retries=MAX_RETRIES):
+    """
+    Streaming `chat_completion`: yields content deltas as they arrive. Only
+    opening the stream is retried; the limiter slot is held until it ends.
+    """
+    rate_limit_error, retryable_errors = _openai_errors()
+    limiter = get_limiter(provider)
+    estimated = estimate_request_tokens(messages)
+    for attempt in range(max_retries + 1):
+        limiter.acquire(estimated)
+        try:
+            stream = client.chat.completions.create(model=model, messages=messages, stream=True)
+        except rate_limit_error as e:
+            limiter.release(rate_limited=True, retry_after=get_retry_after(e) or backoff_delay(attempt))
+            if attempt == max_retries:
+                raise
+        except retryable_errors:
+            limiter.release(ok=False)
+            if attempt == max_retries:
+                raise
+            time.sleep(backoff_delay(attempt))
+        except Exception:
+            limiter.release(ok=False)
+            raise
+        else:
+            break
+        limiter.record_retry()
+
+    # Streams carry no usage block, so the completion is charged by length
+    completion_chars = 0
+    ok = False
+    try:
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                completion_chars += len(delta)
+                yield delta
+        ok = True
+    except GeneratorExit:
+        # The reader stopped early; not the provider's fault
+        ok = None
+        stream.close()
+        raise
+    finally:
+        limiter.release(ok=ok, estimated=estimated,
+                        used=estimated - COMPLETION_TOKENS_ESTIMATE + completion_chars // 4 + 1)
+
+
+async def achat_completion(provider, client, model, messages, max_retries=MAX_RETRIES):
+    """Async counterpart of `chat_completion` for AsyncOpenAI clients."""
+    rate_limit_error, retryable_errors = _openai_errors()
+    limiter = get_limiter(provider)
+    estimated = estimate_request_tokens(messages)
+    for attempt in range(max_retries + 1):
+        await limiter.aacquire(estimated)
+        try:
+            response = await client.chat.completions.create(model=model, messages=messages)
+        except asyncio.CancelledError:
+            # Lost a hedged race; free the slot without counting an error
+            limiter.release(ok=None)
+            raise
+        except rate_limit_error as e:
+            limiter.release(rate_limited=True, retry_after=get_retry_after(e) or backoff_delay(attempt))
+            if attempt == max_retries:
+                raise
+        except retryable_errors:
+            limiter.release(ok=False)
+            if attempt == max_retries:
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+        except Exception:
+            limiter.release(ok=False)
+            raise
+        else:
+            limiter.release(estimated=estimated, used=_used_tokens(response))
+            return response
+        limiter.record_retry()
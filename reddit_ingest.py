@@ -0,0 +1,275 @@
+# reddit_ingest.py - CrowdAlpha | Incremental Reddit ingestion into a persisted ticker index
+#
+# Each subreddit keeps a cursor (newest created_utc seen). A refresh walks
+# `new()` only until it reaches that watermark, analyses just the delta and
+# merges it into an SQLite ticker -> post index (and the sentiment time
+# series in sentiment_store). Readers load the window as a PostStore. Recent posts are re-checked
+# for edits in one `reddit.info()` call per 100 ids. Posts and sentiment
+# history older than RETENTION are pruned at most once an hour.
+
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+import async_pipeline
+import crowdalpha as core
+import metrics
+import post_store
+import sentiment_store
+
+# --- Config ---
+INDEX_FILE = os.getenv("REDDIT_INDEX_PATH", "reddit_index.db")
+SUBREDDITS = [s.strip() for s in os.getenv("REDDIT_SUBREDDITS", "stocks,wallstreetbets,investing").split(",") if s.strip()]
+INITIAL_LIMIT = int(os.getenv("REDDIT_INITIAL_LIMIT", 100))   # first fetch for a new subreddit
+DELTA_LIMIT = 1000                                              # Reddit listings stop at 1000 anyway
+REFRESH_INTERVAL = int(os.getenv("REDDIT_REFRESH_INTERVAL", 60))
+EDIT_CHECK_INTERVAL = 600
+EDIT_WINDOW = 24 * 3600
+INDEX_WINDOW = int(os.getenv("REDDIT_INDEX_WINDOW_DAYS", 7)) * 24 * 3600
+# Posts and sentiment history older than this are deleted (the sentiment chart goes back 30 days)
+RETENTION = max(INDEX_WINDOW, int(os.getenv("REDDIT_RETENTION_DAYS", 30)) * 24 * 3600)
+PRUNE_INTERVAL = 3600
+
+LLM_ERROR = core.parse_thesis(core.LLM_ERROR_RESULT)
+
+# --- Totals for the last refresh() across subreddits ---
+refresh_stats = {"posts": 0, "llm_calls": 0, "llm_calls_avoided": 0, "near_duplicates": 0}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cursors (
+    subreddit TEXT PRIMARY KEY,
+    watermark REAL NOT NULL DEFAULT 0,
+    refreshed_at REAL NOT NULL DEFAULT 0,
+    edits_checked_at REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS posts (
+    id TEXT PRIMARY KEY,
+    subreddit TEXT NOT NULL,
+    created_utc REAL NOT NULL,
+    edited REAL NOT NULL DEFAULT 0,
+    title TEXT NOT NULL,
+    selftext TEXT NOT NULL,
+    url TEXT NOT NULL,
+    summary TEXT,
+    sentiment TEXT,
+    tickers TEXT
+);
+CREATE INDEX IF NOT EXISTS posts_created ON posts (subreddit, created_utc);
+CREATE TABLE IF NOT EXISTS ticker_posts (
+    ticker TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    created_utc REAL NOT NULL,
+    PRIMARY KEY (ticker, post_id)
+);
+CREATE INDEX IF NOT EXISTS ticker_posts_created ON ticker_posts (ticker, created_utc);
+"""
+
+
+_schema_ready = set()     # database files this process already created the tables in
+_pruned_at = {}
+
+
+def _connect(path=None):
+    path = os.path.abspath(path or INDEX_FILE)
+    conn = sqlite3.connect(path, timeout=30)
+    if path not in _schema_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA + sentiment_store.SCHEMA)
+        _schema_ready.add(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+# --- Fetching ---
+def _cursor(conn, subreddit):
+    row = conn.execute("SELECT * FROM cursors WHERE subreddit = ?", (subreddit,)).fetchone()
+    return dict(row) if row else {"subreddit": subreddit, "watermark": 0, "refreshed_at": 0, "edits_checked_at": 0}
+
+
+def fetch_new_posts(subreddit, watermark):
+    """Walk `new()` newest-first and stop at the watermark."""
+    limit = DELTA_LIMIT if watermark else INITIAL_LIMIT
+    posts = []
+    with metrics.timer("fetch_reddit_posts", subreddit=subreddit):
+        for submission in core.get_reddit().subreddit(subreddit).new(limit=limit):
+            if submission.created_utc < watermark:
+                break
+            if core.is_relevant_submission(submission):
+                posts.append(core.submission_to_post(submission))
+    return posts
+
+
+def fetch_edited_posts(conn, subreddit):
+    """Re-fetch recent posts in bulk and return those whose text changed."""
+    rows = conn.execute(
+        "SELECT id, edited FROM posts WHERE subreddit = ? AND created_utc >= ?",
+        (subreddit, time.time() - EDIT_WINDOW)
+    ).fetchall()
+    known = {row["id"]: row["edited"] for row in rows}
+    edited = []
+    ids = list(known)
+    with metrics.timer("fetch_edited_posts", subreddit=subreddit):
+        for i in range(0, len(ids), 100):
+            fullnames = [f"t3_{post_id}" for post_id in ids[i:i + 100]]
+            for submission in core.get_reddit().info(fullnames=fullnames):
+                if (submission.edited or 0) > known.get(submission.id, 0):
+                    edited.append(core.submission_to_post(submission))
+    return edited
+
+
+# --- Index Updates ---
+def store_posts(conn, analysed):
+    """Upsert analysed posts and rebuild their ticker rows (idempotent: storing a post again replaces it)."""
+    with conn:
+        for post, llm_result in analysed:
+            tickers, summary, sentiment = core.analyse_post(post, llm_result)
+            conn.execute(
+                "INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (post["id"], post["subreddit"], post["created_utc"], post["edited"], post["title"],
+                 post["selftext"], post["url"], summary, str(sentiment), json.dumps(tickers))
+            )
+            conn.execute("DELETE FROM ticker_posts WHERE post_id = ?", (post["id"],))
+            conn.executemany(
+                "INSERT OR IGNORE INTO ticker_posts VALUES (?, ?, ?)",
+                [(ticker, post["id"], post["created_utc"]) for ticker in tickers]
+            )
+            sentiment_store.record_post(conn, post["id"], post["subreddit"], post["created_utc"],
+                                        sentiment, tickers)
+
+
+def prune(conn, now=None) -> int:
+    """Delete posts and sentiment history older than RETENTION. Returns posts deleted."""
+    before = (time.time() if now is None else now) - RETENTION
+    with conn:
+        conn.execute("DELETE FROM ticker_posts WHERE created_utc < ?", (before,))
+        deleted = conn.execute("DELETE FROM posts WHERE created_utc < ?", (before,)).rowcount
+        sentiment_store.prune(conn, before)
+    return deleted
+
+
+def _analyse(posts):
+    """(post, result) pairs for the posts the LLM answered; failed posts are left out so they are retried."""
+    analysed = []
+    if posts:
+        with metrics.timer("group_posts_by_ticker"):
+            async_pipeline.run(posts=posts, on_result=lambda post, result: analysed.append((post, result)))
+        for key in refresh_stats:
+            refresh_stats[key] += core.pipeline_stats.get(key, 0)
+    return [(post, result) for post, result in analysed if result != LLM_ERROR]
+
+
+def refresh_subreddit(subreddit, force=False, path=None, force_edits=False) -> int:
+    """
+    Ingest the delta for one subreddit. `force` skips REFRESH_INTERVAL,
+    `force_edits` also EDIT_CHECK_INTERVAL. Returns the number of posts stored.
+    """
+    conn = _connect(path)
+    try:
+        cursor = _cursor(conn, subreddit)
+        now = time.time()
+        if not force and now - cursor["refreshed_at"] < REFRESH_INTERVAL:
+            return 0
+
+        new_posts = fetch_new_posts(subreddit, cursor["watermark"])
+        # Posts sharing the watermark second may already be indexed
+        if new_posts:
+            placeholders = ",".join("?" * len(new_posts))
+            seen = {row["id"] for row in conn.execute(
+                f"SELECT id FROM posts WHERE id IN ({placeholders})", [p["id"] for p in new_posts])}
+            new_posts = [p for p in new_posts if p["id"] not in seen]
+
+        edited_posts = []
+        if force_edits or now - cursor["edits_checked_at"] >= EDIT_CHECK_INTERVAL:
+            edited_posts = fetch_edited_posts(conn, subreddit)
+            cursor["edits_checked_at"] = now
+
+        analysed = _analyse(new_posts + edited_posts)
+        store_posts(conn, analysed)
+
+        # Failed edits keep their old `edited` time, so the next edit check retries them. Failed new
+        # posts hold the watermark back to the oldest of them; posts stored since are skipped as seen.
+        stored = {post["id"] for post, _ in analysed}
+        failed = [p["created_utc"] for p in new_posts if p["id"] not in stored]
+        if failed:
+            print(f"r/{subreddit}: LLM failed for {len(failed)} new posts, retrying them on the next refresh")
+        watermark = min(failed) if failed else max([cursor["watermark"]] + [p["created_utc"] for p in new_posts])
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cursors VALUES (?, ?, ?, ?)",
+                (subreddit, watermark, now, cursor["edits_checked_at"])
+            )
+        return len(stored)
+    except Exception as e:
+        metrics.inc("stage_errors_total", stage="refresh_subreddit", error=type(e).__name__)
+        print(f"Error refreshing r/{subreddit}: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+def refresh(subreddits=None, force=False, path=None, force_edits=False) -> dict:
+    """Refresh every subreddit whose cursor is older than REFRESH_INTERVAL (all of them with `force`)."""
+    refresh_stats.update(posts=0, llm_calls=0, llm_calls_avoided=0, near_duplicates=0)
+    conn = _connect(path)
+    try:
+        sentiment_store.backfill(conn)
+        now = time.time()
+        if now - _pruned_at.get(path, 0) >= PRUNE_INTERVAL:
+            prune(conn, now)
+            _pruned_at[path] = now
+    finally:
+        conn.close()
+    return {name: refresh_subreddit(name, force, path, force_edits) for name in (subreddits or SUBREDDITS)}
+
+
+# --- Index Reads ---
+def _since():
+    return time.time() - INDEX_WINDOW
+
+
+def _subreddit_filter(subreddits):
+    subreddits = list(subreddits or SUBREDDITS)
+    return f"p.subreddit IN ({','.join('?' * len(subreddits))})", subreddits
+
+
+def load_store(subreddits=None, path=None) -> post_store.PostStore:
+    """The whole index window as a PostStore: each post once plus the ticker postings."""
+    where, params = _subreddit_filter(subreddits)
+    conn = _connect(path)
+    try:
+        posts = conn.execute(
+            f"SELECT {', '.join(post_store.COLUMNS)} FROM posts p WHERE p.created_utc >= ? AND {where}",
+            [_since()] + params
+        ).fetchall()
+        mentions = conn.execute(
+            f"SELECT t.ticker, t.post_id FROM ticker_posts t JOIN posts p ON p.id = t.post_id "
+            f"WHERE t.created_utc >= ? AND {where}",
+            [_since()] + params
+        ).fetchall()
+    finally:
+        conn.close()
+    columns = dict(zip(post_store.COLUMNS, zip(*posts))) if posts else {}
+    columns = {name: list(columns.get(name, ())) for name in post_store.COLUMNS}
+    tickers = pd.Categorical([row[0] for row in mentions])
+    rows = pd.Index(columns["id"]).get_indexer([row[1] for row in mentions])
+    return post_store.PostStore(columns, tickers.categories, tickers.codes, rows)
+
+
+def sentiment_aggregates(subreddits=None, path=None) -> dict:
+    """Rolling 1h/24h/7d mention and sentiment aggregates per ticker (from the sentiment buckets)."""
+    conn = _connect(path)
+    try:
+        return sentiment_store.window_aggregates(conn, list(subreddits or SUBREDDITS))
+    finally:
+        conn.close()
+
+
+def sentiment_series(ticker, subreddits=None, days=7, step=3600, path=None) -> list:
+    conn = _connect(path)
+    try:
+        return sentiment_store.series(conn, ticker, list(subreddits or SUBREDDITS), time.time() - days * 24 * 3600, step)
+    finally:
+        conn.close()
@@ -0,0 +1,46 @@
+# resources.py - CrowdAlpha | Lazily created clients shared by every tab and the worker
+#
+# Expensive clients (praw, OpenAI SDK) are registered as factories and built
+# on first use, once per process, so importing a module never opens a
+# connection or pulls in an SDK the current tab doesn't need. Streamlit keeps
+# imported modules across reruns and sessions, so the registry lives as long
+# as the server process. Benchmarks swap in fakes with `override`.
+
+import threading
+import time
+
+_factories = {}
+_instances = {}
+_lock = threading.RLock()   # factories may fetch other resources
+
+stats = {}   # name -> seconds it took to create
+
+
+def register(name):
+    """Decorator: `factory()` builds resource `name` on first `get(name)`."""
+    def decorator(factory):
+        _factories[name] = factory
+        return factory
+    return decorator
+
+
+def get(name):
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    with _lock:
+        if name not in _instances:
+            start = time.perf_counter()
+            _instances[name] = _factories[name]()
+            stats[name] = time.perf_counter() - start
+        return _instances[name]
+
+
+def override(name, instance):
+    """Use `instance` for `name` from now on (fakes in benchmarks)."""
+    with _lock:
+        _instances[name] = instance
+
+
+def loaded() -> list:
+    return sorted(_instances)
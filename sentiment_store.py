@@ -0,0 +1,151 @@
+# sentiment_store.py - CrowdAlpha | Per-ticker sentiment time series with rolling aggregates
+#
+# Lives in the Reddit index database. Every analysed post adds one
+# (ticker, timestamp, sentiment, post id) record per ticker and bumps a
+# 5-minute bucket of bullish/bearish/neutral counts in the same
+# transaction. Rolling 1h/24h/7d aggregates and sentiment charts read the
+# buckets, never the raw posts. Re-analysed (edited) posts first remove
+# their old contribution, so buckets stay exact.
+
+import time
+
+BUCKET_SECONDS = 300
+WINDOWS = {"1h": 3600, "24h": 24 * 3600, "7d": 7 * 24 * 3600}
+SENTIMENTS = ("bullish", "bearish", "neutral")
+UNCATEGORIZED = "UNCATEGORIZED"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sentiment (
+    ticker TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    ts REAL NOT NULL,
+    sentiment TEXT NOT NULL,
+    PRIMARY KEY (ticker, post_id)
+);
+CREATE INDEX IF NOT EXISTS sentiment_post ON sentiment (post_id);
+CREATE TABLE IF NOT EXISTS sentiment_buckets (
+    ticker TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    bullish INTEGER NOT NULL DEFAULT 0,
+    bearish INTEGER NOT NULL DEFAULT 0,
+    neutral INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (ticker, subreddit, bucket)
+);
+CREATE INDEX IF NOT EXISTS sentiment_buckets_time ON sentiment_buckets (bucket);
+"""
+
+
+def normalise_sentiment(value) -> str:
+    value = str(value or "").strip().lower()
+    return value if value in SENTIMENTS else "neutral"
+
+
+def _bucket(ts) -> int:
+    return int(ts // BUCKET_SECONDS) * BUCKET_SECONDS
+
+
+def _bump(conn, ticker, subreddit, ts, sentiment, delta):
+    counts = [delta if s == sentiment else 0 for s in SENTIMENTS]
+    conn.execute(
+        "INSERT INTO sentiment_buckets VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (ticker, subreddit, bucket) DO UPDATE SET "
+        "bullish = bullish + excluded.bullish, bearish = bearish + excluded.bearish, "
+        "neutral = neutral + excluded.neutral",
+        (ticker, subreddit, _bucket(ts), *counts)
+    )
+
+
+# --- Writes (call inside the caller's transaction) ---
+def record_post(conn, post_id, subreddit, ts, sentiment, tickers):
+    """Replace the sentiment records of one post and update its buckets."""
+    for row in conn.execute("SELECT ticker, subreddit, ts, sentiment FROM sentiment WHERE post_id = ?", (post_id,)):
+        _bump(conn, row[0], row[1], row[2], row[3], -1)
+    conn.execute("DELETE FROM sentiment WHERE post_id = ?", (post_id,))
+
+    sentiment = normalise_sentiment(sentiment)
+    for ticker in dict.fromkeys(tickers):
+        if ticker == UNCATEGORIZED:
+            continue
+        conn.execute("INSERT INTO sentiment VALUES (?, ?, ?, ?, ?)", (ticker, post_id, subreddit, ts, sentiment))
+        _bump(conn, ticker, subreddit, ts, sentiment, 1)
+
+
+def backfill(conn) -> int:
+    """One-off import of posts indexed before the sentiment store existed. Returns records added."""
+    if conn.execute("SELECT 1 FROM sentiment LIMIT 1").fetchone():
+        return 0
+    rows = conn.execute(
+        "SELECT t.ticker, p.id, p.subreddit, p.created_utc, p.sentiment FROM ticker_posts t "
+        "JOIN posts p ON p.id = t.post_id WHERE t.ticker != ?", (UNCATEGORIZED,)
+    ).fetchall()
+    with conn:
+        for ticker, post_id, subreddit, ts, sentiment in rows:
+            sentiment = normalise_sentiment(sentiment)
+            conn.execute("INSERT OR IGNORE INTO sentiment VALUES (?, ?, ?, ?, ?)",
+                         (ticker, post_id, subreddit, ts, sentiment))
+            _bump(conn, ticker, subreddit, ts, sentiment, 1)
+    return len(rows)
+
+
+def prune(conn, before):
+    """Delete records and buckets older than `before` (whole buckets only, so none is left half counted)."""
+    cutoff = _bucket(before)
+    conn.execute("DELETE FROM sentiment WHERE ts < ?", (cutoff,))
+    conn.execute("DELETE FROM sentiment_buckets WHERE bucket < ?", (cutoff,))
+
+
+# --- Reads ---
+def _subreddit_filter(subreddits):
+    return f"subreddit IN ({','.join('?' * len(subreddits))})", list(subreddits)
+
+
+def window_aggregates(conn, subreddits, now=None) -> dict:
+    """
+    {ticker: {window: {"mentions", "bullish", "bearish", "bull_ratio", "momentum"}}}
+    for the 1h/24h/7d windows. Momentum compares mentions with the previous
+    window of the same length (0.5 = 50% more mentions).
+    """
+    now = time.time() if now is None else now
+    where, params = _subreddit_filter(subreddits)
+    columns, column_params = [], []
+    for name, seconds in WINDOWS.items():
+        current, previous = now - seconds, now - 2 * seconds
+        for sentiment in ("bullish", "bearish"):
+            columns.append(f"SUM(CASE WHEN bucket >= ? THEN {sentiment} ELSE 0 END)")
+            column_params.append(current)
+        columns.append("SUM(CASE WHEN bucket >= ? THEN bullish + bearish + neutral ELSE 0 END)")
+        columns.append("SUM(CASE WHEN bucket >= ? AND bucket < ? THEN bullish + bearish + neutral ELSE 0 END)")
+        column_params += [current, previous, current]
+    rows = conn.execute(
+        f"SELECT ticker, {', '.join(columns)} FROM sentiment_buckets "
+        f"WHERE bucket >= ? AND {where} GROUP BY ticker",
+        column_params + [now - 2 * max(WINDOWS.values())] + params
+    ).fetchall()
+
+    aggregates = {}
+    for row in rows:
+        values, windows = list(row[1:]), {}
+        for i, name in enumerate(WINDOWS):
+            bullish, bearish, mentions, previous = values[4 * i:4 * i + 4]
+            windows[name] = {
+                "mentions": mentions,
+                "bullish": bullish,
+                "bearish": bearish,
+                "bull_ratio": bullish / (bullish + bearish) if bullish + bearish else None,
+                "momentum": (mentions - previous) / previous if previous else None,
+            }
+        aggregates[row[0]] = windows
+    return aggregates
+
+
+def series(conn, ticker, subreddits, since, step=3600) -> list:
+    """Sentiment counts for `ticker` per `step` seconds since `since`, oldest first."""
+    where, params = _subreddit_filter(subreddits)
+    rows = conn.execute(
+        f"SELECT (bucket / ?) * ? AS t, SUM(bullish), SUM(bearish), SUM(neutral) FROM sentiment_buckets "
+        f"WHERE ticker = ? AND bucket >= ? AND {where} GROUP BY t ORDER BY t",
+        [step, step, ticker, since] + params
+    ).fetchall()
+    return [{"time": t, "bullish": bull, "bearish": bear, "neutral": neutral} for t, bull, bear, neutral in rows]
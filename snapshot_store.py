@@ -0,0 +1,47 @@
+# snapshot_store.py - CrowdAlpha | Precomputed snapshots shared between the worker and the UI
+#
+# The background worker publishes JSON snapshots; Streamlit tabs only read
+# them. Writes go to a temp file that is renamed into place, so readers never
+# see a half-written snapshot.
+
+import json
+import os
+import tempfile
+import time
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+
+
+def snapshot_path(name) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{name}.json")
+
+
+def publish(name, data):
+    """Atomically replace snapshot `name` with `data` (plus a generated_at timestamp)."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    payload = dict(data, generated_at=time.time())
+    fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, snapshot_path(name))
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def version(name):
+    """Modification time of a snapshot, or None if it hasn't been published yet.
+    Cheap enough to call on every rerun and use as a cache key."""
+    try:
+        return os.stat(snapshot_path(name)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load(name):
+    try:
+        with open(snapshot_path(name)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
@@ -1,50 +1,133 @@
 # streamlit_ui.py - Reddit Feed Tab (modularized)
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-from crowdalpha import fetch_reddit_posts, group_posts_by_ticker
+import time
+import post_store
+import reddit_ingest
+import snapshot_store
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_reddit_snapshot(version):
+    """
+    (snapshot, PostStore); `version` (file mtime) is the cache key. Kept as a
+    shared resource, so reruns and sessions reuse one read-only store
+    instead of unpickling a copy each time.
+    """
+    snapshot = snapshot_store.load("reddit")
+    # Snapshots published before the post store carry the grouped dict instead
+    store = post_store.PostStore.from_dict(snapshot.pop("store")) if "store" in snapshot \
+        else post_store.PostStore.from_grouped(snapshot.pop("grouped"))
+    return snapshot, store
+
+
+@st.cache_data(show_spinner=False)
+def snapshot_csv(version, subreddits):
+    return load_reddit_snapshot(version)[1].to_csv(subreddits)
+
+
+@st.cache_data(show_spinner=False)
+def snapshot_parquet(version, subreddits):
+    return load_reddit_snapshot(version)[1].to_parquet(subreddits)
+
+
+@st.cache_data(show_spinner=False)
+def load_sentiment_aggregates(version, subreddits):
+    """Rolling aggregates; recomputed from the sentiment buckets only when a new snapshot lands."""
+    return reddit_ingest.sentiment_aggregates(subreddits)
+
+
+@st.cache_data(show_spinner=False)
+def load_sentiment_series(version, ticker, subreddits, days):
+    step = 3600 if days <= 7 else 6 * 3600
+    series = pd.DataFrame(reddit_ingest.sentiment_series(ticker, subreddits, days, step),
+                          columns=["time", "bullish", "bearish", "neutral"])
+    series["time"] = pd.to_datetime(series["time"], unit="s")
+    return series.set_index("time")
+
 
 def render_reddit_tab():
     st.set_page_config(page_title="CrowdAlpha | Trending Stock Insights", layout="wide")
     st.title("📈 CrowdAlpha - Reddit-Powered Stock Insights")
+    st.sidebar.title("📊 Filter and Insights")
+
+    # --- Load Snapshot (published by `python -m crowdalpha worker`) ---
+    if st.sidebar.button("🔄 Refresh now"):
+        import worker   # pulls in the ingestion pipeline; only needed for a manual refresh
+        with st.spinner("Fetching and analysing new Reddit posts..."):
+            worker.run_once()
+    version = snapshot_store.version("reddit")
+    if version is None:
+        st.info("No data yet. Start the background worker with `python -m crowdalpha worker` "
+                "or press **Refresh now** in the sidebar.")
+        return
+    snapshot, store = load_reddit_snapshot(version)
+    st.caption(f"Snapshot updated {int(time.time() - snapshot['generated_at'])}s ago.")
 
-    # --- Fetch and Process Posts ---
-    st.info("Fetching Reddit posts from r/stocks...")
-    posts = fetch_reddit_posts()
-    grouped = group_posts_by_ticker(posts)
-    tickers = sorted(grouped.keys())
+    # --- Sidebar Subreddit Filter ---
+    subreddits = st.sidebar.multiselect("Subreddits:", options=snapshot["subreddits"],
+                                        default=snapshot["subreddits"])
+    if not subreddits:
+        st.warning("Select at least one subreddit.")
+        return
+
+    # Counts come from the store's per-subreddit index: no pass over the posts per rerun
+    counts = store.counts(subreddits)
+    tickers = sorted(counts.index)
+    if not tickers:
+        st.warning("No posts indexed yet.")
+        return
 
     # --- Sidebar Ticker Filter ---
-    st.sidebar.title("📊 Filter and Insights")
     selected_ticker = st.sidebar.selectbox("Search or select a stock ticker:", 
     options=tickers,
     index=0)
 
     # --- Ticker Frequency Bar Chart ---
-    ticker_counts = {k: len(v) for k, v in grouped.items() if k != "UNCATEGORIZED"}
-    top_n = dict(sorted(ticker_counts.items(), key=lambda x: x[1], reverse=True)[:10])
     st.sidebar.markdown("### 🔥 Top Tickers")
-    st.sidebar.bar_chart(top_n)
+    st.sidebar.bar_chart(store.top(10, subreddits))
+
+    # --- Trending (rolling 24h window) ---
+    aggregates = load_sentiment_aggregates(version, tuple(subreddits))
+    trending = sorted(aggregates.items(), key=lambda x: x[1]["24h"]["mentions"], reverse=True)[:10]
+    if trending:
+        st.sidebar.markdown("### 📈 Trending (24h)")
+        st.sidebar.dataframe(pd.DataFrame(
+            [(t, w["24h"]["mentions"], w["24h"]["bull_ratio"], w["24h"]["momentum"]) for t, w in trending],
+            columns=["Ticker", "Mentions", "Bullish %", "Momentum"]
+        ).set_index("Ticker").style.format({"Bullish %": "{:.0%}", "Momentum": "{:+.0%}"}, na_rep="-"))
 
     # --- Export to CSV ---
-    flat_data = []
-    for t, posts in grouped.items():
-        for post in posts:
-            flat_data.append({
-                'ticker': t,
-                'title': post['title'],
-                'url': post['url'],
-                'summary': post.get('summary', ''),
-                'sentiment': post.get('sentiment', '')
-            })
-
-    df = pd.DataFrame(flat_data)
-    st.sidebar.download_button('📁 Download Results', df.to_csv(index=False), 'crowdalpha.csv')
+    st.sidebar.download_button('📁 Download Results', snapshot_csv(version, tuple(subreddits)), 'crowdalpha.csv')
+    if post_store.PARQUET_AVAILABLE:
+        st.sidebar.download_button('📦 Download Parquet', snapshot_parquet(version, tuple(subreddits)),
+                                   'crowdalpha.parquet')
 
     # --- Main Display ---
     st.subheader(f"Posts related to: {selected_ticker}")
 
-    for post in grouped[selected_ticker]:
+    # --- Sentiment Over Time ---
+    windows = aggregates.get(selected_ticker)
+    if windows:
+        for column, (name, window) in zip(st.columns(len(windows)), windows.items()):
+            momentum = window["momentum"]
+            column.metric(f"Mentions ({name})", window["mentions"],
+                          delta=f"{momentum:+.0%}" if momentum is not None else None)
+        days = st.radio("Sentiment history:", [1, 7, 30], index=1, horizontal=True,
+                        format_func=lambda d: f"{d}d", key="sentiment_days")
+        series = load_sentiment_series(version, selected_ticker, tuple(subreddits), days)
+        if not series.empty:
+            st.bar_chart(series, color=["#2ca02c", "#d62728", "#aaaaaa"])
+
+    # Only one page of post dicts is built per rerun
+    total = int(counts.get(selected_ticker, 0))
+    pages = max(1, -(-total // post_store.PAGE_SIZE))
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages}, {total} posts):", min_value=1, max_value=pages, value=1,
+                               key=f"posts_page_{selected_ticker}")
+    posts = store.posts_for(selected_ticker, subreddits, page=page - 1)
+    for post in posts:
         st.markdown(f"### 🔗 [{post['title']}]({post['url']})")
         if post['selftext']:
             st.markdown(f"> {post['selftext'][:300]}...")
@@ -1,7 +1,7 @@
 # terminal_tab.py - CrowdAlpha | Ticker Terminal View
 import streamlit as st
-import yfinance as yf
 import pandas as pd
+import market_data
 
 def render_terminal_tab():
     # --- Header ---
@@ -10,13 +10,18 @@ def render_terminal_tab():
 
     # --- Ticker Input ---
     ticker_input = st.text_input("Enter a stock ticker (e.g., TSLA, AAPL, NVDA):", value="AAPL", key="terminal_ticker_input")
+    period = st.selectbox("History:", ["1mo", "6mo", "1y", "5y"], key="terminal_period")
 
 
     if ticker_input:
         try:
-            ticker = yf.Ticker(ticker_input.upper())
-            info = ticker.info
-            hist = ticker.history(period="1mo")
+            symbol = ticker_input.upper()
+            history, infos = market_data.get_snapshot([symbol], period=period)
+            if symbol not in history:
+                st.warning(f"No price data found for {symbol}.")
+                return
+            info = infos[symbol]
+            hist = history[symbol]
 
             # --- Price Overview ---
             st.subheader(f"📈 Price Performance: {ticker_input.upper()}")
@@ -0,0 +1,25 @@
+# conftest.py - CrowdAlpha | Test setup: offline credentials and throwaway data files
+#
+# Modules read their paths and keys from the environment at import, so this
+# runs before any of them is imported.
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA_DIR = tempfile.mkdtemp(prefix="crowdalpha-tests-")
+for _name in ("GROQ_API_KEY", "OPENROUTER_API_KEY", "REDDIT_CLIENT_ID", "REDDIT_CLIENT_SECRET"):
+    os.environ.setdefault(_name, "offline")
+for _name, _file in (("LLM_CACHE_PATH", "llm_cache.db"), ("NEAR_DUP_PATH", "near_dup.db"),
+                     ("REDDIT_INDEX_PATH", "reddit_index.db"), ("SUMMARY_CACHE_PATH", "summary_cache.db"),
+                     ("HTTP_CACHE_PATH", "http_cache.db"), ("CHAT_CACHE_PATH", "chat_cache.db"),
+                     ("MARKET_CACHE_PATH", "market_data.db"), ("NEWS_INDEX_PATH", "news_index.db"),
+                     ("PRICE_STORE_DIR", "price_store"), ("SNAPSHOT_DIR", "snapshots")):
+    os.environ[_name] = os.path.join(DATA_DIR, _file)
+# Files still named relative to the working directory (llm_cache.json, metrics.prom) land here too
+os.chdir(DATA_DIR)
+# Nothing in the tests may reach a real provider
+os.environ["GROQ_BASE_URL"] = os.environ["OPENROUTER_BASE_URL"] = "http://127.0.0.1:9/v1"
@@ -0,0 +1,27 @@
+import answer_cache
+import chat_tab
+
+
+def test_cache_key_is_normalised_but_llm_sees_the_typed_command(monkeypatch):
+    prompts = []
+
+    def stream(prompt):
+        prompts.append(prompt)
+        yield "Tesla looks expensive.", chat_tab.GROQ_MODEL
+
+    monkeypatch.setattr(chat_tab.router, "stream", stream)
+    command = "/analyze  $tsla vs the Tesla bears"
+    flight = answer_cache.get_answer(command, lambda flight: chat_tab.generate_ai_response(command, flight))
+    list(flight.updates())
+    assert flight.key == "/analyze TSLA VS THE TESLA BEARS"
+    assert prompts == [chat_tab.PROMPT.format(command=command)]
+
+    again = answer_cache.get_answer("/Analyze $TSLA vs the tesla bears", lambda flight: None)
+    assert again.cached and again.text == "Tesla looks expensive."
+
+
+def test_earnings_command_is_case_insensitive(monkeypatch):
+    tickers = []
+    monkeypatch.setattr(chat_tab, "handle_earnings_command", lambda ticker, flight: tickers.append(ticker))
+    chat_tab.generate_ai_response("/Earnings $msft", answer_cache.Flight("/earnings MSFT"))
+    assert tickers == ["MSFT"]
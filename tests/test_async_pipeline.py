@@ -0,0 +1,24 @@
+import asyncio
+import threading
+
+import async_pipeline
+
+
+def _post(post_id):
+    return {"id": post_id, "subreddit": "stocks", "created_utc": 0, "edited": 0,
+            "title": f"$TSLA {post_id}: buying more shares after earnings", "selftext": "",
+            "url": f"https://redd.it/{post_id}"}
+
+
+def test_cache_lookups_run_off_the_event_loop(monkeypatch):
+    lookup_threads = []
+
+    def find_cached_thesis(post_id, text, source_id=None):
+        lookup_threads.append(threading.current_thread())
+        return {"ticker": ["TSLA"], "sentiment": "bullish", "reason": ["earnings"]}, None
+
+    monkeypatch.setattr(async_pipeline.core, "find_cached_thesis", find_cached_thesis)
+    _, state = asyncio.run(async_pipeline.run_pipeline(posts=[_post("a"), _post("b")]))
+    assert state.posts == 2 and state.calls == 0
+    assert len(lookup_threads) == 2
+    assert threading.main_thread() not in lookup_threads
@@ -0,0 +1,77 @@
+import json
+import types
+
+import pytest
+
+import backfill
+
+SINCE, UNTIL = "2024-05-01", "2024-06-01"
+
+
+@pytest.fixture
+def queued(tmp_path, monkeypatch):
+    """A planned job of ten dump posts; checkpoints every three posts."""
+    monkeypatch.setattr(backfill, "CHECKPOINT_SIZE", 3)
+    dump = tmp_path / "RS_2024-05.jsonl"
+    start = backfill.parse_time(SINCE)
+    dump.write_text("\n".join(json.dumps({
+        "id": f"p{i}", "subreddit": "stocks", "created_utc": start + i * 3600, "title": f"Post number {i} about TSLA",
+        "selftext": "Deliveries beat estimates.", "permalink": f"/r/stocks/comments/p{i}/"
+    }) for i in range(10)))
+    db = str(tmp_path / "index.db")
+    job = backfill.job_name(["stocks"], SINCE, UNTIL, str(dump))
+    posts = backfill.select_posts(["stocks"], start, backfill.parse_time(UNTIL), str(dump))
+    assert backfill.plan(job, posts, db) == 10
+    return job, db
+
+
+def _fake_pipeline(monkeypatch, seen, crash_after=None, failing=()):
+    async def run_pipeline(posts, on_result):
+        for count, post in enumerate(posts):
+            if count == crash_after:
+                raise RuntimeError("worker killed")
+            seen.append(post["id"])
+            ok = {"ticker": ["TSLA"], "sentiment": "bullish", "reason": ["deliveries"]}
+            on_result(post, backfill.LLM_ERROR if post["id"] in failing else ok)
+        return None, types.SimpleNamespace(calls=len(seen), prefiltered=0, near_duplicates=0)
+
+    monkeypatch.setattr(backfill.async_pipeline, "run_pipeline", run_pipeline)
+
+
+def test_crashed_shard_resumes_from_its_last_checkpoint(queued, monkeypatch):
+    job, db = queued
+    seen = []
+    _fake_pipeline(monkeypatch, seen, crash_after=7)
+    with pytest.raises(RuntimeError):
+        backfill.run_shard(job, 0, 1, db)
+    # Two checkpoints of three made it; the seventh post was analysed but never merged
+    assert backfill.progress(job, db) == {"queued": 10, "done": 6}
+
+    seen.clear()
+    _fake_pipeline(monkeypatch, seen, failing={"p9"})
+    stats = backfill.run_shard(job, 0, 1, db)
+    assert seen == ["p6", "p7", "p8", "p9"]
+    assert (stats["posts"], stats["failed"]) == (3, 1)
+    assert backfill.progress(job, db) == {"queued": 10, "done": 9}
+
+    # The failed LLM call stays queued for the next run
+    seen.clear()
+    _fake_pipeline(monkeypatch, seen)
+    backfill.run_shard(job, 0, 1, db)
+    assert seen == ["p9"]
+    assert backfill.progress(job, db) == {"queued": 10, "done": 10}
+
+
+def test_shards_split_the_queue_without_overlap(queued, monkeypatch):
+    job, db = queued
+    seen = []
+    _fake_pipeline(monkeypatch, seen)
+    for shard in range(3):
+        backfill.run_shard(job, shard, 3, db)
+    assert sorted(seen) == sorted(f"p{i}" for i in range(10))
+    assert backfill.progress(job, db)["done"] == 10
+
+
+def test_planning_a_job_again_queues_nothing(queued):
+    job, db = queued
+    assert backfill.plan(job, iter([{"id": "new"}]), db) == 0
@@ -0,0 +1,176 @@
+import json
+import multiprocessing
+import sqlite3
+import threading
+
+import pytest
+
+import cache_store
+
+
+def _write_legacy(path, entries=50):
+    data = {f"key{i}": {"value": {"ticker": ["TSLA"], "n": i}, "expires_at": 4e9} for i in range(entries)}
+    path.write_text(json.dumps(data))
+    return data
+
+
+def _open_store(db_path, json_path):
+    store = cache_store.open_cache_store(db_path, legacy_json=json_path)
+    store.open()
+    store.close()
+
+
+def test_legacy_json_is_migrated_once(tmp_path):
+    legacy = tmp_path / "llm_cache.json"
+    data = _write_legacy(legacy)
+    store = cache_store.open_cache_store(str(tmp_path / "llm_cache.db"), legacy_json=str(legacy))
+    assert store.get("key7") == data["key7"]
+    assert len(store) == len(data)
+    assert not legacy.exists() and (tmp_path / "llm_cache.json.imported").exists()
+    store.close()
+
+
+def test_migration_tolerates_another_process_finishing_first(tmp_path, monkeypatch):
+    legacy = tmp_path / "llm_cache.json"
+    data = _write_legacy(legacy)
+    load = json.load
+
+    def load_then_lose_race(f):
+        result = load(f)
+        legacy.rename(tmp_path / "llm_cache.json.imported")
+        return result
+
+    monkeypatch.setattr(cache_store.json, "load", load_then_lose_race)
+    store = cache_store.open_cache_store(str(tmp_path / "llm_cache.db"))
+    assert cache_store.migrate_json_cache(str(legacy), store) == len(data)
+    store.close()
+
+
+def test_legacy_results_are_served_through_the_current_keys(tmp_path, monkeypatch):
+    import crowdalpha as core
+    legacy = tmp_path / "llm_cache.json"
+    result = {"ticker": ["TSLA"], "sentiment": "bullish", "reason": ["deliveries"]}
+    legacy.write_text(json.dumps({"hash1": result, "hash2": json.loads(core.LLM_ERROR_RESULT)}))
+    store = cache_store.open_cache_store(str(tmp_path / "llm_cache.db"), legacy_json=str(legacy),
+                                         legacy_convert=core._legacy_entry)
+    monkeypatch.setattr(core, "llm_cache", cache_store.TieredCache(store))
+    assert core.get_cached_thesis("hash1") == result
+    assert core.get_cached_thesis("hash2") is None
+    assert len(store) == 1
+    store.close()
+
+
+def test_raw_rows_from_the_earlier_import_are_replaced(tmp_path):
+    migrated = tmp_path / "llm_cache.json.migrated"
+    migrated.write_text(json.dumps({"hash1": {"sentiment": "bearish"}}))
+    store = cache_store.open_cache_store(str(tmp_path / "llm_cache.db"))
+    store.put("hash1", {"sentiment": "bearish"})    # what the raw import left behind
+    store.put("new:hash1", {"value": "fresher answer", "expires_at": 4e9})
+    store.close()
+
+    convert = lambda k, v: (f"new:{k}", {"value": v, "expires_at": 4e9})
+    store = cache_store.open_cache_store(str(tmp_path / "llm_cache.db"), legacy_json=str(tmp_path / "llm_cache.json"),
+                                         legacy_convert=convert)
+    assert store.get("hash1") is None
+    assert store.get("new:hash1")["value"] == "fresher answer"
+    assert len(store) == 1 and (tmp_path / "llm_cache.json.imported").exists()
+    store.close()
+
+
+def test_first_readers_wait_for_the_migration(tmp_path, monkeypatch):
+    legacy = tmp_path / "llm_cache.json"
+    data = _write_legacy(legacy, entries=20)
+    store = cache_store.open_cache_store(str(tmp_path / "llm_cache.db"), legacy_json=str(legacy))
+    importing, release = threading.Event(), threading.Event()
+    import_json = cache_store._import_json
+
+    def slow_import(*args):
+        importing.set()
+        release.wait(5)
+        return import_json(*args)
+
+    monkeypatch.setattr(cache_store, "_import_json", slow_import)
+    opener = threading.Thread(target=store.open)
+    opener.start()
+    assert importing.wait(5)
+    results = []
+    reader = threading.Thread(target=lambda: results.append(store.get("key3")))
+    reader.start()
+    reader.join(0.2)
+    assert reader.is_alive()
+    release.set()
+    opener.join()
+    reader.join()
+    assert results == [data["key3"]]
+    store.close()
+
+
+def test_log_store_deletes_survive_a_reopen(tmp_path):
+    store = cache_store.AppendLogCacheStore(str(tmp_path / "cache.log"))
+    store.put_many([("a", 1), ("b", 2)])
+    store.flush()
+    store._delete(["a"])
+    store.close()
+    store = cache_store.AppendLogCacheStore(str(tmp_path / "cache.log"))
+    assert store.get("a") is None and store.get("b") == 2
+    store.close()
+
+
+def test_close_closes_every_thread_reader(tmp_path):
+    store = cache_store.SQLiteCacheStore(str(tmp_path / "cache.db"))
+    store.put("a", 1)
+    store.flush()
+    readers = [threading.Thread(target=store.get, args=("a",)) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    connections = list(store._readers)
+    assert len(connections) == 3
+    store.close()
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+
+def test_concurrent_processes_open_and_migrate(tmp_path):
+    legacy = tmp_path / "llm_cache.json"
+    data = _write_legacy(legacy, entries=2000)
+    args = [(str(tmp_path / "llm_cache.db"), str(legacy))] * 4
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        pool.starmap(_open_store, args)     # re-raises a worker's exception
+    store = cache_store.open_cache_store(str(tmp_path / "llm_cache.db"))
+    assert len(store) == len(data)
+    store.close()
+    assert not legacy.exists()
+
+
+def test_reads_during_compaction_see_every_value(tmp_path):
+    store = cache_store.AppendLogCacheStore(str(tmp_path / "cache.log"))
+    store.put_many((f"k{i}", {"n": i}) for i in range(500))
+    store.put_many((f"k{i}", {"n": i}) for i in range(500))   # superseded records for compaction to drop
+    store.flush()
+
+    errors, done = [], threading.Event()
+
+    def reader():
+        while not done.is_set():
+            for i in range(0, 500, 7):
+                try:
+                    if store.get(f"k{i}") != {"n": i}:
+                        errors.append(f"k{i}")
+                except Exception as e:
+                    errors.append(repr(e))
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    try:
+        for _ in range(30):
+            store.compact()
+    finally:
+        done.set()
+        for t in threads:
+            t.join()
+    store.close()
+    assert errors == []
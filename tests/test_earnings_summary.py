@@ -0,0 +1,25 @@
+import answer_cache
+import chat_tab
+import earnings_summary
+
+
+def test_cache_key_covers_prompt_fields():
+    key = earnings_summary._content_key
+    text = "Revenue grew 12% year over year."
+    assert key(earnings_summary.FULL_PROMPT, text, ticker="MSFT") != key(earnings_summary.FULL_PROMPT, text, ticker="AAPL")
+    assert (key(earnings_summary.MAP_PROMPT, text, ticker="MSFT", part=1, parts=3)
+            != key(earnings_summary.MAP_PROMPT, text, ticker="MSFT", part=2, parts=3))
+
+
+def test_failed_transcript_fetch_is_reported_not_summarised(monkeypatch):
+    monkeypatch.setattr(chat_tab.http_cache, "fetch_text", lambda *args, **kwargs: (404, ""))
+
+    def summarise(*args, **kwargs):
+        raise AssertionError("a fetch error must not be summarised")
+
+    monkeypatch.setattr(chat_tab.earnings_summary, "summarise_transcript", summarise)
+    flight = answer_cache.Flight("/earnings ZZZZ")
+    chat_tab.handle_earnings_command("ZZZZ", flight)
+    assert flight.done
+    assert flight.error == "Transcript not available or ticker invalid."
+    assert flight.text == ""
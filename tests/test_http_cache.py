@@ -0,0 +1,56 @@
+import pytest
+
+import http_cache
+from chat_tab import extract_transcript
+from fake_transcript_server import FakeTranscriptServer
+
+
+@pytest.fixture
+def server():
+    server = FakeTranscriptServer(paragraphs=20).start()
+    yield server
+    server.shutdown()
+
+
+def _fetch(server, **kwargs):
+    return http_cache.fetch_text(f"{server.base_url}/msft-earnings-call-transcript.aspx",
+                                 extract_transcript, "transcript", **kwargs)
+
+
+def test_304_reuses_the_cached_body_and_text(server):
+    status, text = _fetch(server)
+    assert status == 200 and "MSFT speaker" in text
+    parsed = http_cache.stats["parsed"]
+
+    assert _fetch(server, max_age=0) == (200, text)
+    assert server.stats == {"200": 1, "304": 1, "404": 0}
+    assert http_cache.stats["parsed"] == parsed
+
+
+def test_fresh_entries_skip_the_network(server):
+    _fetch(server)
+    _fetch(server)
+    assert server.stats["200"] + server.stats["304"] == 1
+
+
+def test_page_update_is_downloaded_and_parsed(server):
+    _, old = _fetch(server)
+    parsed = http_cache.stats["parsed"]
+    server.bump()
+    _, new = _fetch(server, max_age=0)
+    assert new != old and "(v2)" in new
+    assert server.stats["200"] == 2
+    assert http_cache.stats["parsed"] == parsed + 1
+
+
+def test_missing_etag_falls_back_to_a_full_get():
+    server = FakeTranscriptServer(paragraphs=20, etags=False).start()
+    try:
+        _, text = _fetch(server)
+        parsed = http_cache.stats["parsed"]
+        assert _fetch(server, max_age=0) == (200, text)
+        assert server.stats == {"200": 2, "304": 0, "404": 0}
+        # Same body, so the extracted text is still reused
+        assert http_cache.stats["parsed"] == parsed
+    finally:
+        server.shutdown()
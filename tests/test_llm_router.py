@@ -0,0 +1,56 @@
+import time
+from types import SimpleNamespace
+
+import llm_router
+from llm_router import CircuitBreaker, LLMRouter, Provider
+
+
+def _response(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def _router(monkeypatch, behaviour, timeout=30.0):
+    """Two providers whose calls follow behaviour[name] = (seconds, error or None)."""
+    calls, events = [], {}
+
+    def fake_chat_completion(name, client, model, messages, max_retries, cancelled=None):
+        calls.append(name)
+        events[name] = cancelled
+        seconds, error = behaviour[name]
+        time.sleep(seconds)
+        if error is not None:
+            raise error
+        return _response(name)
+
+    monkeypatch.setattr(llm_router, "chat_completion", fake_chat_completion)
+    monkeypatch.setattr(llm_router, "HEDGE_MIN_DELAY", 0.01)
+    providers = [Provider(name, name, "fake", "http://127.0.0.1:9", timeout, CircuitBreaker())
+                 for name in ("primary", "secondary")]
+    for provider in providers:
+        provider._client = object()
+        provider.record_latency(0.01)
+    return LLMRouter(providers, hedge=True), providers, calls, events
+
+
+def test_a_slow_loser_is_not_a_breaker_failure(monkeypatch):
+    router, (primary, _), _, cancelled = _router(
+        monkeypatch, {"primary": (0.3, RuntimeError("late")), "secondary": (0.0, None)})
+    assert router.complete("Analyze $TSLA") == ("secondary", "secondary")
+    assert cancelled["primary"].is_set()
+    time.sleep(0.4)
+    assert primary.breaker.failures == 0
+
+
+def test_a_hanging_loser_stays_penalized_when_it_finally_answers(monkeypatch):
+    router, (primary, _), _, _ = _router(
+        monkeypatch, {"primary": (0.4, None), "secondary": (0.2, None)}, timeout=0.1)
+    assert router.complete("Analyze $TSLA") == ("secondary", "secondary")
+    time.sleep(0.4)
+    assert primary.breaker.failures == 1
+
+
+def test_batch_sized_prompts_are_not_hedged(monkeypatch):
+    router, _, calls, _ = _router(monkeypatch, {"primary": (0.1, None), "secondary": (0.0, None)})
+    prompt = "x" * (llm_router.HEDGE_MAX_PROMPT_TOKENS * 4)
+    assert router.complete(prompt) == ("primary", "primary")
+    assert calls == ["primary"]
@@ -0,0 +1,38 @@
+import near_dup
+
+THESIS = ("NVDA earnings next week. Data center revenue keeps growing faster than anyone modelled, "
+          "margins are expanding and the guidance was conservative last quarter. Hyperscalers keep raising "
+          "capex plans for next year and the new architecture ships on schedule according to the supply chain. "
+          "Inventory days look normal, the valuation is reasonable on forward earnings and competitors are "
+          "still a generation behind on software. I'm long shares and some calls into the print.")
+EDIT = " EDIT: I sold everything after the call, now bearish and holding puts."
+
+
+def test_edit_does_not_match_its_own_earlier_version(tmp_path):
+    index = near_dup.NearDupIndex(str(tmp_path / "near_dup.db"))
+    index.add("oldhash", THESIS, source_id="abc123")
+    assert near_dup.similarity(near_dup.minhash(THESIS), near_dup.minhash(THESIS + EDIT)) >= near_dup.SIMILARITY_THRESHOLD
+    assert index.find(THESIS + EDIT, exclude="newhash", source_id="abc123") is None
+
+
+def test_repost_by_another_post_still_matches(tmp_path):
+    index = near_dup.NearDupIndex(str(tmp_path / "near_dup.db"))
+    index.add("oldhash", THESIS, source_id="abc123")
+    assert index.find(THESIS + " Thoughts?", exclude="newhash", source_id="xyz789") == "oldhash"
+
+
+def test_only_texts_above_the_threshold_match(tmp_path):
+    index = near_dup.NearDupIndex(str(tmp_path / "near_dup.db"))
+    index.add("oldhash", THESIS)
+    rewrite = ("AMD earnings next week. Client revenue is recovering slowly, the console business keeps "
+               "shrinking and embedded inventory is still being worked down. Margins expanding and the "
+               "guidance was conservative last quarter, but I'm waiting for the print before buying shares.")
+    assert near_dup.similarity(near_dup.minhash(THESIS), near_dup.minhash(rewrite)) < near_dup.SIMILARITY_THRESHOLD
+    assert index.find(rewrite) is None
+    assert index.find(THESIS.replace("I'm long shares", "I am long shares")) == "oldhash"
+
+
+def test_short_posts_are_never_duplicates(tmp_path):
+    index = near_dup.NearDupIndex(str(tmp_path / "near_dup.db"))
+    index.add("short", "TSLA to the moon")
+    assert index.find("TSLA to the moon") is None
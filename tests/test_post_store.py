@@ -0,0 +1,28 @@
+from post_store import PostStore
+
+
+def _post(i, subreddit="stocks"):
+    return {"id": f"p{i}", "subreddit": subreddit, "created_utc": 1_700_000_000 + i, "title": f"post {i}",
+            "selftext": "", "url": f"https://redd.it/p{i}", "summary": "", "sentiment": "neutral"}
+
+
+def test_posts_for_returns_one_page_newest_first():
+    store = PostStore.from_grouped({"TSLA": [_post(i) for i in range(250)]})
+    first = store.posts_for("TSLA")
+    assert len(first) == 100
+    assert [p["id"] for p in first[:2]] == ["p249", "p248"]
+    assert [p["id"] for p in store.posts_for("TSLA", page=2)] == [f"p{i}" for i in range(49, -1, -1)]
+    assert store.posts_for("TSLA", page=3) == []
+    assert store.posts_for("NOPE") == []
+
+
+def test_subreddit_filters_match_the_posts():
+    posts = [_post(i, ("stocks", "wallstreetbets", "investing")[i % 3]) for i in range(30)]
+    store = PostStore.from_grouped({"TSLA": posts, "NVDA": posts[:10]})
+    picked = ("stocks", "investing", "not-indexed")
+    expected = [p["id"] for p in reversed(posts) if p["subreddit"] in picked]
+    assert [p["id"] for p in store.posts_for("TSLA", picked)] == expected
+    assert store.counts(picked).to_dict() == {"TSLA": 20, "NVDA": 7}
+    assert store.counts().to_dict() == {"TSLA": 30, "NVDA": 10}
+    assert store.counts(["not-indexed"]).empty
+    assert len(store.export_frame(["wallstreetbets"])) == 13
@@ -0,0 +1,33 @@
+import prefilter
+from ticker_extract import SYMBOLS
+
+
+def test_unlisted_ticker_goes_to_llm():
+    assert "RKLB" not in SYMBOLS
+    assert prefilter.classify("RKLB earnings beat, revenue guidance raised, buying more shares") is None
+    assert prefilter.classify("$RKLB earnings beat, revenue guidance raised, buying more shares") is None
+
+
+def test_thesis_without_ticker_goes_to_llm():
+    assert prefilter.classify("Rocket Lab earnings beat and guidance raised") is None
+
+
+def test_chatter_is_answered_locally():
+    result = prefilter.classify("lol what a wild day honestly")
+    assert result == {"ticker": [], "sentiment": "neutral", "reason": ["No tradable securities mentioned"]}
+
+
+def test_meta_thread_is_answered_locally():
+    result = prefilter.classify("Daily Discussion Thread for May 5", "Post your RKLB earnings takes here")
+    assert result["reason"] == ["Discussion/meta thread"]
+
+
+def test_listed_ticker_without_thesis_is_answered_locally():
+    result = prefilter.classify("NVDA", "")
+    assert result["ticker"] == ["NVDA"]
+    assert result["reason"] == ["Mentioned without an investment thesis"]
+
+
+def test_trading_question_without_symbol_is_answered_locally():
+    result = prefilter.classify("Should I buy or hold?", "Thinking about selling some shares, no idea.")
+    assert result["reason"] == ["No tradable securities mentioned"]
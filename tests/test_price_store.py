@@ -0,0 +1,57 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import price_store
+
+
+def _frame(days):
+    index = pd.date_range(end=pd.Timestamp.now().normalize(), periods=days, freq="D", tz="America/New_York", name="Date")
+    close = np.linspace(100, 200, days)
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1e6}, index=index)
+
+
+def test_longer_period_backfills_deeper_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(price_store, "PRICE_STORE_DIR", str(tmp_path))
+    calls = []
+
+    def download(symbols, **kwargs):
+        calls.append(kwargs.get("period") or "incremental")
+        days = {"5y": 5 * 365, "max": 20 * 365}.get(kwargs.get("period"), 2)
+        return {symbol: _frame(days) for symbol in symbols}
+
+    monkeypatch.setattr(price_store, "download", download)
+    assert 360 <= len(price_store.load(["AAPL"], "1y")["AAPL"]) <= 367
+    price_store.load(["AAPL"], "5y")
+    assert calls == ["5y"]
+    assert len(price_store.load(["AAPL"], "max")["AAPL"]) == 20 * 365
+    price_store.load(["AAPL"], "max")
+    price_store.load(["AAPL"], "10y")
+    assert calls == ["5y", "max"]
+
+
+def test_reads_do_not_wait_for_downloads(monkeypatch, tmp_path):
+    monkeypatch.setattr(price_store, "PRICE_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(price_store, "download", lambda symbols, **kwargs: {s: _frame(30) for s in symbols})
+    price_store.update(["MSFT"])
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_download(symbols, **kwargs):
+        started.set()
+        release.wait(5)
+        return {s: _frame(30) for s in symbols}
+
+    monkeypatch.setattr(price_store, "download", slow_download)
+    updater = threading.Thread(target=price_store.update, args=(["MSFT"],), kwargs={"force": True})
+    updater.start()
+    try:
+        assert started.wait(5)
+        acquired = price_store._lock.acquire(timeout=1)
+        assert acquired, "update() holds the lock while downloading"
+        price_store._lock.release()
+        assert len(price_store.read("MSFT", "1mo")) > 0
+    finally:
+        release.set()
+        updater.join()
@@ -0,0 +1,24 @@
+import bench
+import rate_limit
+
+
+def test_large_request_leaves_room_on_a_full_bucket():
+    limiter = rate_limit.ProviderLimiter("test", rpm=600, tpm=6000, max_concurrency=4)
+    assert limiter.try_acquire(5000) == 0
+    limiter.release(estimated=5000, used=5000)
+    assert limiter.try_acquire(300) == 0
+
+
+def test_throughput_converges_on_quota():
+    rpm, seconds = 600, 6
+    result = bench.bench_ratelimit(rpm=rpm, seconds=seconds, threads=16, failure_rate=0.0)
+    assert result["failed"] == 0
+    # A 429 from the server's sliding window can still pause the provider for most of a second
+    assert 0.7 * rpm / 60 <= sum(result["per_second"]) / seconds <= 1.1 * rpm / 60
+    assert result["server"]["rate_limited"] <= 0.15 * result["limiter"]["requests"]
+
+
+def test_injected_rate_limits_are_retried_without_failures():
+    result = bench.bench_ratelimit(rpm=600, seconds=4, threads=16, failure_rate=0.05)
+    assert result["failed"] == 0
+    assert result["completed"] > 0
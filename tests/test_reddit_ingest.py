@@ -0,0 +1,118 @@
+import time
+
+import reddit_ingest
+import resources
+from fake_reddit import FakeReddit
+
+DAY = 24 * 3600
+
+
+def _post(post_id, created_utc, subreddit="stocks"):
+    return {"id": post_id, "subreddit": subreddit, "created_utc": created_utc, "edited": 0,
+            "title": f"Thoughts on {post_id}", "selftext": "", "url": f"https://redd.it/{post_id}"}
+
+
+def _result(ticker, sentiment="bullish"):
+    return {"ticker": [ticker], "sentiment": sentiment, "reason": ["earnings beat"]}
+
+
+def test_prune_drops_posts_and_sentiment_past_retention(tmp_path):
+    path = str(tmp_path / "index.db")
+    now = time.time()
+    old, recent = now - reddit_ingest.RETENTION - DAY, now - DAY
+    conn = reddit_ingest._connect(path)
+    try:
+        reddit_ingest.store_posts(conn, [(_post("old", old), _result("TSLA")),
+                                         (_post("new", recent), _result("TSLA"))])
+        assert reddit_ingest.prune(conn, now) == 1
+        assert [row[0] for row in conn.execute("SELECT id FROM posts")] == ["new"]
+        assert [row[0] for row in conn.execute("SELECT post_id FROM ticker_posts")] == ["new"]
+        assert [row[0] for row in conn.execute("SELECT post_id FROM sentiment")] == ["new"]
+        assert conn.execute("SELECT SUM(bullish) FROM sentiment_buckets").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_schema_is_created_once_per_database(tmp_path, monkeypatch):
+    path = str(tmp_path / "index.db")
+    reddit_ingest._connect(path).close()
+    monkeypatch.setattr(reddit_ingest, "SCHEMA", "this is not SQL;")
+    conn = reddit_ingest._connect(path)
+    conn.execute("SELECT COUNT(*) FROM posts").fetchone()
+    conn.close()
+
+
+def _fixture_post(post_id, created_utc, selftext="Holding shares into earnings, the numbers look strong."):
+    return {"id": post_id, "subreddit": "stocks", "created_utc": created_utc, "edited": 0,
+            "title": f"{post_id.upper()} thoughts before earnings", "selftext": selftext,
+            "url": f"https://redd.it/{post_id}", "stickied": False}
+
+
+def test_refresh_analyses_only_new_and_edited_posts(tmp_path, monkeypatch):
+    path = str(tmp_path / "index.db")
+    now = time.time()
+    posts = [_fixture_post("aaa", now - 300), _fixture_post("bbb", now - 200)]
+    monkeypatch.setitem(resources._instances, "reddit", FakeReddit(posts))
+    analysed = []
+
+    def analyse(batch):
+        if batch:
+            analysed.append(sorted(p["id"] for p in batch))
+        return [(p, _result("TSLA")) for p in batch]
+
+    monkeypatch.setattr(reddit_ingest, "_analyse", analyse)
+
+    assert reddit_ingest.refresh_subreddit("stocks", force=True, path=path, force_edits=True) == 2
+    posts.append(_fixture_post("ccc", now - 100))
+    posts[0].update(edited=now, selftext="EDIT: sold everything, now bearish.")
+    assert reddit_ingest.refresh_subreddit("stocks", force=True, path=path, force_edits=True) == 2
+    # The newest post sits on the watermark and is fetched again, but it is already indexed
+    assert reddit_ingest.refresh_subreddit("stocks", force=True, path=path, force_edits=True) == 0
+    assert analysed == [["aaa", "bbb"], ["aaa", "ccc"]]
+
+    conn = reddit_ingest._connect(path)
+    try:
+        watermark, = conn.execute("SELECT watermark FROM cursors WHERE subreddit = 'stocks'").fetchone()
+        selftext, = conn.execute("SELECT selftext FROM posts WHERE id = 'aaa'").fetchone()
+    finally:
+        conn.close()
+    assert watermark == now - 100
+    assert selftext == "EDIT: sold everything, now bearish."
+
+
+def test_refresh_waits_for_the_interval_unless_forced(tmp_path, monkeypatch):
+    path = str(tmp_path / "index.db")
+    posts = [_fixture_post("aaa", time.time() - 60)]
+    monkeypatch.setitem(resources._instances, "reddit", FakeReddit(posts))
+    monkeypatch.setattr(reddit_ingest, "_analyse", lambda batch: [(p, _result("TSLA")) for p in batch])
+    assert reddit_ingest.refresh_subreddit("stocks", path=path) == 1
+    posts.append(_fixture_post("bbb", time.time()))
+    assert reddit_ingest.refresh_subreddit("stocks", path=path) == 0
+    assert reddit_ingest.refresh_subreddit("stocks", force=True, path=path) == 1
+
+
+def test_posts_the_llm_failed_on_are_retried(tmp_path, monkeypatch):
+    path = str(tmp_path / "index.db")
+    now = time.time()
+    posts = [_fixture_post("aaa", now - 300), _fixture_post("bbb", now - 200), _fixture_post("ccc", now - 100)]
+    monkeypatch.setitem(resources._instances, "reddit", FakeReddit(posts))
+    failing, analysed = {"bbb"}, []
+
+    def run(posts, on_result):
+        for post in posts:
+            analysed.append(post["id"])
+            on_result(post, reddit_ingest.LLM_ERROR if post["id"] in failing else _result("TSLA"))
+
+    monkeypatch.setattr(reddit_ingest.async_pipeline, "run", run)
+    assert reddit_ingest.refresh_subreddit("stocks", force=True, path=path) == 2
+    failing.clear()
+    analysed.clear()
+    assert reddit_ingest.refresh_subreddit("stocks", force=True, path=path) == 1
+    assert analysed == ["bbb"]
+
+    conn = reddit_ingest._connect(path)
+    try:
+        assert sorted(row[0] for row in conn.execute("SELECT id FROM posts")) == ["aaa", "bbb", "ccc"]
+        assert conn.execute("SELECT COUNT(*) FROM posts WHERE summary LIKE '%LLM error%'").fetchone()[0] == 0
+    finally:
+        conn.close()
@@ -0,0 +1,50 @@
+import sqlite3
+
+import sentiment_store
+
+NOW = 1_800_000_000.0
+
+
+def _conn():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(sentiment_store.SCHEMA)
+    return conn
+
+
+def test_buckets_count_each_post_once_and_follow_edits():
+    conn = _conn()
+    sentiment_store.record_post(conn, "a", "stocks", NOW - 600, "bullish", ["TSLA", "TSLA", "NVDA"])
+    sentiment_store.record_post(conn, "b", "stocks", NOW - 120, "Bearish", ["TSLA"])
+    sentiment_store.record_post(conn, "c", "stocks", NOW - 60, "meh", ["UNCATEGORIZED"])
+    hour = sentiment_store.window_aggregates(conn, ["stocks"], now=NOW)["TSLA"]["1h"]
+    assert (hour["mentions"], hour["bullish"], hour["bearish"], hour["bull_ratio"]) == (2, 1, 1, 0.5)
+    assert "UNCATEGORIZED" not in sentiment_store.window_aggregates(conn, ["stocks"], now=NOW)
+
+    # An edit replaces the post's earlier contribution instead of adding to it
+    sentiment_store.record_post(conn, "a", "stocks", NOW - 600, "bearish", ["TSLA"])
+    aggregates = sentiment_store.window_aggregates(conn, ["stocks"], now=NOW)
+    assert (aggregates["TSLA"]["1h"]["bullish"], aggregates["TSLA"]["1h"]["bearish"]) == (0, 2)
+    assert aggregates["NVDA"]["1h"]["mentions"] == 0
+    assert conn.execute("SELECT MIN(bullish), MIN(bearish), MIN(neutral) FROM sentiment_buckets").fetchone() == (0, 0, 0)
+
+
+def test_momentum_compares_with_the_previous_window():
+    conn = _conn()
+    sentiment_store.record_post(conn, "old", "stocks", NOW - 3600 - 600, "neutral", ["AMD"])
+    for i in range(3):
+        sentiment_store.record_post(conn, f"new{i}", "stocks", NOW - 600, "bullish", ["AMD"])
+    hour = sentiment_store.window_aggregates(conn, ["stocks"], now=NOW)["AMD"]["1h"]
+    assert hour["mentions"] == 3 and hour["momentum"] == 2.0
+    assert sentiment_store.window_aggregates(conn, ["investing"], now=NOW) == {}
+
+
+def test_series_sums_buckets_per_step():
+    conn = _conn()
+    start = NOW - NOW % 3600 - 2 * 3600
+    sentiment_store.record_post(conn, "a", "stocks", start + 60, "bullish", ["AAPL"])
+    sentiment_store.record_post(conn, "b", "stocks", start + 1800, "bearish", ["AAPL"])
+    sentiment_store.record_post(conn, "c", "stocks", start + 3600 + 60, "neutral", ["AAPL"])
+    assert sentiment_store.series(conn, "AAPL", ["stocks"], start, step=3600) == [
+        {"time": start, "bullish": 1, "bearish": 1, "neutral": 0},
+        {"time": start + 3600, "bullish": 0, "bearish": 0, "neutral": 1},
+    ]
@@ -0,0 +1,26 @@
+import time
+
+import news_store
+import reddit_ingest
+import resources
+import worker
+from fake_reddit import FakeReddit
+
+
+def test_back_to_back_cycles_check_edits_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(reddit_ingest, "INDEX_FILE", str(tmp_path / "index.db"))
+    monkeypatch.setattr(news_store, "NEWS_WATCHLIST", [])
+    post = {"id": "aaa", "subreddit": "stocks", "created_utc": time.time() - 60, "edited": 0,
+            "title": "TSLA thoughts before earnings", "selftext": "Holding shares.", "url": "https://redd.it/aaa"}
+    monkeypatch.setitem(resources._instances, "reddit", FakeReddit([post]))
+    result = {"ticker": ["TSLA"], "sentiment": "bullish", "reason": ["deliveries"]}
+    monkeypatch.setattr(reddit_ingest, "_analyse", lambda posts: [(p, result) for p in posts])
+
+    checks = []
+    fetch_edited_posts = reddit_ingest.fetch_edited_posts
+    monkeypatch.setattr(reddit_ingest, "fetch_edited_posts",
+                        lambda conn, subreddit: checks.append(subreddit) or fetch_edited_posts(conn, subreddit))
+
+    worker.run_once(["stocks"])
+    worker.run_once(["stocks"])
+    assert checks == ["stocks"]
@@ -0,0 +1,110 @@
+# ticker_extract.py - CrowdAlpha | Allowlist-backed ticker extraction
+#
+# Candidates come from two precompiled patterns: cashtags ($tsla, $BRK.B) in
+# any case, and words written in capitals. A candidate only counts if it is a
+# listed symbol. Plain capitalised words that are also common English or
+# finance terms (ALL, NOW, LOW, CEO...) and single letters (F, T) must be
+# written as cashtags.
+
+import os
+import re
+import urllib.request
+
+# --- Symbol Table ---
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SEED_SYMBOLS_FILE = os.path.join(DATA_DIR, "symbols.txt")
+FULL_SYMBOLS_FILE = os.path.join(DATA_DIR, "symbols_full.txt")
+LISTING_URLS = [
+    "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt",
+    "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt",
+]
+
+CASHTAG_REGEX = re.compile(r"\$([A-Za-z]{1,5}(?:\.[A-Za-z])?)\b")
+CAPS_WORD_REGEX = re.compile(r"(?<![\w$])([A-Z]{2,5}(?:\.[A-Z])?)(?!\w)")
+
+STOPWORDS = frozenset("""
+A I AN AM ARE AS AT BE BY DO GO HE IF IN IS IT ME MY NO OF OK ON OR SO TO UP US WE
+ALL AND ANY BIG BUY CAN DAY DID FOR GET GOT HAS HER HIS HOW LOW MAN NEW NOT NOW
+OLD ONE OUR OUT OWN PUT RUN SEE SHE THE TOO TWO WAY WHO WHY YES YET YOU
+ALSO BACK BEEN BEST CALL CASH COST DOWN EACH EVEN EVER FREE FROM FUND GOOD HAVE
+HERE HIGH HOLD INTO JUST KEEP KNOW LIKE LONG LOOK LOVE MADE MAKE MORE MOST MUCH
+MUST NEXT ONLY OPEN OVER PLAY REAL SAID SAME SELL SOME SPOT SURE TAKE THAN THAT
+THEM THEN THEY THIS TIME VERY WANT WELL WENT WERE WHAT WHEN WILL WITH WORK YEAR
+ABOUT AFTER AGAIN COULD EVERY FIRST GOING GREAT MONEY NEVER OTHER PRICE RIGHT
+SHORT STILL STOCK THEIR THERE THESE THINK WHERE WHICH WHILE WOULD
+AI AH ATH ATL BTW CEO CFO COO CPI CTO DD DE EL EOD EPS ET ETF EV FD FED FOMC FOMO
+FTW FYI GDP HODL IMO IPO IRA IV LOL MA NET OTM ITM PE PM PR QE RH ROI SEC TA TLDR
+USA USD WSB YOLO YTD EDIT NYSE OTC LLC INC
+""".split())
+
+
+def load_listing(path) -> set:
+    """Read a symbol file: one symbol per line, or NASDAQ Trader pipe-delimited listings."""
+    symbols = set()
+    test_issue_column = None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or line.startswith("File Creation Time"):
+                continue
+            fields = line.split("|")
+            if "Test Issue" in fields:
+                # Header row of nasdaqlisted.txt / otherlisted.txt
+                test_issue_column = fields.index("Test Issue")
+                continue
+            if test_issue_column is not None and len(fields) > test_issue_column and fields[test_issue_column] == "Y":
+                continue
+            symbol = fields[0].strip().upper()
+            if re.fullmatch(r"[A-Z]{1,5}(\.[A-Z])?", symbol):
+                symbols.add(symbol)
+    return symbols
+
+
+def update_symbols(path=FULL_SYMBOLS_FILE) -> int:
+    """Download the NASDAQ/NYSE symbol directory and cache it on disk. Returns the symbol count."""
+    lines = []
+    for url in LISTING_URLS:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            lines.extend(response.read().decode("utf-8", "replace").splitlines())
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines))
+    os.replace(tmp_path, path)
+    reload_symbols()
+    return len(SYMBOLS)
+
+
+def _load_symbols():
+    path = FULL_SYMBOLS_FILE if os.path.exists(FULL_SYMBOLS_FILE) else SEED_SYMBOLS_FILE
+    return frozenset(load_listing(path))
+
+
+SYMBOLS = _load_symbols()
+
+
+def reload_symbols():
+    global SYMBOLS
+    SYMBOLS = _load_symbols()
+
+
+# --- Extraction ---
+def candidate_symbols(text) -> list:
+    """Ticker-like words in `text`, listed or not: any cashtag, plus capitalised words that aren't stopwords."""
+    found = dict.fromkeys(m.group(1).upper() for m in CASHTAG_REGEX.finditer(text))
+    found.update(dict.fromkeys(m.group(1) for m in CAPS_WORD_REGEX.finditer(text) if m.group(1) not in STOPWORDS))
+    return list(found)
+
+
+def extract_tickers(text, symbols=None):
+    """Listed tickers mentioned in `text`, in order of first appearance."""
+    symbols = SYMBOLS if symbols is None else symbols
+    found = {}
+    for match in CASHTAG_REGEX.finditer(text):
+        symbol = match.group(1).upper()
+        if symbol in symbols:
+            found.setdefault(symbol, match.start())
+    for match in CAPS_WORD_REGEX.finditer(text):
+        symbol = match.group(1)
+        if symbol in symbols and symbol not in STOPWORDS:
+            found.setdefault(symbol, match.start())
+    return sorted(found, key=found.get)
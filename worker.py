@@ -0,0 +1,48 @@
+# worker.py - CrowdAlpha | Background ingestion worker
+#
+# Runs the Reddit fetch + LLM analysis outside Streamlit and publishes
+# snapshots for the tabs to read (and refreshes NEWS_WATCHLIST headlines):
+#   python -m crowdalpha worker --interval 60
+
+import time
+
+import metrics
+import news_store
+import reddit_ingest
+import snapshot_store
+
+DEFAULT_INTERVAL = reddit_ingest.REFRESH_INTERVAL
+
+
+def build_reddit_snapshot(subreddits=None) -> dict:
+    """Post store (columns + ticker postings) for the Reddit tab."""
+    subreddits = list(subreddits or reddit_ingest.SUBREDDITS)
+    return {"subreddits": subreddits, "store": reddit_ingest.load_store(subreddits).to_dict()}
+
+
+def run_once(subreddits=None):
+    """Ingest new posts for every subreddit and publish a fresh snapshot."""
+    start = time.perf_counter()
+    with metrics.timer("worker_cycle"):
+        # The worker sets the refresh cadence itself; edit checks keep their own interval
+        ingested = reddit_ingest.refresh(subreddits, force=True)
+        snapshot_store.publish("reddit", build_reddit_snapshot(subreddits))
+        # Keeps the News Flow index warm for the usual watchlist
+        if news_store.NEWS_WATCHLIST:
+            news_store.refresh(news_store.NEWS_WATCHLIST)
+    metrics.dump()
+    stats = reddit_ingest.refresh_stats
+    print(f"Published reddit snapshot in {time.perf_counter() - start:.1f}s (new/edited posts: {ingested}, "
+          f"LLM calls: {stats['llm_calls']}, avoided by pre-filter: {stats['llm_calls_avoided']}, "
+          f"near-duplicates: {stats['near_duplicates']})")
+
+
+def run_forever(interval=DEFAULT_INTERVAL, subreddits=None):
+    metrics.serve()
+    while True:
+        started = time.monotonic()
+        try:
+            run_once(subreddits)
+        except Exception as e:
+            print(f"Worker cycle failed: {e}")
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))